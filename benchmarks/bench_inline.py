@@ -0,0 +1,48 @@
+"""Time inline.apply_inline_commands() on large blocks with omit/pass commands.
+
+    python benchmarks/bench_inline.py [--lines 1000 10000 50000] [--repeat 5]
+"""
+import argparse
+import time
+from typing import List
+
+from phmdoctest.inline import apply_inline_commands
+
+
+def synthetic_code(num_lines: int) -> str:
+    """Python code with an omit or pass command every few lines."""
+    lines = []
+    i = 0
+    while len(lines) < num_lines:
+        lines.append("x{0} = {0}".format(i))
+        lines.append("for j in range({0}):  # phmdoctest:omit".format(i))
+        lines.append("    print(j)")
+        lines.append("")
+        lines.append("    y = j  # phmdoctest:pass")
+        lines.append("time.sleep({})  # phmdoctest:pass".format(i))
+        lines.append("# a comment")
+        i += 1
+    return "\n".join(lines[:num_lines]) + "\n"
+
+
+def main(line_counts: List[int], repeat: int) -> None:
+    print("{:>8} {:>10} {:>14}".format("lines", "seconds", "us per line"))
+    for num_lines in line_counts:
+        code = synthetic_code(num_lines)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _ = apply_inline_commands(code)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        print(
+            "{:>8} {:>10.4f} {:>14.3f}".format(num_lines, best, 1e6 * best / num_lines)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+    main(options.lines, options.repeat)
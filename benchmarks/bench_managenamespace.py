@@ -0,0 +1,62 @@
+"""Time a generated module with many share-names blocks.
+
+Runs the generated tests with the managenamespace fixture's
+tracking check and again with the full integrity check.
+
+    python benchmarks/bench_managenamespace.py [--blocks 1000]
+"""
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import pytest
+
+import phmdoctest.document
+import phmdoctest.fixture
+import phmdoctest.main
+
+
+def synthetic_markdown(num_blocks: int) -> str:
+    """Markdown where every code block shares its names."""
+    parts = ["# Shared names\n\n"]
+    for i in range(num_blocks):
+        parts.append(
+            "<!--phmdoctest-share-names-->\n"
+            "```python\nname_{0} = {0}\nprint(name_{0})\n```\n\n"
+            "```\n{0}\n```\n\n".format(i)
+        )
+    return "".join(parts)
+
+
+def run_pytest(directory: Path, name: str, testfile: str, full_check: bool) -> float:
+    """Wall time in seconds to run the test file with pytest in this process."""
+    path = directory / name
+    _ = path.write_text(testfile, encoding="utf-8")
+    phmdoctest.fixture.FULL_INTEGRITY_CHECK = full_check
+    start = time.perf_counter()
+    exit_code = pytest.main([str(path), "-q", "-p", "no:cacheprovider"])
+    elapsed = time.perf_counter() - start
+    assert exit_code == 0, "generated tests failed"
+    return elapsed
+
+
+def main(num_blocks: int) -> None:
+    document = phmdoctest.document.Document(
+        "shared.md", text=synthetic_markdown(num_blocks)
+    )
+    testfile = phmdoctest.main.testfile(built_from="shared.md", document=document)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = Path(tmpdir)
+        tracking = run_pytest(directory, "test_tracking.py", testfile, False)
+        full = run_pytest(directory, "test_full.py", testfile, True)
+    print()
+    print("{:>8} {:>18} {:>14}".format("blocks", "tracking seconds", "full seconds"))
+    print("{:>8} {:>18.3f} {:>14.3f}".format(num_blocks, tracking, full))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=1000)
+    options = parser.parse_args()
+    main(options.blocks)
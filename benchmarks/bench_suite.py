@@ -0,0 +1,211 @@
+"""Time each phmdoctest phase and the generated tests on synthetic Markdown.
+
+Each combination of the parameters is a configuration. The phases
+are timed separately and reported as seconds and blocks per second.
+Running the generated test file with pytest is compared to running
+the same snippets with exec().  Write the results as JSON with --json
+and compare them to a stored baseline with --baseline.
+
+    python benchmarks/bench_suite.py [--blocks 100 1000] [--lines 3 20]
+        [--directive-density 0.0 0.5] [--session-ratio 0.0 0.5]
+        [--repeat 3] [--json results.json] [--baseline baseline.json]
+"""
+import argparse
+import contextlib
+import doctest
+import io
+import itertools
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+import phmdoctest.cases
+import phmdoctest.direct
+import phmdoctest.document
+import phmdoctest.inline
+import phmdoctest.main
+import phmdoctest.scanner
+import phmdoctest.tool
+from phmdoctest.entryargs import Args
+from synthetic import synthetic_markdown
+
+PARAMETERS = ["blocks", "lines", "directive_density", "session_ratio"]
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Smallest wall time in seconds of repeat calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def generate(text: str) -> str:
+    """Generate the pytest file the same way as the phmdoctest command."""
+    document = phmdoctest.document.Document("synthetic.md", text=text)
+    args = Args(
+        markdown_file="synthetic.md",
+        outfile=None,
+        skips=[],
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        built_from="synthetic.md",
+        fast_scan=False,
+        skip_regexes=[],
+        profile_json="",
+        session_tests=False,
+    )
+    blocks = phmdoctest.main._configure_block_roles(args, document)
+    return phmdoctest.cases.build_test_cases(args, blocks)
+
+
+def exec_snippets(nodes: List[Any]) -> None:
+    """Run the Python code blocks and session examples with exec()."""
+    parser = doctest.DocTestParser()
+    namespace: Dict[str, Any] = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for node in nodes:
+            if node.info == "python":
+                exec(node.literal, namespace)
+            elif node.info == "pycon":
+                for example in parser.get_examples(node.literal):
+                    exec(example.source, namespace)
+
+
+def run_pytest(directory: Path, name: str, testfile: str) -> None:
+    """Run the generated test file with pytest in this process."""
+    path = directory / name
+    _ = path.write_text(testfile, encoding="utf-8")
+    options = ["--doctest-modules", "-q", "-p", "no:cacheprovider"]
+    options.extend(["--import-mode=importlib", str(path)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        exit_code = pytest.main(options)
+    assert exit_code == 0, "generated tests failed"
+
+
+def time_phases(text: str, repeat: int, directory: Path, name: str) -> Dict[str, float]:
+    """Seconds taken by each phase."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(text))
+    code = [node.literal for node in nodes if node.info == "python"]
+    testfile = generate(text)
+    phases = {
+        "parse_commonmark": lambda: phmdoctest.tool.fenced_block_nodes(
+            io.StringIO(text)
+        ),
+        "parse_scanner": lambda: phmdoctest.scanner.scan_text(text),
+        "directives": lambda: [phmdoctest.direct.get_directives(n) for n in nodes],
+        "inline": lambda: [phmdoctest.inline.apply_inline_commands(c) for c in code],
+        "generate": lambda: generate(text),
+        "exec_snippets": lambda: exec_snippets(nodes),
+    }
+    seconds = {phase: best_of(repeat, func) for phase, func in phases.items()}
+    seconds["run_pytest"] = best_of(1, lambda: run_pytest(directory, name, testfile))
+    return seconds
+
+
+def run_configurations(options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time the phases for every combination of the parameters."""
+    results = []
+    combinations = itertools.product(*[getattr(options, p) for p in PARAMETERS])
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for number, values in enumerate(combinations):
+            configuration = dict(zip(PARAMETERS, values))
+            text = synthetic_markdown(*values)
+            name = "test_synthetic_{}.py".format(number)
+            seconds = time_phases(text, options.repeat, Path(tmpdir), name)
+            phases = {
+                phase: {
+                    "seconds": elapsed,
+                    "blocks_per_second": configuration["blocks"] / elapsed,
+                }
+                for phase, elapsed in seconds.items()
+            }
+            results.append(dict(configuration, bytes=len(text), phases=phases))
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Table of blocks per second by configuration and phase."""
+    phases = list(results[0]["phases"])
+    print("{:>8} {:>6} {:>8} {:>8}".format("blocks", "lines", "density", "sessions"))
+    print("    " + " ".join("{:>16}".format(phase) for phase in phases))
+    for result in results:
+        print(
+            "{blocks:>8} {lines:>6} {directive_density:>8} {session_ratio:>8}".format(
+                **result
+            )
+        )
+        rates = [result["phases"][phase]["blocks_per_second"] for phase in phases]
+        print("    " + " ".join("{:>16.0f}".format(rate) for rate in rates))
+    print("(blocks per second)")
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> int:
+    """Print the ratio of seconds to the baseline. Return number of regressions."""
+
+    def key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(result[p] for p in PARAMETERS)
+
+    stored = {key(result): result for result in baseline}
+    regressions = 0
+    print("\nseconds / baseline seconds")
+    for result in results:
+        old = stored.get(key(result))
+        if old is None:
+            continue
+        for phase, timing in result["phases"].items():
+            if phase not in old["phases"]:
+                continue
+            ratio = timing["seconds"] / old["phases"][phase]["seconds"]
+            flag = ""
+            if ratio > 1.0 + tolerance:
+                flag = "  REGRESSION"
+                regressions += 1
+            print("{} {:>16} {:>7.2f}{}".format(key(result), phase, ratio, flag))
+    return regressions
+
+
+def main(options: argparse.Namespace) -> int:
+    results = run_configurations(options)
+    print_results(results)
+    if options.json:
+        document = {"python": sys.version.split()[0], "results": results}
+        text = json.dumps(document, indent=2)
+        _ = Path(options.json).write_text(text + "\n", encoding="utf-8")
+    if options.baseline:
+        stored = json.loads(Path(options.baseline).read_text(encoding="utf-8"))
+        if compare(results, stored["results"], options.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--lines", type=int, nargs="+", default=[3, 20])
+    parser.add_argument(
+        "--directive-density", type=float, nargs="+", default=[0.0, 0.5]
+    )
+    parser.add_argument("--session-ratio", type=float, nargs="+", default=[0.0, 0.5])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare to results in this JSON file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slower fraction of the baseline reported as a regression",
+    )
+    sys.exit(main(parser.parse_args()))
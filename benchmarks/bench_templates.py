@@ -0,0 +1,93 @@
+"""Time cases.build_test_cases() per block on synthetic Markdown.
+
+Also times the per block inspect.getsource() calls the templates replace.
+
+    python benchmarks/bench_templates.py [--blocks 100 1000 5000] [--repeat 5]
+"""
+import argparse
+import inspect
+import time
+from typing import Callable, List
+
+import phmdoctest.cases
+import phmdoctest.document
+import phmdoctest.functions
+import phmdoctest.main
+from phmdoctest.entryargs import Args
+
+
+def synthetic_markdown(num_blocks: int) -> str:
+    """Markdown with a mix of code/output, code only, and shared names blocks."""
+    parts = ["# Synthetic document\n\n"]
+    for i in range(num_blocks):
+        kind = i % 3
+        if kind == 0:
+            parts.append("```python\nprint({0})\n```\n\n```\n{0}\n```\n\n".format(i))
+        elif kind == 1:
+            parts.append("```python\nx{0} = {0}\nassert x{0} == {0}\n```\n\n".format(i))
+        else:
+            parts.append(
+                "<!--phmdoctest-share-names-->\n"
+                "```python\ny{0} = {0}\nprint(y{0})\n```\n\n```\n{0}\n```\n\n".format(i)
+            )
+    return "".join(parts)
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Smallest wall time in seconds of repeat calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(block_counts: List[int], repeat: int) -> None:
+    print(
+        "{:>8} {:>14} {:>22}".format("blocks", "us per block", "getsource us per block")
+    )
+    for num_blocks in block_counts:
+        text = synthetic_markdown(num_blocks)
+        document = phmdoctest.document.Document("synthetic.md", text=text)
+        args = Args(
+            markdown_file="synthetic.md",
+            outfile=None,
+            skips=[],
+            is_report=False,
+            fail_nocode=False,
+            setup=None,
+            teardown=None,
+            setup_doctest=False,
+            built_from="synthetic.md",
+            fast_scan=False,
+            skip_regexes=[],
+            profile_json="",
+            session_tests=False,
+        )
+        blocks = phmdoctest.main._configure_block_roles(args, document)
+        generate = best_of(
+            repeat, lambda: phmdoctest.cases.build_test_cases(args, blocks)
+        )
+        getsource = best_of(
+            repeat,
+            lambda: [
+                inspect.getsource(phmdoctest.functions.test_code_and_output)
+                for _ in range(num_blocks)
+            ],
+        )
+        print(
+            "{:>8} {:>14.2f} {:>22.2f}".format(
+                num_blocks,
+                1e6 * generate / num_blocks,
+                1e6 * getsource / num_blocks,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+    main(options.blocks, options.repeat)
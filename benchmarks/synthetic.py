@@ -0,0 +1,96 @@
+"""Synthetic Markdown for the benchmarks.
+
+    python benchmarks/synthetic.py [--blocks 10] [--lines 3]
+"""
+import argparse
+import random
+
+
+def code_block(index: int, lines: int, directive: str = "") -> str:
+    """Python code block of lines lines followed by its expected output.
+
+    A block with a directive also gets an inline command.
+    """
+    parts = [directive]
+    parts.append("```python\n")
+    parts.append("total_{} = 0\n".format(index))
+    for j in range(max(lines - 2, 0)):
+        parts.append("total_{0} += {1}\n".format(index, j))
+    if directive:
+        parts.append("unused_{0} = {0}  # phmdoctest:omit\n".format(index))
+    parts.append("print(total_{})\n".format(index))
+    parts.append("```\n\n")
+    total = sum(range(max(lines - 2, 0)))
+    parts.append("```\n{}\n```\n\n".format(total))
+    return "".join(parts)
+
+
+def session_block(index: int, lines: int) -> str:
+    """Python interactive session with lines >>> statements."""
+    parts = ["```pycon\n"]
+    parts.append(">>> value_{0} = {0}\n".format(index))
+    for j in range(max(lines - 1, 0)):
+        parts.append(">>> value_{0} + {1}\n{2}\n".format(index, j, index + j))
+    parts.append("```\n\n")
+    return "".join(parts)
+
+
+def synthetic_markdown(
+    num_blocks: int,
+    lines: int = 3,
+    directive_density: float = 0.0,
+    session_ratio: float = 0.0,
+    seed: int = 0,
+) -> str:
+    """Markdown with num_blocks Python code blocks and sessions.
+
+    Args:
+        num_blocks
+            Number of code blocks plus sessions.
+
+        lines
+            Lines of Python in each code block or session.
+
+        directive_density
+            Fraction of code blocks with an HTML comment directive
+            and an inline command.
+
+        session_ratio
+            Fraction of the blocks that are sessions.
+
+        seed
+            Seed for the random choices so the text is repeatable.
+    """
+    chooser = random.Random(seed)
+    parts = ["# Synthetic document\n\n"]
+    for i in range(num_blocks):
+        parts.append("Paragraph {} describing the next example.\n\n".format(i))
+        if chooser.random() < session_ratio:
+            parts.append(session_block(i, lines))
+            continue
+        directive = ""
+        if chooser.random() < directive_density:
+            if i % 2:
+                directive = "<!--phmdoctest-share-names-->\n"
+            else:
+                directive = "<!--phmdoctest-label test_block_{}-->\n".format(i)
+        parts.append(code_block(i, lines, directive))
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--directive-density", type=float, default=0.5)
+    parser.add_argument("--session-ratio", type=float, default=0.2)
+    options = parser.parse_args()
+    print(
+        synthetic_markdown(
+            options.blocks,
+            options.lines,
+            options.directive_density,
+            options.session_ratio,
+        ),
+        end="",
+    )
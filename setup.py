@@ -13,6 +13,11 @@ setup(
     entry_points={
         "console_scripts": [
             "phmdoctest=phmdoctest.main:entry_point",
+            "phmdoctest-client=phmdoctest.daemon:client_main",
+            "phmdoctest-server=phmdoctest.daemon:server_main",
+        ],
+        "pytest11": [
+            "phmdoctest = phmdoctest.plugin",
         ],
     },
 )
@@ -1,8 +1,8 @@
 """Compose the pytest test case file."""
-import inspect
 import textwrap
 from io import StringIO
 import itertools
+import json
 from typing import List, Iterator, Optional, Set
 
 import click
@@ -10,7 +10,7 @@ import click
 from phmdoctest.entryargs import Args
 from phmdoctest.direct import Directive, Marker
 from phmdoctest.fenced import Role, FencedBlock
-from phmdoctest import functions
+from phmdoctest import templates
 from phmdoctest.inline import apply_inline_commands
 
 
@@ -105,11 +105,15 @@ def compose_import_lines(
     blocks: List[FencedBlock],
     needs_setup_or_teardown: bool,
     needs_output_checking: bool,
+    needs_profiler: bool = False,
+    needs_session_runner: bool = False,
 ) -> str:
     """Generate import lines for the test file."""
     code_blocks = [b for b in blocks if b.role == Role.CODE]
     needs_fixture = needs_setup_or_teardown or any_names_directives(code_blocks)
-    needs_import_pytest = needs_fixture or has_pytest_mark_decorator(code_blocks)
+    needs_import_pytest = (
+        needs_fixture or needs_profiler or has_pytest_mark_decorator(code_blocks)
+    )
     lines = list()
     if needs_sys(code_blocks):
         lines.append("import sys\n\n")
@@ -117,55 +121,84 @@ def compose_import_lines(
         lines.append("import pytest\n\n")
     if needs_fixture:
         lines.append("from phmdoctest.fixture import managenamespace\n")
-    if needs_output_checking:
+    if needs_output_checking and needs_session_runner:
+        lines.append(
+            "from phmdoctest.functions import _phm_compare_exact, _phm_run_session\n"
+        )
+    elif needs_output_checking:
         lines.append("from phmdoctest.functions import _phm_compare_exact\n")
+    elif needs_session_runner:
+        lines.append("from phmdoctest.functions import _phm_run_session\n")
+    if needs_profiler:
+        lines.append("from phmdoctest.profiler import ExampleProfiler\n")
     return "".join(lines)
 
 
+def indented_block_code(block: FencedBlock, comment_format: str) -> str:
+    """Comment line and block's code after inline commands indented 4 spaces."""
+    code, _ = apply_inline_commands(block.contents)
+    return textwrap.indent(comment_format.format(block.line) + code, "    ")
+
+
 def setup_and_teardown_fixture(
     setup_block: Optional[FencedBlock],
     teardown_block: Optional[FencedBlock],
     setup_doctest: bool,
+    session_tests: bool = False,
 ) -> str:
-    """Add functions to handle setup, teardown and setup for doctest."""
+    """Add functions to handle setup, teardown and setup for doctest.
+
+    The fixture that populates the doctest namespace for the
+    doctests is not needed when the sessions are test functions.
+    """
     assert setup_block or teardown_block, "Must get at least one."
-    src = "\n\n"
     if setup_doctest:
-        src += inspect.getsource(functions._phm_setup_doctest_teardown)
+        template = templates.SETUP_DOCTEST_TEARDOWN
     else:
-        src += inspect.getsource(functions._phm_setup_teardown)
-    # do teardown code replace first so not searching through setup code.
-    if teardown_block:
-        comment = "# teardown code line {}.\n".format(teardown_block.line)
-        code, _ = apply_inline_commands(teardown_block.contents)
-        full_code = comment + code
-        indented_code = textwrap.indent(full_code, "    ")
-        src = src.replace("    # <teardown code here>\n", indented_code, 1)
-
+        template = templates.SETUP_TEARDOWN
+    setup_code = templates.SETUP_SLOT
     if setup_block:
-        comment = "# setup code line {}.\n".format(setup_block.line)
-        code, _ = apply_inline_commands(setup_block.contents)
-        full_code = comment + code
-        indented_code = textwrap.indent(full_code, "    ")
-        src = src.replace("    # <setup code here>\n", indented_code, 1)
+        setup_code = indented_block_code(setup_block, "# setup code line {}.\n")
+    teardown_code = templates.TEARDOWN_SLOT
+    if teardown_block:
+        teardown_code = indented_block_code(
+            teardown_block, "# teardown code line {}.\n"
+        )
+    src = "\n\n" + template.fill(setup_code, teardown_code)
 
     src += "\n\n"
     markspec = 'pytestmark = pytest.mark.usefixtures("{}")\n'
     if setup_doctest:
         src += markspec.format("_phm_setup_doctest_teardown")
+        if session_tests:
+            return src
         # Add in more fixtures.
         # 1. Populate the doctest namespace with values from the setup code.
         # 2. session_00000 makes the names visible to the doctests.
         src += "\n\n"
-        src += functions.populate_doctest_namespace_str
+        src += templates.POPULATE_DOCTEST_NAMESPACE
         src += "\n\n"
-        src += inspect.getsource(functions.session_00000)
+        src += templates.SESSION_00000
     else:
         src += markspec.format("_phm_setup_teardown")
 
     return src
 
 
+def profile_fixtures(profile_json: str, markdown_name: str) -> str:
+    """Create the example profiler and the fixtures that measure the examples."""
+    src = "\n\n_phm_profiler = ExampleProfiler({}, {})\n".format(
+        json.dumps(profile_json), json.dumps(markdown_name)
+    )
+    return src + "\n\n" + templates.PROFILE_EXAMPLES
+
+
+def profile_decorator(block: FencedBlock) -> str:
+    """Decorator that registers the block's test or session function."""
+    kind = "session" if block.role == Role.SESSION else "code"
+    return '@_phm_profiler.example({}, "{}")'.format(block.line, kind)
+
+
 def call_namespace_manager(block: FencedBlock) -> str:
     """Return a code line if there is a share-names or clear-names directive.
 
@@ -217,7 +250,6 @@ def test_case(block: FencedBlock, used_names: Set[str]) -> str:
     The function is named to be collected by pytest as a test case.
     """
     assert block.role == Role.CODE, "must be a Python code block."
-    text = StringIO()
     # The function_name comes from a label directive or is
     # generated from line numbers of the code and output blocks.
     function_name = make_label_unique(get_label_name(block), block.line, used_names)
@@ -233,42 +265,40 @@ def test_case(block: FencedBlock, used_names: Set[str]) -> str:
     expected_output = block.get_output_contents()
     # A 'managed' block has the share-names or clear-names directive.
     managed = block.has_names_directive()
-    text.write("\n")
+    indented_code = textwrap.indent(code, "    ")
     if expected_output:
         if managed:
-            src = inspect.getsource(functions.test_managed_code_and_output)
-            src = src.replace("test_managed_code_and_output", function_name, 1)
-            src += call_namespace_manager(block)
+            template = templates.MANAGED_CODE_AND_OUTPUT
         else:
-            src = inspect.getsource(functions.test_code_and_output)
-            src = src.replace("test_code_and_output", function_name, 1)
-
-        # indent contents of code block and place at <put code here>.
-        indented_code = textwrap.indent(code, "    ")
-        src = src.replace("    # <put code here>\n", indented_code, 1)
-        src = src.replace("<<<replaced>>>", expected_output, 1)
-        text.write(src)
+            template = templates.CODE_AND_OUTPUT
+        src = template.fill(function_name, indented_code, expected_output)
     else:
         # no expected output to check-
         if managed:
-            src = inspect.getsource(functions.test_managed_code_only)
-            src = src.replace("test_managed_code_only", function_name, 1)
-            src += call_namespace_manager(block)
+            template = templates.MANAGED_CODE_ONLY
         else:
-            src = inspect.getsource(functions.test_code_only)
-            src = src.replace("test_code_only", function_name, 1)
-        src = src.replace("    pass\n", "\n    # Caution- no assertions.\n")
+            template = templates.CODE_ONLY
+        src = template.fill(function_name, indented_code)
+    return "".join(["\n", src, call_namespace_manager(block)])
 
-        # indent contents of code block and place at <put code here>.
-        indented_code = textwrap.indent(code, "    ")
-        src = src.replace("    # <put code here>\n", indented_code, 1)
-        text.write(src)
 
-    return text.getvalue()
+def session_function_name(
+    block: FencedBlock, session_counter: Iterator[int], used_names: Set[str]
+) -> str:
+    """Name from a label directive or the session sequence number and line."""
+    function_name = make_label_unique(get_label_name(block), block.line, used_names)
+    if not function_name:
+        sequence_number = next(session_counter)
+        sequence_string = format(sequence_number, "05d")
+        function_name = "session_{}_line_{}".format(sequence_string, block.line)
+    return function_name
 
 
 def interactive_session(
-    block: FencedBlock, session_counter: Iterator[int], used_names: Set[str]
+    block: FencedBlock,
+    session_counter: Iterator[int],
+    used_names: Set[str],
+    decorator: str = "",
 ) -> str:
     """Add a do nothing function with doctest session as its docstring.
 
@@ -276,37 +306,73 @@ def interactive_session(
     its docstring and a function name that prevents it from being
     collected as a test case.
     Run pytest with --doctest-modules to run doctest on the session.
+    A decorator, if not empty, is written on the line before the function.
     """
     assert block.role == Role.SESSION, "must be interactive session block."
 
     # The function_name comes from a label directive or is
     # generated from line number of the interactive session block.
-    function_name = make_label_unique(get_label_name(block), block.line, used_names)
-    if not function_name:
-        sequence_number = next(session_counter)
-        sequence_string = format(sequence_number, "05d")
-        function_def = "def session_{}_line_{}():\n".format(sequence_string, block.line)
-    else:
-        function_def = "def " + function_name + "():\n"
-
+    function_name = session_function_name(block, session_counter, used_names)
     indented_session = textwrap.indent(block.contents, "    ")
     text = StringIO()
     text.write("\n")
-    text.write(function_def)
+    if decorator:
+        text.write(decorator + "\n")
+    text.write("def " + function_name + "():\n")
     text.write('    r"""\n')
     text.write(indented_session)
     text.write('    """\n')
     return text.getvalue()
 
 
+def session_test(
+    block: FencedBlock,
+    session_counter: Iterator[int],
+    used_names: Set[str],
+    markdown_name: str,
+    decorator: str = "",
+) -> str:
+    """Add a def test_ function that runs the session with doctest.
+
+    The session is a string in the function, not a docstring,
+    so pytest --doctest-modules does not run it a second time.
+    The function name is prefixed by test_ if needed so that
+    pytest collects it.
+    A decorator, if not empty, is written on the line before the function.
+    """
+    assert block.role == Role.SESSION, "must be interactive session block."
+    function_name = session_function_name(block, session_counter, used_names)
+    if not function_name.startswith("test"):
+        function_name = "test_" + function_name
+    indented_session = textwrap.indent(block.contents, "    ")
+    text = StringIO()
+    text.write("\n")
+    if decorator:
+        text.write(decorator + "\n")
+    text.write("def " + function_name + "(request):\n")
+    text.write('    _phm_session = r"""\n')
+    text.write(indented_session)
+    text.write('    """\n')
+    text.write(
+        "    _phm_run_session(request, _phm_session, _phm_globals, {}, {})\n".format(
+            json.dumps(markdown_name), block.line
+        )
+    )
+    return text.getvalue()
+
+
 def build_test_cases(args: Args, blocks: List[FencedBlock]) -> str:
     """Generate test code from the Python fenced code blocks."""
+    return "".join(generate_test_cases(args, blocks))
 
-    # Keeps track of test case function names set by label directives.
-    used_names = set()  # type: Set[str]
 
-    # Sequence number to order sessions.
-    session_counter = itertools.count(1)
+def generate_test_cases(args: Args, blocks: List[FencedBlock]) -> Iterator[str]:
+    """Generate test code from the Python fenced code blocks in chunks.
+
+    Yields the module docstring and imports, then each generated
+    function separately so the caller can write the chunks as they
+    are generated.
+    """
 
     # create the generated test file docstring.
     built_from = args.built_from
@@ -316,8 +382,7 @@ def build_test_cases(args: Args, blocks: List[FencedBlock]) -> str:
         quoted_path = repr(click.format_filename(args.markdown_file))
         built_from = quoted_path[1:-1]
     docstring_text = "pytest file built from {}".format(built_from)
-    generated = StringIO()  # collect the generated code in a single string
-    generated.write('"""' + docstring_text + '"""\n')
+    yield '"""' + docstring_text + '"""\n'
 
     setup_block = get_block_with_role(blocks, Role.SETUP)
     teardown_block = get_block_with_role(blocks, Role.TEARDOWN)
@@ -325,38 +390,72 @@ def build_test_cases(args: Args, blocks: List[FencedBlock]) -> str:
     needs_setup_or_teardown = (setup_block or teardown_block) is not None
     needs_output_check = get_block_with_role(blocks, Role.OUTPUT) is not None
 
-    generated.write(
-        compose_import_lines(blocks, needs_setup_or_teardown, needs_output_check)
+    profile = bool(args.profile_json)
+    session_tests = bool(args.session_tests) and (
+        get_block_with_role(blocks, Role.SESSION) is not None
+    )
+    yield compose_import_lines(
+        blocks, needs_setup_or_teardown, needs_output_check, profile, session_tests
     )
 
     # fixture to handle setup and/or teardown and code for setup doctest
     if needs_setup_or_teardown:
-        generated.write(
-            setup_and_teardown_fixture(
-                setup_block=setup_block,
-                teardown_block=teardown_block,
-                setup_doctest=args.setup_doctest,
-            )
+        yield setup_and_teardown_fixture(
+            setup_block=setup_block,
+            teardown_block=teardown_block,
+            setup_doctest=args.setup_doctest,
+            session_tests=session_tests,
         )
 
-    number_of_test_cases = 0
-    for block in blocks:
-        if block.role == Role.CODE:
-            generated.write("\n")
-            add_pytest_mark_decorator(generated, block)
-            generated.write(test_case(block, used_names))
-            number_of_test_cases += 1
+    # fixtures to measure each example when the test file runs
+    markdown_name = args.built_from or click.format_filename(args.markdown_file)
+    if profile:
+        yield profile_fixtures(args.profile_json, markdown_name)
 
-        elif block.role == Role.SESSION:
-            generated.write("\n")
-            generated.write(interactive_session(block, session_counter, used_names))
-            number_of_test_cases += 1
+    number_of_test_cases = 0
+    for chunk in test_functions(args, blocks, markdown_name):
+        yield chunk
+        number_of_test_cases += 1
 
     if number_of_test_cases == 0:
         if args.fail_nocode:
-            nocode_func = functions.test_nothing_fails
+            yield "\n\n" + templates.NOTHING_FAILS
         else:
-            nocode_func = functions.test_nothing_passes
-        generated.write("\n\n")
-        generated.write(inspect.getsource(nocode_func))
-    return generated.getvalue()
+            yield "\n\n" + templates.NOTHING_PASSES
+
+    # the sessions get a copy of the module's globals like doctests do
+    if session_tests:
+        yield "\n\n" + templates.SESSION_GLOBALS
+
+
+def test_functions(
+    args: Args, blocks: List[FencedBlock], markdown_name: str
+) -> Iterator[str]:
+    """Generate the function of each Python code block and session block."""
+
+    # Keeps track of test case function names set by label directives.
+    used_names = set()  # type: Set[str]
+
+    # Sequence number to order sessions.
+    session_counter = itertools.count(1)
+
+    profile = bool(args.profile_json)
+    for block in blocks:
+        if block.role == Role.CODE:
+            decorators = StringIO()
+            decorators.write("\n")
+            add_pytest_mark_decorator(decorators, block)
+            if profile:
+                decorators.write("\n" + profile_decorator(block))
+            yield decorators.getvalue() + test_case(block, used_names)
+
+        elif block.role == Role.SESSION:
+            decorator = profile_decorator(block) if profile else ""
+            if args.session_tests:
+                yield "\n" + session_test(
+                    block, session_counter, used_names, markdown_name, decorator
+                )
+            else:
+                yield "\n" + interactive_session(
+                    block, session_counter, used_names, decorator
+                )
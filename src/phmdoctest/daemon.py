@@ -0,0 +1,382 @@
+"""Long running generation server on a Unix socket and its thin client.
+
+The server imports phmdoctest once and keeps the parse caches warm.
+Each request is one line of JSON sent over a new connection.
+The reply is one line of JSON.
+
+    {"request": "command", "argv": [...], "cwd": "...", "input": "..."}
+        Run the phmdoctest command line in cwd. input is standard input
+        for MARKDOWN_FILE "-". Reply has stdout, stderr, exit_code.
+    {"request": "testfile", "cwd": "...", "kwargs": {...}}
+        Call phmdoctest.main.testfile(**kwargs). Reply has testfile.
+    {"request": "ping"}
+        Reply has version and pid.
+    {"request": "shutdown"}
+        Stop after replying.
+
+A reply with an error key reports a request that could not be handled.
+
+Only the user who started the server can use it. The default socket is
+in $XDG_RUNTIME_DIR or in a directory in the temp directory that only
+the user can access. The client and the server check that the socket
+and the process on the other end belong to the user.
+This module imports only the standard library so that the client
+starts quickly. phmdoctest.main is imported when first needed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+
+SOCKET_ENVIRONMENT_VARIABLE = "PHMDOCTEST_SOCKET"
+"""Environment variable with the path of the server's socket."""
+
+
+def default_socket_path() -> str:
+    """Socket path from the environment or in a directory private to the user.
+
+    The directory is $XDG_RUNTIME_DIR if set or else phmdoctest-UID
+    in the temp directory. The server creates phmdoctest-UID.
+    """
+    path = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    if path:
+        return path
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory:
+        return os.path.join(runtime_directory, "phmdoctest.sock")
+    getuid = getattr(os, "getuid", None)  # Not on Windows.
+    name = "phmdoctest-{}".format(getuid()) if getuid else "phmdoctest"
+    return os.path.join(tempfile.gettempdir(), name, "server.sock")
+
+
+def _make_private_directory(directory: str) -> None:
+    """Create the directory only the user can access or check the existing one.
+
+    Raises:
+        RuntimeError if the directory belongs to another user or
+        other users can access it.
+    """
+    with contextlib.suppress(FileExistsError):
+        os.mkdir(directory, 0o700)
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise RuntimeError(
+            f"phmdoctest- {directory} must be a directory only you can access."
+        )
+
+
+def _owned_socket(socket_path: str) -> bool:
+    """True if the path is a socket that belongs to the user."""
+    try:
+        info = os.lstat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def _peer_is_user(connection: socket.socket) -> bool:
+    """True if the process on the other end of the connection is the user's.
+
+    Uses SO_PEERCRED where available. Elsewhere the owner of the
+    socket file is relied on.
+    """
+    option = getattr(socket, "SO_PEERCRED", None)
+    if option is None:
+        return True
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, option, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    return bool(uid == os.getuid())
+
+
+@contextlib.contextmanager
+def _in_directory(directory: str) -> Iterator[None]:
+    """Change the working directory and change back."""
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _text_stream(text: str = "") -> io.TextIOWrapper:
+    """Text stream with a binary buffer like sys.stdin and sys.stdout."""
+    return io.TextIOWrapper(io.BytesIO(text.encode("utf-8")), encoding="utf-8")
+
+
+def _stream_text(stream: io.TextIOWrapper) -> str:
+    stream.flush()
+    buffer = stream.buffer
+    assert isinstance(buffer, io.BytesIO)
+    return buffer.getvalue().decode("utf-8")
+
+
+def run_command(argv: List[str], stdin_text: str = "") -> Dict[str, Any]:
+    """Run the phmdoctest command line in this process and capture its output.
+
+    Returns:
+        Dict with stdout, stderr, and exit_code.
+    """
+    import click
+
+    import phmdoctest.main
+
+    stdin, stdout, stderr = _text_stream(stdin_text), _text_stream(), _text_stream()
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+    try:
+        exit_code = phmdoctest.main.entry_point.main(
+            args=argv, prog_name="phmdoctest", standalone_mode=False
+        )
+    except click.ClickException as exc:
+        exc.show()
+        exit_code = exc.exit_code
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        exit_code = 1
+    except SystemExit as exc:
+        exit_code = exc.code
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+    return {
+        "stdout": _stream_text(stdout),
+        "stderr": _stream_text(stderr),
+        "exit_code": exit_code if isinstance(exit_code, int) else 0,
+    }
+
+
+class GenerationServer:
+    """Answer requests on a Unix socket one at a time."""
+
+    def __init__(
+        self, socket_path: Optional[str] = None, idle_timeout: Optional[float] = None
+    ) -> None:
+        """Listen on the socket. Only the current user may connect.
+
+        Args:
+            socket_path
+                Path of the socket. None means default_socket_path().
+
+            idle_timeout
+                Stop after this many seconds without a request.
+                None means never.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        if socket_path is None and not os.environ.get(SOCKET_ENVIRONMENT_VARIABLE):
+            _make_private_directory(os.path.dirname(self.socket_path))
+        if send({"request": "ping"}, self.socket_path) is not None:
+            raise RuntimeError(f"phmdoctest- a server is already on {self.socket_path}")
+        if _owned_socket(self.socket_path):
+            os.unlink(self.socket_path)  # left behind by a server that died
+        elif os.path.lexists(self.socket_path):
+            raise RuntimeError(
+                f"phmdoctest- {self.socket_path} exists and is not your socket."
+            )
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self.listener.listen(8)
+        self.listener.settimeout(idle_timeout)
+        self.stopping = False
+        # Import before the first request to warm up.
+        import phmdoctest.main  # noqa: F401
+
+    def serve(self) -> None:
+        """Handle requests until shutdown or idle timeout then close."""
+        try:
+            while not self.stopping:
+                try:
+                    connection, _ = self.listener.accept()
+                except socket.timeout:
+                    break
+                with connection:
+                    if _peer_is_user(connection):
+                        self.handle(connection)
+        finally:
+            self.close()
+
+    def handle(self, connection: socket.socket) -> None:
+        """Read one request from the connection and send the reply."""
+        connection.settimeout(None)
+        with connection.makefile("rb") as reader:
+            line = reader.readline()
+        try:
+            reply = self.respond(json.loads(line.decode("utf-8")))
+        except Exception as exc:
+            reply = {"error": f"phmdoctest- server error: {exc!r}"}
+        connection.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Reply to a request."""
+        kind = request.get("request")
+        if kind == "ping":
+            import phmdoctest
+
+            return {"version": phmdoctest.__version__, "pid": os.getpid()}
+        if kind == "shutdown":
+            self.stopping = True
+            return {}
+        if kind == "command":
+            with _in_directory(request["cwd"]):
+                return run_command(request["argv"], request.get("input", ""))
+        if kind == "testfile":
+            import click
+
+            import phmdoctest.main
+
+            with _in_directory(request["cwd"]):
+                try:
+                    return {"testfile": phmdoctest.main.testfile(**request["kwargs"])}
+                except click.ClickException as exc:
+                    return {"error": exc.format_message()}
+        return {"error": f"phmdoctest- unknown request {kind!r}"}
+
+    def close(self) -> None:
+        self.listener.close()
+        if _owned_socket(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def send(
+    request: Dict[str, Any], socket_path: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Send the request to the server and return the reply.
+
+    Returns:
+        None if no server is listening on the socket.
+    """
+    connection = _connect(socket_path or default_socket_path())
+    if connection is None:
+        return None
+    with connection:
+        return _exchange(connection, request)
+
+
+def _connect(socket_path: str) -> Optional[socket.socket]:
+    """Connected socket or None if none of the user's servers is listening.
+
+    A socket or a server process that belongs to another user is
+    not trusted and is treated as no server.
+    """
+    family = getattr(socket, "AF_UNIX", None)
+    if family is None or not _owned_socket(socket_path):
+        return None
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    if not _peer_is_user(connection):
+        connection.close()
+        return None
+    return connection
+
+
+def _exchange(connection: socket.socket, request: Dict[str, Any]) -> Dict[str, Any]:
+    connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+    with connection.makefile("rb") as reader:
+        reply: Dict[str, Any] = json.loads(reader.readline().decode("utf-8"))
+    return reply
+
+
+def testfile(
+    markdown_file: str = "", socket_path: Optional[str] = None, **kwargs: Any
+) -> str:
+    """phmdoctest.main.testfile() run by the server or in this process.
+
+    The keyword arguments are the same as phmdoctest.main.testfile().
+    Runs in this process when no server is listening.
+    """
+    kwargs["markdown_file"] = markdown_file
+    request = {"request": "testfile", "cwd": os.getcwd(), "kwargs": kwargs}
+    reply = send(request, socket_path)
+    if reply is None:
+        import phmdoctest.main
+
+        return phmdoctest.main.testfile(**kwargs)
+    if "error" in reply:
+        import click
+
+        raise click.ClickException(reply["error"])
+    return str(reply["testfile"])
+
+
+def client_main(argv: Optional[List[str]] = None) -> None:
+    """phmdoctest-client entry point. Same arguments as phmdoctest.
+
+    The server runs the command when one is listening.
+    Otherwise the command runs in this process.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    connection = None
+    if "--watch" not in argv:  # Would keep the server busy.
+        connection = _connect(default_socket_path())
+    if connection is None:
+        import phmdoctest.main
+
+        phmdoctest.main.entry_point.main(args=argv, prog_name="phmdoctest")
+        return
+    request = {"request": "command", "argv": argv, "cwd": os.getcwd()}
+    if "-" in argv:
+        request["input"] = sys.stdin.read()
+    with connection:
+        reply = _exchange(connection, request)
+    if "error" in reply:
+        sys.stderr.write(reply["error"] + "\n")
+        sys.exit(1)
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    sys.exit(reply["exit_code"])
+
+
+def server_main(argv: Optional[List[str]] = None) -> None:
+    """phmdoctest-server entry point."""
+    parser = argparse.ArgumentParser(
+        prog="phmdoctest-server",
+        description="Serve phmdoctest-client requests on a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help=f"Socket path. Default is ${SOCKET_ENVIRONMENT_VARIABLE} or"
+        f" {default_socket_path()}.",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=None,
+        help="Stop after this many seconds without a request.",
+    )
+    parser.add_argument("--stop", action="store_true", help="Stop the running server.")
+    options = parser.parse_args(argv)
+    if options.stop:
+        if send({"request": "shutdown"}, options.socket) is None:
+            sys.exit("phmdoctest- no server is running.")
+        return
+    try:
+        server = GenerationServer(options.socket, options.idle_timeout)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    print(f"phmdoctest- serving on {server.socket_path}", file=sys.stderr)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
@@ -62,43 +62,46 @@ def extract_value(literal: str, marker: Marker) -> str:
     return text.strip()
 
 
-def find_one_directive(node: commonmark.node) -> Optional[Directive]:
-    """Get a phmdoctest Directive instance from a HTML comment node."""
-    assert node.t == "html_block", "Must be HTML"
-    assert node.html_block_type == 2, "Must be a HTML comment"
+def find_directive_in_literal(literal: str, line: int) -> Optional[Directive]:
+    """Get a phmdoctest Directive instance from a HTML comment literal."""
     for marker in Marker:
-        if node.literal == marker.value:
-            return Directive(
-                type=marker, value="", line=node.sourcepos[0][0], literal=node.literal
-            )
-        elif node.literal.startswith(Marker.LABEL.value):
+        if literal == marker.value:
+            return Directive(type=marker, value="", line=line, literal=literal)
+        elif literal.startswith(Marker.LABEL.value):
             # The label marker carries a value.
             return Directive(
                 type=Marker.LABEL,
-                value=extract_value(node.literal, Marker.LABEL),
-                line=node.sourcepos[0][0],
-                literal=node.literal,
+                value=extract_value(literal, Marker.LABEL),
+                line=line,
+                literal=literal,
             )
-        elif node.literal.startswith(Marker.PYTEST_SKIPIF.value):
+        elif literal.startswith(Marker.PYTEST_SKIPIF.value):
             return Directive(
                 type=Marker.PYTEST_SKIPIF,
-                value=extract_value(node.literal, Marker.PYTEST_SKIPIF),
-                line=node.sourcepos[0][0],
-                literal=node.literal,
+                value=extract_value(literal, Marker.PYTEST_SKIPIF),
+                line=line,
+                literal=literal,
             )
         elif (
-            node.literal.startswith(Marker.PYTEST_MARK.value)
-            and node.literal not in SKIP_MARKER_VALUES
+            literal.startswith(Marker.PYTEST_MARK.value)
+            and literal not in SKIP_MARKER_VALUES
         ):
             return Directive(
                 type=Marker.PYTEST_MARK,
-                value=extract_value(node.literal, Marker.PYTEST_MARK),
-                line=node.sourcepos[0][0],
-                literal=node.literal,
+                value=extract_value(literal, Marker.PYTEST_MARK),
+                line=line,
+                literal=literal,
             )
     return None
 
 
+def find_one_directive(node: commonmark.node) -> Optional[Directive]:
+    """Get a phmdoctest Directive instance from a HTML comment node."""
+    assert node.t == "html_block", "Must be HTML"
+    assert node.html_block_type == 2, "Must be a HTML comment"
+    return find_directive_in_literal(node.literal, node.sourcepos[0][0])
+
+
 def get_directives(node: commonmark.node.Node) -> List[Directive]:
     """Scan adjacent preceding HTML comments for phmdoctest markers."""
 
@@ -0,0 +1,67 @@
+"""Markdown file read and parsed once for detection and test generation."""
+from io import StringIO
+from pathlib import Path
+from typing import Optional
+
+import click
+
+import phmdoctest.fenced
+import phmdoctest.scanner
+import phmdoctest.tool
+
+
+class Document:
+    """Fenced code blocks of a Markdown file parsed exactly once.
+
+    The same FencedBlock objects are used to detect Python examples,
+    assign roles, and build the test cases.  Assigning roles changes
+    the blocks so a Document is used to generate one test file.
+    """
+
+    def __init__(
+        self, markdown_file: str, fast_scan: bool = False, text: Optional[str] = None
+    ) -> None:
+        """Read and parse the Markdown file.
+
+        Args:
+            markdown_file
+                Path to the Markdown input file. "-" reads standard input.
+
+            fast_scan
+                Find fenced code blocks with phmdoctest.scanner
+                instead of the commonmark parser.
+
+            text
+                Contents of markdown_file if the caller already read it.
+        """
+        self.markdown_file = markdown_file
+        if text is None and markdown_file != "-":
+            # A file parsed earlier in this process is not parsed again.
+            nodes = phmdoctest.tool.cached_fenced_nodes(markdown_file, fast_scan)
+        else:
+            if text is None:
+                with click.open_file(markdown_file, "r", encoding="utf-8") as fp:
+                    text = fp.read()
+            if fast_scan:
+                nodes = phmdoctest.scanner.scan_text(text)
+            else:
+                nodes = phmdoctest.tool.fenced_block_nodes(StringIO(text))
+        if fast_scan:
+            self.blocks = phmdoctest.fenced.convert_scanned(nodes)
+        else:
+            self.blocks = phmdoctest.fenced.convert_nodes(nodes)
+        python_examples = phmdoctest.tool.python_examples_in(nodes)
+        self.has_code = python_examples.has_code
+        self.has_session = python_examples.has_session
+
+    @property
+    def path(self) -> Path:
+        """The Markdown file as a pathlib.Path."""
+        return Path(self.markdown_file)
+
+    def python_examples(self) -> "phmdoctest.tool.PythonExamples":
+        """Return presence of Python fenced code blocks in the Markdown."""
+        return phmdoctest.tool.PythonExamples(
+            has_code=self.has_code,
+            has_session=self.has_session,
+        )
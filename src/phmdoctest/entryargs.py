@@ -14,6 +14,10 @@ Args = namedtuple(
         "teardown",
         "setup_doctest",
         "built_from",
+        "fast_scan",
+        "skip_regexes",
+        "profile_json",
+        "session_tests",
     ],
 )
 """Command line arguments with some renames."""
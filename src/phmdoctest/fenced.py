@@ -6,6 +6,7 @@ from typing import List, Optional
 
 import commonmark.node  # type: ignore
 import phmdoctest.direct
+import phmdoctest.scanner
 
 
 class Role(Enum):
@@ -27,15 +28,25 @@ class Role(Enum):
 class FencedBlock:
     """Augment selected fields from commonmark node."""
 
-    def __init__(self, node: commonmark.node.Node) -> None:
-        """Extract fields from commonmark fenced code block node."""
+    def __init__(
+        self,
+        node: commonmark.node.Node,
+        directives: Optional[List[phmdoctest.direct.Directive]] = None,
+    ) -> None:
+        """Extract fields from commonmark fenced code block node.
+
+        The node may also be a phmdoctest.scanner.ScannedNode which
+        carries its own directives.
+        """
         self.type = node.info
         self.line = node.sourcepos[0][0] + 1
         self.role = Role.UNKNOWN
         self.contents = node.literal  # type: str
         self.output = None  # type: Optional["FencedBlock"]
         self.patterns = list()  # type: List[str]
-        self.directives = phmdoctest.direct.get_directives(node)
+        if directives is None:
+            directives = phmdoctest.direct.get_directives(node)
+        self.directives = directives
         self._directive_markers = set(d.type for d in self.directives)
 
     def __str__(self) -> str:
@@ -120,3 +131,11 @@ def convert_nodes(nodes: List[commonmark.node.Node]) -> List[FencedBlock]:
     for node in nodes:
         blocks.append(FencedBlock(node))
     return blocks
+
+
+def convert_scanned(nodes: List[phmdoctest.scanner.ScannedNode]) -> List[FencedBlock]:
+    """Create FencedBlock objects from scanner fenced code blocks."""
+    blocks = []
+    for node in nodes:
+        blocks.append(FencedBlock(node, node.directives))
+    return blocks
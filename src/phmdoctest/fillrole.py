@@ -8,6 +8,7 @@ import commonmark.node  # type: ignore
 from phmdoctest.direct import Marker
 from phmdoctest.entryargs import Args
 from phmdoctest.fenced import Role, FencedBlock
+import phmdoctest.skipmatch
 
 
 PYTHON_FLAVORS = ["python", "py3", "python3"]
@@ -83,10 +84,14 @@ def del_problem_blocks(blocks: List[FencedBlock]) -> None:
 def apply_skips(args: Args, blocks: List[FencedBlock]) -> None:
     """Designate Python code/session blocks that are exempt from testing."""
     # Do skip requests from the command line.
-    for pattern in args.skips:
-        found = findall(pattern, blocks)
-        for block in found:
-            block.skip(pattern)
+    # All the patterns are searched for in one pass over each block.
+    matcher = phmdoctest.skipmatch.skip_matcher(
+        tuple(args.skips), tuple(args.skip_regexes)
+    )
+    matches = matcher.matches([block.contents for block in blocks])
+    for pattern, indexes in zip(matcher.patterns, matches):
+        for index in indexes:
+            blocks[index].skip(pattern)
     # Do skip requests marked as a skip directive on the block.
     for block in blocks:
         for directive in block.directives:
@@ -1,12 +1,22 @@
 """Pytest fixture imported by generated code."""
 import inspect
 import logging
+import os
 
 import pytest
 
 # mypy: ignore_errors
 
 
+FULL_INTEGRITY_CHECK = os.environ.get("PHMDOCTEST_FULL_INTEGRITY", "") not in ["", "0"]
+"""Compare all the module's attributes after every update. For debugging.
+
+Set by the environment variable PHMDOCTEST_FULL_INTEGRITY=1.
+Otherwise only the number of module attributes and the added names
+are checked. The full check runs when that check fails.
+"""
+
+
 @pytest.fixture(scope="module")
 def managenamespace(request):
     """Create and manipulate namespace implemented in the module."""
@@ -18,7 +28,11 @@ def managenamespace(request):
     no_originals = "phmdoctest- no original module attributes allowed in namespace."
     no_extras = "phmdoctest- current attributes == original + namespace."
     m = request.module
-    original_attributes = set([name for name, _ in inspect.getmembers(m)])
+    full_check = FULL_INTEGRITY_CHECK
+    if full_check:
+        original_attributes = set([name for name, _ in inspect.getmembers(m)])
+    else:
+        original_attributes = set(vars(m))
     namespace_names = set()
 
     def check_attribute_name(name):
@@ -30,9 +44,27 @@ def managenamespace(request):
         if name in original_attributes:
             raise AttributeError(already_exists.format(name))
 
+    def check_added(names):
+        """Check only the number of module attributes and the added names.
+
+        The module's attributes are compared by check_integrity()
+        if the number is not the original plus namespace or
+        full_check is set.
+        """
+        attributes = vars(m)
+        if (
+            full_check
+            or len(attributes) != len(original_attributes) + len(namespace_names)
+            or not all(name in attributes for name in names)
+        ):
+            check_integrity()
+
     def check_integrity():
         """Check module's attributes are original or in the namespace."""
-        current_attributes = set([name for name, _ in inspect.getmembers(m)])
+        if full_check:
+            current_attributes = set([name for name, _ in inspect.getmembers(m)])
+        else:
+            current_attributes = set(vars(m))
         if not original_attributes.isdisjoint(namespace_names):
             raise AttributeError(no_originals)
         if current_attributes != original_attributes.union(namespace_names):
@@ -40,8 +72,9 @@ def managenamespace(request):
 
     def show_namespace():
         """Log the names currently in the namespace."""
-        names = ", ".join(namespace_names)
-        logging.debug("manager- namespace= %s", names)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            names = ", ".join(namespace_names)
+            logging.debug("manager- namespace= %s", names)
 
     def manager(operation, additions=None):
         """Maintain namespace with update, copy, and clear operations.
@@ -112,7 +145,7 @@ def managenamespace(request):
                 check_attribute_name(k)
                 setattr(m, k, v)
                 namespace_names.add(k)
-            check_integrity()
+            check_added(additions)
             show_namespace()
         else:
             raise ValueError(
@@ -1,23 +1,149 @@
 """Functions customized and copied into generated code."""
 import difflib
-from itertools import zip_longest
+import doctest
+import itertools
+import os
+import re
 
 import pytest
 
 # mypy: ignore_errors
 
 
+DIFF_LINE_LIMIT = int(os.environ.get("PHMDOCTEST_DIFF_LINES", "200"))
+"""Most lines printed by _phm_compare_exact() for a long output mismatch.
+
+Set by the environment variable PHMDOCTEST_DIFF_LINES.
+"""
+
+
 # The function below is imported into the generated python source.
-def _phm_compare_exact(a, b):
-    """Line by line helper compare function with assertion for pytest."""
+def _phm_compare_exact(a, b, max_diff_lines=None):
+    """Line by line helper compare function with assertion for pytest.
+
+    Identical strings are not split into lines.
+    When the outputs have max_diff_lines lines or fewer the
+    difference is printed by difflib.ndiff. For longer outputs the
+    first differing line and a unified diff limited to max_diff_lines
+    lines are printed.  max_diff_lines defaults to DIFF_LINE_LIMIT.
+    """
+    if a == b:
+        return
     a_lines = a.splitlines()
     b_lines = b.splitlines()
-    for a_line, b_line in zip_longest(a_lines, b_lines):
-        if a_line != b_line:
-            diffs = difflib.ndiff(a_lines, b_lines)
-            for line in diffs:
-                print(line)
-            assert False
+    if a_lines == b_lines:
+        return
+    if max_diff_lines is None:
+        max_diff_lines = DIFF_LINE_LIMIT
+    if len(a_lines) + len(b_lines) <= max_diff_lines:
+        diffs = difflib.ndiff(a_lines, b_lines)
+        for line in diffs:
+            print(line)
+    else:
+        _phm_print_bounded_diff(a_lines, b_lines, max_diff_lines)
+    assert False
+
+
+def _phm_print_bounded_diff(a_lines, b_lines, max_diff_lines, context=3):
+    """Print the first differing line and a unified diff of max_diff_lines lines.
+
+    Only a window of max_diff_lines lines starting at the first
+    difference is compared so the cost does not grow with the output.
+    """
+    common = min(len(a_lines), len(b_lines))
+    first = 0
+    while first < common and a_lines[first] == b_lines[first]:
+        first += 1
+    last = 0  # number of equal lines at the end
+    while last < common - first and a_lines[-1 - last] == b_lines[-1 - last]:
+        last += 1
+    print(
+        "phmdoctest- first difference at output line {}."
+        " expected has {} lines, got {} lines.".format(
+            first + 1, len(a_lines), len(b_lines)
+        )
+    )
+    low = max(0, first - context)
+    a_high = min(len(a_lines) - last + context, low + max_diff_lines)
+    b_high = min(len(b_lines) - last + context, low + max_diff_lines)
+    diffs = difflib.unified_diff(
+        a_lines[low:a_high],
+        b_lines[low:b_high],
+        fromfile="expected",
+        tofile="got",
+        lineterm="",
+        n=context,
+    )
+    for line in itertools.islice(diffs, max_diff_lines):
+        if line.startswith("@@"):
+            line = _phm_shift_hunk_header(line, low)
+        print(line)
+    stopped = a_high < len(a_lines) - last or b_high < len(b_lines) - last
+    if stopped or next(diffs, None) is not None:
+        print("phmdoctest- diff stopped after {} lines.".format(max_diff_lines))
+
+
+def _phm_shift_hunk_header(line, offset):
+    """Add offset to the line numbers in a unified diff @@ hunk header."""
+
+    def shift(match):
+        return match.group(1) + str(int(match.group(2)) + offset)
+
+    return re.sub(r"([-+])(\d+)", shift, line, count=2)
+
+
+_PHM_DOCTEST_PARSER = doctest.DocTestParser()
+"""Parser shared by the sessions run by _phm_run_session()."""
+
+_phm_doctest_runners = {}
+"""DocTestRunner shared by the sessions keyed by option flags."""
+
+
+# The function below is imported into the generated python source.
+def _phm_run_session(request, session, globs, markdown_file, line):
+    """Run a Python interactive session with doctest in a pytest test function.
+
+    The session runs like it does with pytest --doctest-modules.
+    The globals are a copy of globs updated by the doctest_namespace
+    fixture. getfixture() is available. The option flags are from
+    the pytest doctest_optionflags ini setting. pytest only flags
+    like NUMBER are ignored.
+
+    Args:
+        request
+            pytest request fixture of the test function.
+
+        session
+            Python interactive session block contents.
+
+        globs
+            Module globals when the module was imported.
+
+        markdown_file
+            Markdown file path shown in the failure report.
+
+        line
+            Markdown line of the first line of the session.
+    """
+    globs = dict(globs)
+    globs.update(request.getfixturevalue("doctest_namespace"))
+    globs["getfixture"] = request.getfixturevalue
+    # doctest adds 1 to the 0 based line of the example. The session
+    # starts with a newline so its first example is at line 1.
+    test = _PHM_DOCTEST_PARSER.get_doctest(
+        session, globs, request.node.name, markdown_file, line - 2
+    )
+    flags = 0
+    for name in request.config.getini("doctest_optionflags"):
+        flags |= doctest.OPTIONFLAGS_BY_NAME.get(name, 0)
+    runner = _phm_doctest_runners.get(flags)
+    if runner is None:
+        runner = doctest.DocTestRunner(verbose=False, optionflags=flags)
+        _phm_doctest_runners[flags] = runner
+    report = []
+    result = runner.run(test, out=report.append)
+    if result.failed:
+        pytest.fail("".join(report), pytrace=False)
 
 
 # The functions below are used as a template to generate python source
@@ -110,3 +236,27 @@ def session_00000():
     r"""
     >>> getfixture('populate_doctest_namespace')
     """
+
+
+# Fixtures that measure each example and save the measurements.
+# _phm_profiler is assigned just before them in the generated code.
+# This code is included only if phmdoctest option --profile-json.
+profile_examples_str = """\
+@pytest.fixture(autouse=True)
+def _phm_profile_example(request, _phm_profile_save):
+    with _phm_profiler.measure(request.node.name):
+        yield
+
+
+@pytest.fixture(scope="module")
+def _phm_profile_save():
+    yield
+    _phm_profiler.save()
+"""
+
+
+# Module globals copied at the end of the import for the sessions.
+# This code is included only if phmdoctest option --session-tests.
+session_globals_str = """\
+_phm_globals = dict(globals())
+"""
@@ -1,41 +1,33 @@
 """Rewrite code as directed by inline commands in comments."""
-import re
 from typing import List, Tuple
 
 
 def starts_with_comment(line: str) -> bool:
     """True if string starts with zero or more whitespace then # char."""
-    return re.match(pattern=r"^\s*#", string=line) is not None
+    return line.lstrip().startswith("#")
 
 
 def num_newlines_at_end(code: str) -> int:
     """Return the number of consecutive newlines at the end of the string."""
-    m = re.search(pattern=r"(\n*)$", string=code)
-    consecutive = 0
-    if m:
-        consecutive = len(m.group(1))
-    return consecutive
+    return len(code) - len(code.rstrip("\n"))
 
 
 def num_indented(line: str) -> int:
     """Number of spaces the string is indented if indented with only spaces."""
-    m = re.match(pattern=r"^(\s*)\S", string=line)
-    indentation = 0
-    if m:
-        indentation = len(m.group(1))
-    return indentation
+    right_side = line.lstrip()
+    if right_side:
+        return len(line) - len(right_side)
+    return 0
 
 
 def isblank(line: str) -> bool:
     """True if the entire string is whitespace."""
-    m = re.match(pattern=r"^\s*$", string=line)
-    return m is not None
+    return not line.strip()
 
 
 def is_empty_comment(line: str) -> bool:
     """True if the string is just one # and the rest whitespace."""
-    despaced = re.sub(r"\s*", "", string=line)
-    return despaced == "#"
+    return line.strip() == "#"
 
 
 def has_inline_omit(line: str) -> bool:
@@ -68,6 +60,21 @@ class BlockCommenter:
         """Add line to list of lines to be commented out."""
         self.block.append(line)
 
+    def takes(self, line: str) -> bool:
+        """Add line if it continues the block. False if line ends the block."""
+        # A blank line has no indent level.
+        # It may have some stray spaces.  These are removed.
+        if isblank(line):
+            self.add("")
+            return True
+
+        # Collect lines indented more than the omit command's statement
+        # to comment out later.
+        if num_indented(line) > self.colno:
+            self.add(line)
+            return True
+        return False
+
     def comment_out_line(self, line: str) -> str:
         """Comment out one line with # at the colno."""
         if len(line) > self.colno:
@@ -100,46 +107,38 @@ def apply_inline_commands(code: str) -> Tuple[str, int]:
     """Rewrite code as directed by #phmdoctest:omit and other commands.
 
     Return a tuple: Modified (or not) code, number of commented out sections.
+    Each line is visited once.
     """
-    rewritten = []
+    if "phmdoctest:" not in code:
+        return code, 0  # no inline commands
+    rewritten = []  # type: List[str]
     num_commented_out_sections = 0
     commenter = None
-    lines = code.splitlines()
-    while lines:
-        line = lines.pop(0)
-        if commenter is None:
-            # Looking for inline commands.
-            if starts_with_comment(line):
-                rewritten.append(line)
-
-            elif has_inline_pass(line):
-                rewritten.append(prepend_pass_statement(line))
-                num_commented_out_sections += 1
-
-            elif has_inline_omit(line):
-                commenter = BlockCommenter(num_indented(line))
-                commenter.add(line)
-            else:
-                rewritten.append(line)
+    for line in code.splitlines():
+        if commenter is not None:
+            if commenter.takes(line):
+                continue
+
+            # This line is indented the same or less than the omit command's
+            # statement so it signals the end of the lines to be commented
+            # out.  Then look at the line for inline commands.
+            num_commented_out_sections += 1
+            rewritten.extend(commenter.comment_out())
+            commenter = None
+
+        # Looking for inline commands.
+        if starts_with_comment(line):
+            rewritten.append(line)
+
+        elif has_inline_pass(line):
+            rewritten.append(prepend_pass_statement(line))
+            num_commented_out_sections += 1
+
+        elif has_inline_omit(line):
+            commenter = BlockCommenter(num_indented(line))
+            commenter.add(line)
         else:
-            # A blank line has no indent level.
-            # It may have some stray spaces.  These are removed.
-            if isblank(line):
-                commenter.add("")
-
-            # Check if the line is indented the same or less than the omit
-            # command's statement.
-            elif num_indented(line) <= commenter.colno:
-                # If so this line signals the end of the
-                # lines to be commented out.
-                # Put this line back in the lines to do
-                num_commented_out_sections += 1
-                rewritten.extend(commenter.comment_out())
-                commenter = None
-                lines.insert(0, line)
-            else:
-                # Collect this line to comment out later.
-                commenter.add(line)
+            rewritten.append(line)
 
     if commenter is not None:
         # End of input reached while collecting lines to comment out.
@@ -1,26 +1,34 @@
 """phmdoctest entry point."""
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import click
 
 from phmdoctest.entryargs import Args
-from phmdoctest.fenced import FencedBlock, Role
-import phmdoctest.cases
-import phmdoctest.fenced
-import phmdoctest.fillrole
-import phmdoctest.report
-import phmdoctest.tool
-import phmdoctest.using
+import phmdoctest.timings
+
+# The other modules are imported by the functions that use them so
+# that --help, --version, and runs that don't need them start quickly.
+if TYPE_CHECKING:
+    from phmdoctest.document import Document
+    from phmdoctest.fenced import FencedBlock
 
 
 @click.command()
 @click.argument(
     "markdown_file",
-    nargs=1,
+    nargs=-1,
+    required=True,
     type=click.Path(
         exists=True,
-        dir_okay=False,
         allow_dash=True,
     ),
 )
@@ -29,6 +37,27 @@ import phmdoctest.using
     nargs=1,
     help='Write generated test case file to path TEXT. "-"' " writes to stdout.",
 )
+@click.option(
+    "--outdir",
+    type=click.Path(file_okay=False),
+    help=(
+        "Write a test file for each MARKDOWN_FILE to directory TEXT."
+        " Needed for more than one MARKDOWN_FILE or a directory."
+        " A directory stands for the *.md files in it and below it."
+        " The directory TEXT is created if needed."
+    ),
+)
+@click.option(
+    "--outname",
+    default="test_{stem}.py",
+    show_default=True,
+    help=(
+        "Name of each test file written to --outdir. {stem} is the"
+        " Markdown file name without the suffix, {name} is the file name,"
+        " and {path} is the Markdown file path with directories joined"
+        " by __."
+    ),
+)
 @click.option(
     "-s",
     "--skip",
@@ -45,9 +74,32 @@ import phmdoctest.using
         " Markdown file is skipped."
     ),
 )
+@click.option(
+    "--skip-regex",
+    multiple=True,
+    help=(
+        "Any Python code or interactive session block that contains"
+        " a match of the regular expression TEXT is not tested."
+        " More than one --skip-regex TEXT is ok."
+    ),
+)
 @click.option(
     "--report", is_flag=True, help="Show how the Markdown fenced code blocks are used."
 )
+@click.option(
+    "--report-format",
+    type=click.Choice(["text", "json", "jsonl"]),
+    metavar="FORMAT",
+    default="text",
+    help=(
+        "Format of the --report: text, json, or jsonl."
+        " json and jsonl list each block's"
+        " type, line, role, patterns, directives, and skip matches"
+        " without a table. jsonl prints one line per block."
+        " json and jsonl imply --report and also work with a"
+        " configuration file."
+    ),
+)
 @click.option(
     "--fail-nocode",
     is_flag=True,
@@ -108,50 +160,277 @@ import phmdoctest.using
         " This option is ignored if there is no --setup option."
     ),
 )
+@click.option(
+    "--session-tests",
+    is_flag=True,
+    help=(
+        "Generate a test function for each session block that runs"
+        " it with doctest. The sessions are collected, selected with -k,"
+        " and distributed like the code blocks."
+        " pytest --doctest-modules is not needed."
+    ),
+)
+@click.option(
+    "--fast-scan",
+    is_flag=True,
+    help=(
+        "Find the fenced code blocks and directives with a line"
+        " oriented scanner instead of a full commonmark parse."
+        " This is faster for very large Markdown files."
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    metavar="INTEGER",
+    default=None,
+    help=(
+        "Number of worker processes that generate test files"
+        " when MARKDOWN_FILE is a configuration file or with --outdir."
+        " 0 means one per CPU. Overrides the configuration file"
+        " jobs setting."
+    ),
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help=(
+        "Print the wall time and peak memory of each phase"
+        " of test file generation to stderr."
+    ),
+)
+@click.option(
+    "--timings-json",
+    type=click.Path(dir_okay=False),
+    help=(
+        "Write the --timings measurements to this JSON file."
+        " The table is printed only with --timings."
+    ),
+)
+@click.option(
+    "--profile-json",
+    type=click.Path(dir_okay=False),
+    help=(
+        "Generate a test file that measures the wall time, CPU time,"
+        " and peak memory of each code block and session when pytest"
+        " runs it. The measurements are merged into this JSON file"
+        " keyed by Markdown file and line with a list of the slowest"
+        " examples. A relative path is relative to where pytest runs."
+    ),
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help=(
+        "Keep running after generating. Generate again when the"
+        " Markdown file, or the configuration file or its selected"
+        " Markdown files, change. Checks modification times, woken"
+        " by inotify when available. Test files are replaced"
+        " atomically. Ctrl-C stops."
+    ),
+)
 @click.version_option()  # type: ignore
 # Note- docstring for entry point shows up in click's usage text.
 def entry_point(
-    markdown_file, outfile, skip, report, fail_nocode, setup, teardown, setup_doctest
+    markdown_file,
+    outfile,
+    outdir,
+    outname,
+    skip,
+    skip_regex,
+    report,
+    report_format,
+    fail_nocode,
+    setup,
+    teardown,
+    setup_doctest,
+    session_tests,
+    fast_scan,
+    jobs,
+    timings,
+    timings_json,
+    profile_json,
+    watch,
 ):
     """MARKDOWN_FILE may also be .toml, .cfg, or .ini configuration file."""
     args = Args(
-        markdown_file=markdown_file,
+        markdown_file=markdown_file[0],
         outfile=outfile,
         skips=skip,
-        is_report=report,
+        is_report=report or report_format != "text",
         fail_nocode=fail_nocode,
         setup=setup,
         teardown=teardown,
         setup_doctest=setup_doctest,
         built_from="",  # not supplied by the Click command line.
+        fast_scan=fast_scan,
+        skip_regexes=skip_regex,
+        profile_json=profile_json or "",
+        session_tests=session_tests,
     )
-    markdown_path = Path(markdown_file)
+    many = len(markdown_file) > 1 or Path(args.markdown_file).is_dir()
+    if many or outdir is not None:
+        if outfile is not None:
+            raise click.UsageError(
+                "phmdoctest- use --outdir instead of --outfile with more"
+                " than one MARKDOWN_FILE or a directory."
+            )
+        if outdir is None and not args.is_report:
+            raise click.UsageError(
+                "phmdoctest- --outdir is needed with more than one"
+                " MARKDOWN_FILE or a directory."
+            )
+        import phmdoctest.multifile
+
+        regenerate, find_paths = phmdoctest.multifile.callbacks(
+            markdown_file,
+            args,
+            outdir=outdir,
+            outname=outname,
+            jobs=jobs,
+            timings=timings,
+            timings_json=timings_json,
+            report_format=report_format,
+        )
+    else:
+        regenerate, find_paths = _one_file_callbacks(
+            args, jobs, timings, timings_json, report_format
+        )
+    if watch and "-" in markdown_file:
+        raise click.UsageError("phmdoctest- --watch needs a file, not -.")
+    regenerate()
+    if watch:
+        from phmdoctest.watch import watch as watch_paths
+
+        watch_paths(find_paths, regenerate)
+
+
+def _one_file_callbacks(
+    args: Args,
+    jobs: Optional[int],
+    timings: bool,
+    timings_json: Optional[str],
+    report_format: str,
+) -> Tuple[Callable[..., None], Callable[[], List[Path]]]:
+    """Functions that generate and find the files to watch for one MARKDOWN_FILE."""
+    markdown_path = Path(args.markdown_file)
     if markdown_path.suffix in [".cfg", ".ini", ".toml"]:
-        generate_using(config_file=markdown_path)
+
+        def regenerate(changed: Optional[List[Path]] = None) -> None:
+            generate_using(
+                config_file=markdown_path,
+                jobs=jobs,
+                timings=timings or None,
+                timings_json=timings_json,
+                report_format=None if report_format == "text" else report_format,
+            )
+
+        def find_paths() -> List[Path]:
+            return _watched_by_config(markdown_path)
+
     else:
-        blocks = _configure_block_roles(args)
-        if args.is_report:
-            phmdoctest.report.print_report(args, blocks)
 
-        # build test cases and write to the --outfile path
-        if args.outfile:
-            test_case_string = phmdoctest.cases.build_test_cases(args, blocks)
-            with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
-                ofp.write(test_case_string)
+        def regenerate(changed: Optional[List[Path]] = None) -> None:
+            recorder = phmdoctest.timings.Timings(enabled=timings or bool(timings_json))
+            _generate_testfile(args, recorder, report_format)
+            recorder.report(timings_json, table=timings)
+
+        def find_paths() -> List[Path]:
+            return [markdown_path]
+
+    return regenerate, find_paths
+
+
+def _watched_by_config(config_file: Path) -> List[Path]:
+    """The configuration file and the Markdown files it selects."""
+    import phmdoctest.using
+
+    try:
+        config = phmdoctest.using.parse_user_configuration(config_file)
+        markdown_files = phmdoctest.using.find_markdown_files(config, Path("."))
+    except Exception:
+        return [config_file]  # The configuration file is being edited.
+    return [config_file] + markdown_files
+
+
+def _generate_testfile(
+    args: Args, timings: phmdoctest.timings.Timings, report_format: str = "text"
+) -> None:
+    """Print the report and write the --outfile for one Markdown file."""
+    blocks = _configure_block_roles(args, timings=timings)
+    if args.is_report:
+        import phmdoctest.report
+
+        with timings.phase("report", args.markdown_file):
+            if report_format == "text":
+                phmdoctest.report.print_report(args, blocks)
+            else:
+                report = phmdoctest.report.file_report(
+                    click.format_filename(args.markdown_file),
+                    blocks,
+                    list(args.skips) + list(args.skip_regexes),
+                )
+                phmdoctest.report.print_json_report([report], report_format)
 
+    _write_testfile(args, blocks, timings)
 
-def _configure_block_roles(args: Args) -> List[FencedBlock]:
+
+def _write_testfile(
+    args: Args, blocks: List["FencedBlock"], timings: phmdoctest.timings.Timings
+) -> None:
+    """Generate test cases and write them to the --outfile path if there is one."""
+    # build test cases and write them to the --outfile path as generated.
+    # A file is replaced only when generation completes.
+    # When timing the test file is generated before it is written so
+    # the phases are measured separately.
+    if args.outfile:
+        import phmdoctest.cases
+        import phmdoctest.tool
+
+        chunks: Iterable[str] = phmdoctest.cases.generate_test_cases(args, blocks)
+        if timings.enabled:
+            with timings.phase("generate", args.markdown_file):
+                chunks = list(chunks)
+        with timings.phase("write", args.markdown_file):
+            if args.outfile == "-":
+                with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
+                    for chunk in chunks:
+                        ofp.write(chunk)
+            else:
+                phmdoctest.tool.write_atomically(Path(args.outfile), chunks)
+
+
+def _configure_block_roles(
+    args: Args,
+    document: Optional["Document"] = None,
+    timings: Optional[phmdoctest.timings.Timings] = None,
+) -> List["FencedBlock"]:
     """Find markdown blocks and pair up code and output blocks."""
-    with click.open_file(args.markdown_file, "r", encoding="utf-8") as fp:
-        blocks = phmdoctest.fenced.convert_nodes(phmdoctest.tool.fenced_block_nodes(fp))
-    phmdoctest.fillrole.identify_code_output_session_blocks(blocks)
-    phmdoctest.fillrole.del_problem_blocks(blocks)
+    from phmdoctest.document import Document
+    from phmdoctest.fenced import Role
+    import phmdoctest.fillrole
+
+    if timings is None:
+        timings = phmdoctest.timings.Timings(enabled=False)
+    name = args.markdown_file
+    if document is None:
+        with timings.phase("parse", name):
+            document = Document(args.markdown_file, fast_scan=args.fast_scan)
+    blocks = document.blocks
+    with timings.phase("roles", name):
+        phmdoctest.fillrole.identify_code_output_session_blocks(blocks)
+        phmdoctest.fillrole.del_problem_blocks(blocks)
     code_and_session_blocks = [b for b in blocks if b.role in [Role.CODE, Role.SESSION]]
-    phmdoctest.fillrole.apply_skips(args, code_and_session_blocks)
-    phmdoctest.fillrole.find_and_designate_setup(args.setup, code_and_session_blocks)
-    phmdoctest.fillrole.find_and_designate_teardown(
-        args.teardown, code_and_session_blocks
-    )
+    with timings.phase("skips", name):
+        phmdoctest.fillrole.apply_skips(args, code_and_session_blocks)
+    with timings.phase("setup_teardown", name):
+        phmdoctest.fillrole.find_and_designate_setup(
+            args.setup, code_and_session_blocks
+        )
+        phmdoctest.fillrole.find_and_designate_teardown(
+            args.teardown, code_and_session_blocks
+        )
     return blocks
 
 
@@ -159,11 +438,16 @@ def testfile(
     markdown_file: str = "",
     *,
     skips: Optional[List[str]] = None,
+    skip_regexes: Optional[List[str]] = None,
     fail_nocode: bool = False,
     setup: Optional[str] = None,
     teardown: Optional[str] = None,
     setup_doctest: bool = False,
     built_from: str = "",
+    fast_scan: bool = False,
+    document: Optional["Document"] = None,
+    profile_json: str = "",
+    session_tests: bool = False,
 ) -> str:
     """Run with callers keyword arguments and default values.
 
@@ -180,6 +464,10 @@ def testfile(
         skips
             List[str]. Do not test blocks with substring TEXT.
 
+        skip_regexes
+            List[str]. Do not test blocks with a match of the
+            regular expression.
+
         fail_nocode
             Markdown file with no code blocks generates a failing test.
 
@@ -200,11 +488,80 @@ def testfile(
             When empty string the docstring built from text is derived
             from markdown_file.
 
+        fast_scan
+            Find fenced code blocks with the line oriented scanner
+            instead of the commonmark parser.
+
+        document
+            phmdoctest.document.Document already parsed from markdown_file.
+            When present the file is not read again and fast_scan is
+            ignored. markdown_file defaults to the document's file.
+
+        profile_json
+            When not empty the generated test file measures each
+            code block and session and merges the measurements into
+            this JSON file. See phmdoctest.profiler.
+
+        session_tests
+            Generate a test function for each session that runs it
+            with doctest. pytest --doctest-modules is not needed.
+
     Returns:
         String containing the contents of the generated pytest file.
     """
+    chunks = testfile_chunks(
+        markdown_file,
+        skips=skips,
+        skip_regexes=skip_regexes,
+        fail_nocode=fail_nocode,
+        setup=setup,
+        teardown=teardown,
+        setup_doctest=setup_doctest,
+        built_from=built_from,
+        fast_scan=fast_scan,
+        document=document,
+        profile_json=profile_json,
+        session_tests=session_tests,
+    )
+    return "".join(chunks)
+
+
+def testfile_chunks(
+    markdown_file: str = "",
+    *,
+    skips: Optional[List[str]] = None,
+    skip_regexes: Optional[List[str]] = None,
+    fail_nocode: bool = False,
+    setup: Optional[str] = None,
+    teardown: Optional[str] = None,
+    setup_doctest: bool = False,
+    built_from: str = "",
+    fast_scan: bool = False,
+    document: Optional["Document"] = None,
+    timings: Optional[phmdoctest.timings.Timings] = None,
+    profile_json: str = "",
+    session_tests: bool = False,
+) -> Iterator[str]:
+    """Same as testfile() but generates the pytest file in chunks.
+
+    The Markdown file is parsed and the blocks are assigned roles
+    before returning.  Each test function is generated when the
+    iterator gets to it.  Write the chunks to a file to avoid
+    holding the whole generated pytest file in memory.
+    The arguments are the same as testfile().
+
+    Keyword Args:
+        timings
+            phmdoctest.timings.Timings that records the phases
+            of assigning roles to the blocks.
+
+    Returns:
+        Iterator of strings. Joined they are the generated pytest file.
+    """
     if skips is None:
         skips = []
+    if document is not None and not markdown_file:
+        markdown_file = document.markdown_file
     args = Args(
         markdown_file=markdown_file,
         outfile="",
@@ -215,12 +572,24 @@ def testfile(
         teardown=teardown,
         setup_doctest=setup_doctest,
         built_from=built_from,
+        fast_scan=fast_scan,
+        skip_regexes=skip_regexes or [],
+        profile_json=profile_json,
+        session_tests=session_tests,
     )
-    blocks = _configure_block_roles(args)
-    return phmdoctest.cases.build_test_cases(args, blocks)
+    blocks = _configure_block_roles(args, document, timings)
+    import phmdoctest.cases
+
+    return phmdoctest.cases.generate_test_cases(args, blocks)
 
 
-def generate_using(config_file: Path) -> None:
+def generate_using(
+    config_file: Path,
+    jobs: Optional[int] = None,
+    timings: Optional[bool] = None,
+    timings_json: Optional[str] = None,
+    report_format: Optional[str] = None,
+) -> None:
     """Generate test files as directed by configuration file.
 
     See the "Using a configuration file" section of the documentation.
@@ -233,9 +602,38 @@ def generate_using(config_file: Path) -> None:
     - The generated test files get written to the directory specified
       by `output_directory`.
     - The `print` key directs printing.
+    - The `jobs` key sets the number of worker processes.
+    - The `timings` and `timings_json` keys measure the phases.
+    - The `report_format` key prints a json or jsonl block report.
 
     Args:
         config_file
             Path to the .cfg, .ini, or .toml configuration file.
+
+        jobs
+            Number of worker processes that generate test files.
+            0 means one per CPU.  None uses the configuration
+            file's jobs setting which defaults to 1.
+
+        timings
+            Print the wall time and peak memory of each phase to stderr.
+            None uses the configuration file's timings setting.
+
+        timings_json
+            Also write the timings to this JSON file. None uses the
+            configuration file's timings_json setting.
+
+        report_format
+            "json" or "jsonl" prints a report about the blocks of every
+            selected Markdown file. None uses the configuration file's
+            report_format setting.
     """
-    phmdoctest.using.generate_using(config_file=config_file)
+    import phmdoctest.using
+
+    phmdoctest.using.generate_using(
+        config_file=config_file,
+        jobs=jobs,
+        timings=timings,
+        timings_json=timings_json,
+        report_format=report_format,
+    )
@@ -0,0 +1,117 @@
+"""Record of generated test files kept in the output directory."""
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Sequence
+
+import phmdoctest
+import phmdoctest.tool
+
+
+MANIFEST_NAME = ".phmdoctest-manifest.json"
+"""Name of the manifest file written to the output directory."""
+
+
+ManifestEntry = NamedTuple(
+    "ManifestEntry",
+    [
+        ("key", str),  # content_key() of the Markdown file
+        ("outfile", Optional[str]),  # generated file name, None if not generated
+        ("digest", str),  # sha256 of the generated file contents
+        ("tests", int),  # phmdoctest.shard.count_tests() of the generated file
+    ],
+)
+"""What was generated from one Markdown file. (collections.namedtuple)."""
+
+
+def content_key(
+    markdown: bytes,
+    markdown_name: str,
+    fast_scan: bool,
+    skips: Sequence[str] = (),
+    skip_regexes: Sequence[str] = (),
+) -> str:
+    """Hash of the Markdown contents, phmdoctest version, and options."""
+    options = json.dumps(
+        {
+            "version": phmdoctest.__version__,
+            "markdown": markdown_name,
+            "fast_scan": fast_scan,
+            "skips": list(skips),
+            "skip_regexes": list(skip_regexes),
+        },
+        sort_keys=True,
+    )
+    h = hashlib.sha256(options.encode("utf-8"))
+    h.update(b"\0")
+    h.update(markdown)
+    return h.hexdigest()
+
+
+def text_digest(text: str) -> str:
+    """Hash of generated test file contents."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(target_dir: Path) -> Dict[str, ManifestEntry]:
+    """Read the manifest from target_dir. Empty if missing or unreadable.
+
+    Returns:
+        Dict of ManifestEntry keyed by the Markdown file posix path.
+    """
+    path = target_dir / MANIFEST_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return {
+            name: ManifestEntry(
+                key=entry["key"],
+                outfile=entry["outfile"],
+                digest=entry["digest"],
+                tests=entry["tests"],
+            )
+            for name, entry in data["files"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def save_manifest(target_dir: Path, entries: Dict[str, ManifestEntry]) -> None:
+    """Replace the manifest in target_dir."""
+    data = {
+        "version": phmdoctest.__version__,
+        "files": {name: entry._asdict() for name, entry in sorted(entries.items())},
+    }
+    path = target_dir / MANIFEST_NAME
+    temporary = path.with_name(path.name + ".tmp")
+    _ = temporary.write_text(json.dumps(data, indent=1) + "\n", encoding="utf-8")
+    temporary.replace(path)
+
+
+def is_up_to_date(target_dir: Path, entry: ManifestEntry) -> bool:
+    """True if the generated file recorded by entry is present and unmodified."""
+    if entry.outfile is None:
+        return True
+    outfile = target_dir / entry.outfile
+    try:
+        return text_digest(outfile.read_text(encoding="utf-8")) == entry.digest
+    except OSError:
+        return False
+
+
+def write_if_changed(outfile: Path, text: str) -> bool:
+    """Write text to outfile unless it already has exactly that text.
+
+    Leaving the file alone keeps its mtime and the bytecode cache valid.
+    The file is replaced atomically so a test runner watching the
+    output directory never imports a partly written file.
+
+    Returns:
+        True if the file was written.
+    """
+    try:
+        if outfile.read_text(encoding="utf-8") == text:
+            return False
+    except OSError:
+        pass
+    phmdoctest.tool.write_atomically(outfile, [text])
+    return True
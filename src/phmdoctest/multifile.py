@@ -0,0 +1,301 @@
+"""Generate test files for many Markdown files in one phmdoctest run."""
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import os
+from pathlib import Path
+import string
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import click
+
+from phmdoctest.entryargs import Args
+import phmdoctest.main
+import phmdoctest.report
+import phmdoctest.timings
+import phmdoctest.walk
+
+DEFAULT_OUTNAME = "test_{stem}.py"
+"""Default --outname template."""
+
+
+OUTNAME_FIELDS = ["stem", "name", "path"]
+"""Fields that can appear in the --outname template."""
+
+
+CONFIG_SUFFIXES = [".cfg", ".ini", ".toml"]
+"""A MARKDOWN_FILE with one of these suffixes is a configuration file."""
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+FileStatus = NamedTuple(
+    "FileStatus",
+    [
+        ("markdown_file", str),
+        ("outfile", str),
+        ("exit_code", int),  # 0 if the test file was written
+        ("message", str),  # error message or empty string
+        ("output", str),  # printed text report
+        ("report", Optional[Dict[str, Any]]),  # json or jsonl report
+        ("timings", List[phmdoctest.timings.PhaseTiming]),
+    ],
+)
+"""Outcome of generating one Markdown file's test file. (collections.namedtuple)."""
+
+
+def expand_markdown_files(paths: Iterable[str]) -> List[str]:
+    """Replace each directory with the *.md files in it and below it.
+
+    Files are kept in the order given. The Markdown files found in a
+    directory are in order by name. A file is listed only once.
+    """
+    found: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = phmdoctest.walk.find_files(Path(path), ["**/*.md"])
+            found.extend(str(f) for f in files)
+        else:
+            found.append(path)
+    return list(dict.fromkeys(found))
+
+
+def check_outname(outname: str) -> None:
+    """Raise click.BadParameter if outname has a field that is not allowed."""
+    for _, field, _, _ in string.Formatter().parse(outname):
+        if field is not None and field not in OUTNAME_FIELDS:
+            raise click.BadParameter(
+                "phmdoctest- unknown field {{{}}}. Use one of {}.".format(
+                    field, ", ".join("{" + f + "}" for f in OUTNAME_FIELDS)
+                ),
+                param_hint="--outname",
+            )
+
+
+def outfile_name(markdown_file: str, outname: str) -> str:
+    """Name of the test file for markdown_file made from the outname template.
+
+    {stem} is the Markdown file name without its suffix, {name} is the
+    file name, and {path} is the relative path without the suffix with
+    the directories joined by double underscores.
+    """
+    path = Path(markdown_file)
+    parts = path.with_suffix("").parts if not path.is_absolute() else [path.stem]
+    return outname.format(stem=path.stem, name=path.name, path="__".join(parts))
+
+
+def check_unique(markdown_files: Sequence[str], outfiles: Sequence[str]) -> None:
+    """Raise click.UsageError if two Markdown files would write the same file."""
+    first: Dict[str, str] = {}
+    for markdown_file, outfile in zip(markdown_files, outfiles):
+        if outfile in first:
+            raise click.UsageError(
+                "phmdoctest- {} and {} both make {}."
+                " Use {{path}} in --outname.".format(
+                    first[outfile], markdown_file, outfile
+                )
+            )
+        first[outfile] = markdown_file
+
+
+def error_message(exc: Exception) -> str:
+    """Message that reports why a Markdown file could not be processed."""
+    if isinstance(exc, click.ClickException):
+        return exc.format_message()
+    return "{}: {}".format(type(exc).__name__, exc)
+
+
+def run_jobs(function: Callable[[T], R], items: Sequence[T], jobs: int) -> List[R]:
+    """Call function with each item using jobs worker processes.
+
+    Results are in the order of the items. When jobs is 1 the function
+    is called in this process. When jobs is 0 one worker process per
+    CPU is used. The function should catch its own exceptions so
+    that one item can't stop the others.
+    """
+    if jobs == 1 or len(items) < 2:
+        return [function(item) for item in items]
+    max_workers = min(jobs or os.cpu_count() or 1, len(items))
+    chunksize = max(1, len(items) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, items, chunksize=chunksize))
+
+
+def generate_file(job: Tuple[Args, str, bool]) -> FileStatus:
+    """Generate and write one test file. Catch and report the errors.
+
+    Args:
+        job
+            Args of the file, the --report-format, and True to
+            record the timings.
+    """
+    args, report_format, timing = job
+    timings = phmdoctest.timings.Timings(enabled=timing)
+    output = io.StringIO()
+    report = None
+    exit_code = 0
+    message = ""
+    try:
+        blocks = phmdoctest.main._configure_block_roles(args, timings=timings)
+        if args.is_report:
+            with timings.phase("report", args.markdown_file):
+                if report_format == "text":
+                    with contextlib.redirect_stdout(output):
+                        phmdoctest.report.print_report(args, blocks)
+                else:
+                    report = phmdoctest.report.file_report(
+                        click.format_filename(args.markdown_file),
+                        blocks,
+                        list(args.skips) + list(args.skip_regexes),
+                    )
+        phmdoctest.main._write_testfile(args, blocks, timings)
+    except Exception as exc:
+        exit_code = exc.exit_code if isinstance(exc, click.ClickException) else 1
+        message = error_message(exc)
+    return FileStatus(
+        markdown_file=args.markdown_file,
+        outfile=args.outfile,
+        exit_code=exit_code,
+        message=message,
+        output=output.getvalue(),
+        report=report,
+        timings=timings.records,
+    )
+
+
+def generate_files(
+    jobs: List[Tuple[Args, str, bool]], workers: Optional[int] = None
+) -> List[FileStatus]:
+    """Generate the test files using worker processes. Results are in order.
+
+    When workers is None or 1 the test files are generated in this
+    process. When workers is 0 one worker process per CPU is used.
+    """
+    return run_jobs(generate_file, jobs, 1 if workers is None else workers)
+
+
+def print_summary(statuses: Sequence[FileStatus]) -> None:
+    """Print each file's outcome and the totals to stderr."""
+    for status in statuses:
+        if status.exit_code:
+            outcome = "error: " + status.message
+        else:
+            outcome = "=> " + (status.outfile or "(report only)")
+        click.echo("phmdoctest- {} {}".format(status.markdown_file, outcome), err=True)
+    failed = sum(1 for status in statuses if status.exit_code)
+    click.echo(
+        "phmdoctest- {} Markdown files, {} ok, {} failed.".format(
+            len(statuses), len(statuses) - failed, failed
+        ),
+        err=True,
+    )
+
+
+def plan(
+    markdown_files: Sequence[str], args: Args, outdir: Optional[str], outname: str
+) -> List[Args]:
+    """Args of each Markdown file with its --outfile in --outdir.
+
+    The --outfile is empty when there is no --outdir.
+    """
+    files = expand_markdown_files(markdown_files)
+    if outdir is None:
+        return [args._replace(markdown_file=f, outfile="") for f in files]
+    outfiles = [os.path.join(outdir, outfile_name(f, outname)) for f in files]
+    check_unique(files, outfiles)
+    return [args._replace(markdown_file=f, outfile=o) for f, o in zip(files, outfiles)]
+
+
+def show_results(
+    statuses: Sequence[FileStatus],
+    report_format: str,
+    timings: bool,
+    timings_json: Optional[str],
+) -> None:
+    """Print the reports, the timings, and the summary.
+
+    The timings table is printed if timings. The timings are written
+    to timings_json if given.
+    """
+    for status in statuses:
+        click.echo(status.output, nl=False)
+    if report_format != "text":
+        phmdoctest.report.print_json_report(
+            [status.report for status in statuses if status.report is not None],
+            report_format,
+        )
+    recorder = phmdoctest.timings.Timings(enabled=timings or bool(timings_json))
+    for status in statuses:
+        recorder.extend(status.timings)
+    recorder.report(timings_json, table=timings)
+    print_summary(statuses)
+
+
+def callbacks(
+    markdown_files: Sequence[str],
+    args: Args,
+    outdir: Optional[str],
+    outname: str,
+    jobs: Optional[int],
+    timings: bool,
+    timings_json: Optional[str],
+    report_format: str,
+) -> Tuple[Callable[..., None], Callable[[], List[Path]]]:
+    """Functions that generate and find the files to watch for --outdir.
+
+    The first function generates the test files of all the Markdown files
+    or, when called by --watch, of the changed Markdown files.
+    It raises click.ClickException if any of them failed.
+
+    Args:
+        markdown_files
+            Markdown files and directories from the command line.
+
+        args
+            Command line arguments shared by all the Markdown files.
+    """
+    check_outname(outname)
+    for markdown_file in markdown_files:
+        if markdown_file == "-" or Path(markdown_file).suffix in CONFIG_SUFFIXES:
+            raise click.UsageError(
+                "phmdoctest- {} must be the only MARKDOWN_FILE"
+                " and can't be used with --outdir.".format(markdown_file)
+            )
+    _ = plan(markdown_files, args, outdir, outname)  # Show usage errors now.
+
+    def regenerate(changed: Optional[List[Path]] = None) -> None:
+        planned = plan(markdown_files, args, outdir, outname)
+        if changed is not None:
+            planned = [a for a in planned if Path(a.markdown_file) in changed]
+        if outdir is not None:
+            Path(outdir).mkdir(parents=True, exist_ok=True)
+        measure = timings or bool(timings_json)
+        statuses = generate_files(
+            [(file_args, report_format, measure) for file_args in planned], jobs
+        )
+        show_results(statuses, report_format, timings, timings_json)
+        failed = sum(1 for status in statuses if status.exit_code)
+        if failed:
+            raise click.ClickException(
+                "phmdoctest- {} of {} Markdown files failed.".format(
+                    failed, len(statuses)
+                )
+            )
+
+    def find_paths() -> List[Path]:
+        return [Path(f) for f in expand_markdown_files(markdown_files)]
+
+    return regenerate, find_paths
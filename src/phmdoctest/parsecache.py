@@ -0,0 +1,94 @@
+"""Process wide least recently used cache of parsed Markdown files."""
+from collections import OrderedDict
+import os
+import threading
+from typing import Any, Callable, NamedTuple, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+CacheInfo = NamedTuple(
+    "CacheInfo",
+    [
+        ("hits", int),
+        ("misses", int),
+        ("maxsize", int),
+        ("currsize", int),
+    ],
+)
+"""Cache statistics like functools.lru_cache cache_info(). (collections.namedtuple)."""
+
+
+class ParseCache:
+    """Least recently used cache of values parsed from files.
+
+    A value is found by the file's absolute path and the kind of parse.
+    It is used only while the file's modification time and size are
+    unchanged, otherwise the file is parsed again.
+    Safe to use from multiple threads.  Two threads that miss at the
+    same time may both parse the file.
+    Cached values are shared by the callers and must not be changed.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        """Keep up to maxsize parsed values."""
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], Any]]"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, filename: str, kind: str, parse: Callable[[str], T]) -> T:
+        """Return the cached value or the value returned by parse(filename).
+
+        Args:
+            filename
+                Path to the file as a string.
+
+            kind
+                Distinguishes different values parsed from the same file.
+
+            parse
+                Called with filename on a cache miss.
+        """
+        stat = os.stat(filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        key = (os.path.abspath(filename), kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                value: T = entry[1]
+                return value
+            self._misses += 1
+        value = parse(filename)
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                _ = self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Remove all values and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return hits, misses, maxsize, and current number of values."""
+        with self._lock:
+            return CacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                maxsize=self.maxsize,
+                currsize=len(self._entries),
+            )
+
+
+PARSE_CACHE = ParseCache()
+"""Parsed Markdown files shared by phmdoctest.tool and phmdoctest.document."""
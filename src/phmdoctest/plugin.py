@@ -0,0 +1,259 @@
+"""pytest plugin collects Markdown files without writing generated test files.
+
+The plugin is registered by the pytest11 entry point.  Collection is
+turned on by the pytest command line option --phmdoctest which
+needs pytest 7.0 or later.
+
+For each Markdown file the test module is generated in memory by
+main.testfile() and compiled once.  The code blocks are collected as
+pytest test functions. The session blocks are run by doctest.
+The generated source and compiled code are cached in the pytest cache
+directory keyed by a hash of the Markdown file contents.
+Markdown files without Python examples are not collected.
+"""
+import doctest
+import fnmatch
+import hashlib
+import linecache
+import marshal
+from pathlib import Path
+import re
+import sys
+import types
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple, Union
+
+import pytest
+
+import phmdoctest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from _pytest._code.code import TerminalRepr, TracebackStyle
+
+
+CACHE_DIRECTORY = "phmdoctest"
+"""Subdirectory of the pytest cache directory that holds generated modules."""
+
+PYTEST_7 = int(pytest.__version__.split(".")[0]) >= 7
+"""Collection uses the pytest 7 file_path hook argument and Node.path."""
+
+
+def pytest_addoption(parser: "pytest.Parser") -> None:
+    """Add --phmdoctest command line option and phmdoctest_globs ini setting."""
+    group = parser.getgroup("phmdoctest")
+    group.addoption(
+        "--phmdoctest",
+        action="store_true",
+        default=False,
+        help="collect Python examples in Markdown files matching phmdoctest_globs.",
+    )
+    parser.addini(
+        "phmdoctest_globs",
+        type="args",
+        default=["*.md"],
+        help="Markdown file name patterns collected by --phmdoctest.",
+    )
+
+
+def pytest_configure(config: "pytest.Config") -> None:
+    """Register the Markdown file collector when --phmdoctest is given.
+
+    The collector's hook is only registered when needed so that
+    pytest versions without the file_path hook argument still work.
+    """
+    if config.getoption("phmdoctest"):
+        if not PYTEST_7:
+            raise pytest.UsageError(
+                "phmdoctest- --phmdoctest requires pytest 7.0 or later."
+            )
+        config.pluginmanager.register(MarkdownCollector(), "phmdoctest-collector")
+
+
+class MarkdownCollector:
+    """pytest hook that collects Markdown files."""
+
+    def pytest_collect_file(
+        self, file_path: Path, parent: "pytest.Collector"
+    ) -> Optional["MarkdownModule"]:
+        """Collect Markdown files as MarkdownModule."""
+        globs = parent.config.getini("phmdoctest_globs")
+        if any(fnmatch.fnmatch(file_path.name, glob) for glob in globs):
+            module: MarkdownModule = MarkdownModule.from_parent(
+                parent, path=file_path
+            )
+            return module
+        return None
+
+
+def content_key(markdown: bytes, built_from: str) -> str:
+    """Hash of the Markdown contents, name, phmdoctest and Python versions."""
+    h = hashlib.sha256()
+    for part in [phmdoctest.__version__, sys.implementation.cache_tag, built_from]:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(markdown)
+    return h.hexdigest()
+
+
+def generate_source(markdown: bytes, built_from: str) -> Optional[str]:
+    """Generate the test module source from the Markdown file contents.
+
+    Returns:
+        None if the Markdown has no Python code or session blocks.
+    """
+    import phmdoctest.document
+    import phmdoctest.main
+
+    text = markdown.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    document = phmdoctest.document.Document(built_from, text=text)
+    if not (document.has_code or document.has_session):
+        return None
+    return phmdoctest.main.testfile(built_from=built_from, document=document)
+
+
+def module_name(built_from: str) -> str:
+    """Python identifier used as the generated module's name."""
+    return "phmdoctest_md_" + re.sub(r"\W", "_", built_from)
+
+
+def compile_in_memory(source: str, built_from: str) -> types.CodeType:
+    """Compile the source. Tracebacks find the lines in linecache."""
+    filename = "<phmdoctest {}>".format(built_from)
+    lines = source.splitlines(keepends=True)
+    linecache.cache[filename] = (len(source), None, lines, filename)
+    return compile(source, filename, "exec", dont_inherit=True)
+
+
+class MarkdownModule(pytest.Module):
+    """Test module generated in memory from a Markdown file."""
+
+    _code: Optional[types.CodeType] = None
+    _loaded = False
+
+    def _relative_name(self) -> str:
+        """Markdown file path relative to the rootdir as posix."""
+        try:
+            return self.path.relative_to(self.config.rootpath).as_posix()
+        except ValueError:
+            return self.path.as_posix()
+
+    def _compile(self, markdown: bytes, built_from: str) -> Optional[types.CodeType]:
+        """Return code object for the generated module. Use the cache.
+
+        Returns:
+            None if the Markdown has no Python examples.
+        """
+        cache = getattr(self.config, "cache", None)
+        if cache is None:
+            source = generate_source(markdown, built_from)
+            if source is None:
+                return None
+            return compile_in_memory(source, built_from)
+
+        key = content_key(markdown, built_from)
+        cache_dir = Path(cache.mkdir(CACHE_DIRECTORY))
+        source_path = cache_dir / (key + ".py")
+        code_path = cache_dir / (key + ".code")
+        no_examples_path = cache_dir / (key + ".none")
+        if no_examples_path.exists():
+            return None
+        if source_path.exists() and code_path.exists():
+            try:
+                code = marshal.loads(code_path.read_bytes())
+                if isinstance(code, types.CodeType):
+                    return code
+            except (EOFError, ValueError, TypeError):
+                pass  # fall through and regenerate
+        source = generate_source(markdown, built_from)
+        if source is None:
+            no_examples_path.touch()
+            return None
+        _ = source_path.write_text(source, encoding="utf-8")
+        code = compile(source, str(source_path), "exec", dont_inherit=True)
+        _ = code_path.write_bytes(marshal.dumps(code))
+        return code
+
+    def _load(self) -> Optional[types.CodeType]:
+        """Generate and compile the module once."""
+        import click
+
+        if not self._loaded:
+            built_from = self._relative_name()
+            try:
+                self._code = self._compile(self.path.read_bytes(), built_from)
+            except click.ClickException as exc:
+                raise self.CollectError(
+                    "phmdoctest- {}\n{}".format(built_from, exc.format_message())
+                ) from None
+            self._loaded = True
+        return self._code
+
+    def _getobj(self) -> types.ModuleType:
+        """Execute the generated module. Don't import it."""
+        code = self._load()
+        assert code is not None, "Only collected when there are Python examples."
+        module = types.ModuleType(module_name(self._relative_name()))
+        module.__file__ = code.co_filename
+        exec(code, module.__dict__)
+        return module
+
+    def collect(self) -> Iterable[Union[pytest.Item, pytest.Collector]]:
+        """Collect test functions then the session blocks."""
+        if self._load() is None:
+            return []  # no Python examples
+        collected: List[Union[pytest.Item, pytest.Collector]] = list(
+            super().collect()
+        )
+        finder = doctest.DocTestFinder()
+        for dtest in finder.find(self.obj, self.obj.__name__):
+            if dtest.examples:
+                name = dtest.name.split(".")[-1]
+                collected.append(
+                    SessionItem.from_parent(self, name=name, dtest=dtest)
+                )
+        return collected
+
+
+class SessionFailure(Exception):
+    """Failing examples in a Python interactive session."""
+
+
+def _optionflags(config: "pytest.Config") -> int:
+    """doctest option flags from the pytest doctest_optionflags ini setting."""
+    flags = 0
+    for name in config.getini("doctest_optionflags"):
+        flags |= doctest.OPTIONFLAGS_BY_NAME.get(name, 0)
+    return flags
+
+
+class SessionItem(pytest.Item):
+    """Run one Python interactive session block with doctest."""
+
+    def __init__(self, *, dtest: doctest.DocTest, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.dtest = dtest
+
+    def runtest(self) -> None:
+        """Run the examples in a copy of the module's namespace."""
+        module = self.getparent(MarkdownModule)
+        assert module is not None
+        self.dtest.globs = dict(module.obj.__dict__)
+        runner = doctest.DocTestRunner(
+            verbose=False, optionflags=_optionflags(self.config)
+        )
+        report: List[str] = []
+        result = runner.run(self.dtest, out=report.append)
+        if result.failed:
+            raise SessionFailure("".join(report))
+
+    def repr_failure(
+        self,
+        excinfo: "pytest.ExceptionInfo[BaseException]",
+        style: "Optional[TracebackStyle]" = None,
+    ) -> Union[str, "TerminalRepr"]:
+        """Show the doctest report for failing examples."""
+        if isinstance(excinfo.value, SessionFailure):
+            return str(excinfo.value)
+        return super().repr_failure(excinfo, style=style)
+
+    def reportinfo(self) -> Tuple[Path, None, str]:
+        return self.path, None, "[phmdoctest] " + self.name
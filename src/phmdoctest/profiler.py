@@ -0,0 +1,176 @@
+"""Measure each Markdown example while its generated test file runs.
+
+A test file generated with --profile-json FILE creates an
+ExampleProfiler. Each test function and session function is registered
+with the Markdown line of its block by the ExampleProfiler.example()
+decorator. An autouse fixture measures the wall time, CPU time, and
+peak memory traced by tracemalloc while each example runs.
+When the test module is done the measurements are merged into FILE.
+
+FILE has the measurements keyed by Markdown file and line and the
+slowest examples of all the Markdown files.
+
+    {
+      "examples": {
+        "doc/example2.md": {
+          "20": {"name": "test_code_20_output_26", "kind": "code",
+                 "wall_seconds": 0.0002, "cpu_seconds": 0.0002,
+                 "peak_bytes": 1408}
+        }
+      },
+      "slowest": [{"file": "doc/example2.md", "line": 20, ...}]
+    }
+
+Test modules running in parallel processes take turns updating FILE
+using a lock file next to it.
+"""
+import contextlib
+import json
+import os
+from pathlib import Path
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple, TypeVar
+
+from phmdoctest.timings import reset_peak
+
+
+SLOWEST_COUNT = 10
+"""Number of examples listed in the slowest examples summary."""
+
+
+LOCK_TIMEOUT = 10.0
+"""Seconds to wait for another process to finish updating the JSON file."""
+
+
+ExampleMeasurement = NamedTuple(
+    "ExampleMeasurement",
+    [
+        ("line", int),  # Markdown line of the code or session block
+        ("name", str),  # test function or session function name
+        ("kind", str),  # "code" or "session"
+        ("wall_seconds", float),
+        ("cpu_seconds", float),  # time.process_time() of this process
+        ("peak_bytes", int),  # most memory allocated while running
+    ],
+)
+"""Measurement of one example. (collections.namedtuple)."""
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class ExampleProfiler:
+    """Measurements of the examples of one Markdown file."""
+
+    def __init__(self, json_file: str, markdown_file: str) -> None:
+        """Record to json_file. Relative to the pytest working directory."""
+        self.json_file = Path(json_file)
+        self.markdown_file = markdown_file
+        self.examples: Dict[str, Tuple[int, str]] = {}
+        self.measurements: List[ExampleMeasurement] = []
+
+    def example(self, line: int, kind: str) -> Callable[[F], F]:
+        """Decorator that registers the function of the block at line."""
+
+        def register(function: F) -> F:
+            self.examples[function.__name__] = (line, kind)
+            return function
+
+        return register
+
+    @contextlib.contextmanager
+    def measure(self, item_name: str) -> Iterator[None]:
+        """Measure the code in the block if item_name is a registered example.
+
+        Args:
+            item_name
+                pytest item name. A doctest item name is prefixed by
+                the module name and a dot.
+        """
+        name = item_name.rsplit(".", 1)[-1]
+        if name not in self.examples:
+            yield
+            return
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start()
+        else:
+            reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+            peak = max(0, tracemalloc.get_traced_memory()[1] - base)
+            if started_here:
+                tracemalloc.stop()
+            line, kind = self.examples[name]
+            self.measurements.append(
+                ExampleMeasurement(line, name, kind, wall_seconds, cpu_seconds, peak)
+            )
+
+    def save(self) -> None:
+        """Merge the measurements into the JSON file."""
+        if not self.measurements:
+            return
+        with _locked(self.json_file):
+            data = load_profile(self.json_file)
+            examples = data["examples"].setdefault(self.markdown_file, {})
+            for measurement in self.measurements:
+                record = measurement._asdict()
+                del record["line"]
+                examples[str(measurement.line)] = record
+            data["slowest"] = slowest(data["examples"])
+            temporary = self.json_file.with_name(self.json_file.name + ".tmp")
+            text = json.dumps(data, indent=2) + "\n"
+            _ = temporary.write_text(text, encoding="utf-8")
+            os.replace(str(temporary), str(self.json_file))
+        self.measurements.clear()
+
+
+def load_profile(json_file: Path) -> Dict[str, Any]:
+    """Read the JSON file. Empty if missing or unreadable."""
+    try:
+        data = json.loads(json_file.read_text(encoding="utf-8"))
+        if isinstance(data, dict) and isinstance(data.get("examples"), dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"examples": {}, "slowest": []}
+
+
+def slowest(
+    examples: Dict[str, Dict[str, Dict[str, Any]]], count: int = SLOWEST_COUNT
+) -> List[Dict[str, Any]]:
+    """The count examples with the most wall time, slowest first."""
+    flat = [
+        dict(file=markdown_file, line=int(line), **record)
+        for markdown_file, lines in examples.items()
+        for line, record in lines.items()
+    ]
+    flat.sort(key=lambda r: (-r["wall_seconds"], r["file"], r["line"]))
+    return flat[:count]
+
+
+@contextlib.contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold a lock file next to path. Take it anyway after LOCK_TIMEOUT."""
+    lock = str(path) + ".lock"
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                break  # left behind by a killed process
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(lock)
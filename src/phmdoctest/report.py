@@ -1,10 +1,10 @@
 """Print report about fenced code blocks and how they are used."""
 
 from collections import Counter
-from typing import List
+import json
+from typing import Any, Dict, Iterable, List, Sequence
 
 import click
-import monotable
 
 from phmdoctest.direct import Marker
 from phmdoctest.entryargs import Args
@@ -57,16 +57,19 @@ def print_report(args: Args, blocks: List[FencedBlock]) -> None:
     if args.teardown and not counts["TEARDOWN"]:
         report.append("No teardown block found.")
 
-    if args.skips:
+    skips = list(args.skips) + list(args.skip_regexes)
+    if skips:
         report.append("")
         title2 = "skip pattern matches (blank means no match)"
-        text2 = skips_report(args.skips, blocks, title=title2)
+        text2 = skips_report(skips, blocks, title=title2)
         report.append(text2)
     print("\n".join(report))
 
 
 def fenced_block_report(blocks: List[FencedBlock], title: str = "") -> str:
     """Generate text report about the input file fenced code blocks."""
+    import monotable  # Imported only when a report table is made.
+
     table = monotable.MonoTable()
     table.max_cell_height = 7
     table.more_marker = "..."
@@ -100,18 +103,72 @@ def skips_report(skips: List[str], blocks: List[FencedBlock], title: str = "") -
     """Generate text report about the disposition of --skip options."""
     # Blocks with role OUTPUT and SKIP_OUTPUT will always have an
     # empty skip_reasons list even if the linking code block is skipped.
+    import monotable
+
     table = monotable.MonoTable()
     table.max_cell_height = 5
     table.more_marker = "..."
+    # Line numbers of the blocks that match each pattern found in one
+    # pass over the blocks.
+    code_lines: Dict[str, List[str]] = {}
+    for block in blocks:
+        for pattern in dict.fromkeys(block.patterns):
+            code_lines.setdefault(pattern, []).append(str(block.line))
     cell_grid = []
     for skip in skips:
-        code_lines = []
-        for block in blocks:
-            if skip in block.patterns:
-                code_lines.append(str(block.line))
-
-        cell_grid.append([skip, ", ".join(code_lines)])
+        cell_grid.append([skip, ", ".join(code_lines.get(skip, []))])
     headings = ["skip pattern", "matching code block line number(s)"]
     formats = ["", "(width=36;wrap)"]
     text = table.table(headings, formats, cell_grid, title)  # type: str
     return text
+
+
+def block_record(block: FencedBlock, skips: Sequence[str]) -> Dict[str, Any]:
+    """Report about one fenced code block as a dict that serializes to JSON.
+
+    skips are the --skip TEXT and --skip-regex TEXT values.
+    """
+    return {
+        "type": block.type,
+        "line": block.line,
+        "role": block.role.value,
+        "patterns": list(block.patterns),
+        "directives": [
+            {"type": d.type.name, "value": d.value, "line": d.line}
+            for d in block.directives
+        ],
+        "skips": [skip for skip in skips if skip in block.patterns],
+    }
+
+
+def file_report(
+    filename: str, blocks: List[FencedBlock], skips: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """Report about the fenced code blocks of one Markdown file."""
+    counts = Counter(b.role.value for b in blocks)
+    return {
+        "file": filename,
+        "blocks": [block_record(block, skips) for block in blocks],
+        "summary": {
+            "test_cases": counts["code"] + counts["session"],
+            "roles": dict(counts),
+        },
+    }
+
+
+def print_json_report(reports: Iterable[Dict[str, Any]], report_format: str) -> None:
+    """Print file reports as one JSON document or as JSON lines.
+
+    The "json" report_format prints an object with the key "files".
+    The "jsonl" report_format prints a line for each block with
+    its "file" key followed by a line with the file's "summary".
+    Lines are printed as each file report is received.
+    """
+    if report_format == "json":
+        print(json.dumps({"files": list(reports)}, indent=2))
+        return
+    for report in reports:
+        filename = report["file"]
+        for record in report["blocks"]:
+            print(json.dumps(dict(file=filename, **record)))
+        print(json.dumps({"file": filename, "summary": report["summary"]}))
@@ -0,0 +1,782 @@
+"""Line oriented scanner finds fenced code blocks and their directives.
+
+This is a faster alternative to building the full commonmark AST with
+tool.fenced_block_nodes() and walking it.  The scanner follows the
+block parsing algorithm of the commonmark package one line at a time
+and keeps only a tree of blocks.  It handles the same container
+continuation, lazy continuation lines, tab columns, HTML block
+conditions, setext headings, and link reference definitions.
+Inline content is never parsed.
+
+The HTML comments immediately before each fenced code block are
+checked for phmdoctest directives like direct.get_directives().
+"""
+from html import unescape
+import re
+from typing import IO, List, NamedTuple, Optional, Tuple
+
+from phmdoctest.direct import Directive, find_directive_in_literal
+
+
+ScannedNode = NamedTuple(
+    "ScannedNode",
+    [
+        ("info", str),  # info string, same as commonmark Node.info
+        ("literal", str),  # contents, same as commonmark Node.literal
+        ("sourcepos", List[List[int]]),  # [[start line, 0], [end line, 0]]
+        ("directives", List[Directive]),  # from preceding HTML comments
+    ],
+)
+"""A fenced code block found by the scanner. (collections.namedtuple).
+
+    The fields info, literal, and the sourcepos lines have the same values
+    as the fields of the commonmark.node.Node fenced code block
+    returned by tool.fenced_block_nodes().  Columns are not tracked.
+"""
+
+
+# Same loop limit as direct.get_directives().
+MAX_DIRECTIVE_COMMENTS = 100
+
+CODE_INDENT = 4
+
+# The regular expressions are the same as the commonmark package.
+_ENTITY = "&(?:#x[a-f0-9]{1,6}|#[0-9]{1,7}|[a-z][a-z0-9]{1,31});"
+_ESCAPABLE = "[!\"#$%&'()*+,./:;<=>?@[\\\\\\]^_`{|}~-]"
+_ESCAPED_CHAR = "\\\\" + _ESCAPABLE
+_OPENTAG = (
+    "<[A-Za-z][A-Za-z0-9-]*"
+    "(?:\\s+[a-zA-Z_:][a-zA-Z0-9:._-]*"
+    "(?:\\s*=\\s*(?:[^\"'=<>`\\x00-\\x20]+|'[^']*'|\"[^\"]*\"))?)*"
+    "\\s*/?>"
+)
+_CLOSETAG = "</[A-Za-z][A-Za-z0-9-]*\\s*[>]"
+
+_HTML_BLOCK_OPEN = [
+    re.compile(r"^<(?:script|pre|style)(?:\s|>|$)", re.IGNORECASE),
+    re.compile(r"^<!--"),
+    re.compile(r"^<[?]"),
+    re.compile(r"^<![A-Z]"),
+    re.compile(r"^<!\[CDATA\["),
+    re.compile(
+        r"^<[/]?(?:address|article|aside|base|basefont|blockquote|body|"
+        r"caption|center|col|colgroup|dd|details|dialog|dir|div|dl|dt|"
+        r"fieldset|figcaption|figure|footer|form|frame|frameset|h1|head|"
+        r"header|hr|html|iframe|legend|li|link|main|menu|menuitem|"
+        r"nav|noframes|ol|optgroup|option|p|param|section|source|title|"
+        r"summary|table|tbody|td|tfoot|th|thead|title|tr|track|ul)"
+        r"(?:\s|[/]?[>]|$)",
+        re.IGNORECASE,
+    ),
+    re.compile("^(?:" + _OPENTAG + "|" + _CLOSETAG + ")\\s*$", re.IGNORECASE),
+]
+"""HTML block start conditions for types 1 to 7."""
+
+_HTML_BLOCK_CLOSE = {
+    1: re.compile(r"<\/(?:script|pre|style)>", re.IGNORECASE),
+    2: re.compile(r"-->"),
+    3: re.compile(r"\?>"),
+    4: re.compile(r">"),
+    5: re.compile(r"\]\]>"),
+}
+"""HTML block end conditions. Types 6 and 7 end at a blank line."""
+
+_THEMATIC_BREAK = re.compile(
+    r"^(?:(?:\*[ \t]*){3,}|(?:_[ \t]*){3,}|(?:-[ \t]*){3,})[ \t]*$"
+)
+_MAYBE_SPECIAL = re.compile(r"^[#`~*+_=<>0-9-]")
+_NON_SPACE = re.compile(r"[^ \t\f\v\r\n]")
+_BULLET_LIST_MARKER = re.compile(r"^[*+-]")
+_ORDERED_LIST_MARKER = re.compile(r"^(\d{1,9})([.)])")
+_ATX_HEADING_MARKER = re.compile(r"^#{1,6}(?:[ \t]+|$)")
+_CODE_FENCE = re.compile(r"^`{3,}(?!.*`)|^~{3,}")
+_CLOSING_CODE_FENCE = re.compile(r"^(?:`{3,}|~{3,})(?= *$)")
+_SETEXT_HEADING_LINE = re.compile(r"^(?:=+|-+)[ \t]*$")
+_LINE_ENDING = re.compile(r"\r\n|\n|\r")
+_TRAILING_BLANK_LINES = re.compile(r"(\n *)+$")
+_ENTITY_OR_ESCAPED_CHAR = re.compile(_ESCAPED_CHAR + "|" + _ENTITY, re.IGNORECASE)
+
+# Link reference definitions.
+_LINK_LABEL = re.compile(r"^\[(?:[^\\\[\]]|\\.){0,1000}\]")
+_LINK_TITLE = re.compile(
+    '^(?:"('
+    + _ESCAPED_CHAR
+    + '|[^"\\x00])*"'
+    + "|"
+    + "'("
+    + _ESCAPED_CHAR
+    + "|[^'\\x00])*'"
+    + "|"
+    + "\\(("
+    + _ESCAPED_CHAR
+    + "|[^()\\x00])*\\))"
+)
+_LINK_DESTINATION_BRACES = re.compile(r"^(?:<(?:[^<>\n\\\x00]|\\.)*>)")
+_ESCAPABLE_HERE = re.compile("^" + _ESCAPABLE)
+_WHITESPACE_CHAR = re.compile(r"^[ \t\n\x0b\x0c\x0d]")
+_SPNL = re.compile(r"^ *(?:\n *)?")
+_SPACE_AT_END_OF_LINE = re.compile(r"^ *(?:\n|$)")
+
+
+def _spaces_end(s: str, pos: int) -> int:
+    """Return position after spaces and at most one newline starting at pos."""
+    m = _SPNL.match(s[pos:])
+    return pos + m.end() if m else pos
+
+
+def _unescape_string(s: str) -> str:
+    """Replace entities and backslash escapes with literal characters."""
+    if "\\" not in s and "&" not in s:
+        return s
+
+    def unescape_char(m: "re.Match[str]") -> str:
+        text = m.group()
+        return text[1] if text[0] == "\\" else unescape(text)
+
+    return _ENTITY_OR_ESCAPED_CHAR.sub(unescape_char, s)
+
+
+def _link_destination_end(s: str, pos: int) -> Optional[int]:
+    """Return position after the link destination starting at pos or None."""
+    m = _LINK_DESTINATION_BRACES.match(s[pos:])
+    if m:
+        return pos + m.end()
+    if s[pos : pos + 1] == "<":
+        return None
+    start = pos
+    openparens = 0
+    c = ""
+    while pos < len(s):
+        c = s[pos]
+        if c == "\\" and _ESCAPABLE_HERE.match(s[pos + 1 : pos + 2]):
+            pos += 2
+        elif c == "(":
+            pos += 1
+            openparens += 1
+        elif c == ")":
+            if openparens < 1:
+                break
+            pos += 1
+            openparens -= 1
+        elif _WHITESPACE_CHAR.match(c):
+            break
+        else:
+            pos += 1
+    if pos == start and c != ")":
+        return None
+    return pos
+
+
+def _link_title_end(s: str, beforetitle: int) -> Optional[int]:
+    """Return position after an optional link title and the line end or None."""
+    pos = _spaces_end(s, beforetitle)
+    title = None
+    if pos != beforetitle:
+        title = _LINK_TITLE.match(s[pos:])
+    if title is None:
+        pos = beforetitle
+    else:
+        pos += title.end()
+    at_end = _SPACE_AT_END_OF_LINE.match(s[pos:])
+    if at_end is None:
+        if title is None or len(title.group()) == 2:
+            return None  # no title or the title is empty
+        # Discard the title and check for the line end after the destination.
+        pos = beforetitle
+        at_end = _SPACE_AT_END_OF_LINE.match(s[pos:])
+        if at_end is None:
+            return None
+    return pos + at_end.end()
+
+
+def _reference_length(s: str) -> int:
+    """Length of the link reference definition at the start of s or 0."""
+    label = _LINK_LABEL.match(s)
+    if label is None or len(label.group()) > 1001 or len(label.group()) == 2:
+        return 0
+    pos = label.end()
+    if s[pos : pos + 1] != ":":
+        return 0
+    pos = _spaces_end(s, pos + 1)
+    destination_end = _link_destination_end(s, pos)
+    if destination_end is None:
+        return 0
+    end = _link_title_end(s, destination_end)
+    if end is None or not label.group()[1:-1].strip():
+        return 0
+    return end
+
+
+def _strip_references(content: str) -> Tuple[str, bool]:
+    """Remove link reference definitions from the start of paragraph content."""
+    found = False
+    while content.startswith("["):
+        length = _reference_length(content)
+        if not length:
+            break
+        content = content[length:]
+        found = True
+    return content, found
+
+
+_ListData = NamedTuple(
+    "_ListData",
+    [
+        ("type", str),  # "bullet" or "ordered"
+        ("bullet_char", str),
+        ("delimiter", str),
+        ("marker_offset", int),
+        ("padding", int),
+    ],
+)
+"""List marker of a list item. (collections.namedtuple)."""
+
+
+def _lists_match(list_data: Optional[_ListData], item_data: _ListData) -> bool:
+    """True if list item is the same type with the same delimiter or bullet."""
+    return (
+        list_data is not None
+        and list_data.type == item_data.type
+        and list_data.delimiter == item_data.delimiter
+        and list_data.bullet_char == item_data.bullet_char
+    )
+
+
+def _can_contain(t: str, child: str) -> bool:
+    """True if a block of type t can contain a block of type child."""
+    if t in ("document", "block_quote", "item"):
+        return child != "item"
+    return t == "list" and child == "item"
+
+
+def _accepts_lines(t: str) -> bool:
+    """True if the block type holds lines of text."""
+    return t in ("code_block", "html_block", "paragraph")
+
+
+class _Block:
+    """Block of the document tree with only what the scanner needs."""
+
+    def __init__(self, t: str, parent: Optional["_Block"], line_number: int) -> None:
+        self.t = t
+        self.parent = parent
+        self.children = []  # type: List[_Block]
+        self.is_open = True
+        self.start_line = line_number
+        self.end_line = 0
+        self.lines = []  # type: List[str]
+        self.is_fenced = False
+        self.fence_char = ""
+        self.fence_length = 0
+        self.fence_offset = 0
+        self.html_block_type = 0
+        self.list_data = None  # type: Optional[_ListData]
+        self.info = ""
+        self.literal = ""
+
+
+class _Scanner:
+    """Feed lines one at a time. Build the tree of blocks."""
+
+    def __init__(self) -> None:
+        self.doc = _Block("document", None, 1)
+        self.tip = self.doc
+        self.oldtip = self.doc
+        self.last_matched_container = self.doc
+        self.all_closed = True
+        self.line_number = 0
+        self.current_line = ""
+        self.offset = 0
+        self.column = 0
+        self.next_nonspace = 0
+        self.next_nonspace_column = 0
+        self.indent = 0
+        self.indented = False
+        self.blank = False
+        self.partially_consumed_tab = False
+        self.block_starts = [
+            self.start_block_quote,
+            self.start_atx_heading,
+            self.start_fenced_code_block,
+            self.start_html_block,
+            self.start_setext_heading,
+            self.start_thematic_break,
+            self.start_list_item,
+            self.start_indented_code_block,
+        ]
+
+    def peek(self, pos: int) -> str:
+        """Character at pos in the current line or empty string."""
+        return self.current_line[pos : pos + 1]
+
+    def find_next_nonspace(self) -> None:
+        """Find the first character that is not a space or tab."""
+        line = self.current_line
+        i = self.offset
+        cols = self.column
+        while i < len(line):
+            c = line[i]
+            if c == " ":
+                cols += 1
+            elif c == "\t":
+                cols += 4 - (cols % 4)
+            else:
+                break
+            i += 1
+        self.blank = line[i : i + 1] in ("", "\n", "\r")
+        self.next_nonspace = i
+        self.next_nonspace_column = cols
+        self.indent = self.next_nonspace_column - self.column
+        self.indented = self.indent >= CODE_INDENT
+
+    def advance_next_nonspace(self) -> None:
+        """Move to the first character that is not a space or tab."""
+        self.offset = self.next_nonspace
+        self.column = self.next_nonspace_column
+        self.partially_consumed_tab = False
+
+    def advance_offset(self, count: int, columns: bool) -> None:
+        """Move count characters or count columns if columns is True."""
+        line = self.current_line
+        while count > 0 and self.offset < len(line):
+            if line[self.offset] == "\t":
+                chars_to_tab = 4 - (self.column % 4)
+                if columns:
+                    self.partially_consumed_tab = chars_to_tab > count
+                    chars_to_advance = min(count, chars_to_tab)
+                    self.column += chars_to_advance
+                    self.offset += 0 if self.partially_consumed_tab else 1
+                    count -= chars_to_advance
+                else:
+                    self.partially_consumed_tab = False
+                    self.column += chars_to_tab
+                    self.offset += 1
+                    count -= 1
+            else:
+                self.partially_consumed_tab = False
+                self.offset += 1
+                self.column += 1
+                count -= 1
+
+    def advance_to_end(self) -> None:
+        """Consume the rest of the line."""
+        self.offset = len(self.current_line)
+        self.partially_consumed_tab = False
+
+    def add_line(self) -> None:
+        """Add the rest of the line to the block at the tip."""
+        if self.partially_consumed_tab:
+            self.offset += 1  # skip over tab
+            chars_to_tab = 4 - (self.column % 4)
+            self.tip.lines.append(" " * chars_to_tab)
+        self.tip.lines.append(self.current_line[self.offset :] + "\n")
+
+    def add_child(self, t: str) -> _Block:
+        """Add block of type t as a child of the tip, closing blocks as needed."""
+        while not _can_contain(self.tip.t, t):
+            self.finalize(self.tip, self.line_number - 1)
+        block = _Block(t, self.tip, self.line_number)
+        self.tip.children.append(block)
+        self.tip = block
+        return block
+
+    def close_unmatched_blocks(self) -> None:
+        """Finalize and close any unmatched blocks."""
+        if not self.all_closed:
+            while self.oldtip is not self.last_matched_container:
+                parent = self.oldtip.parent
+                self.finalize(self.oldtip, self.line_number - 1)
+                assert parent is not None
+                self.oldtip = parent
+            self.all_closed = True
+
+    def finalize(self, block: _Block, line_number: int) -> None:
+        """Close the block. Set the tip to its parent."""
+        block.is_open = False
+        block.end_line = line_number
+        if block.t == "paragraph":
+            content, found = _strip_references("".join(block.lines))
+            if found and not _NON_SPACE.search(content):
+                # The paragraph is only link reference definitions.
+                assert block.parent is not None
+                block.parent.children.remove(block)
+        elif block.t == "code_block" and block.is_fenced:
+            content = "".join(block.lines)
+            newline_pos = content.index("\n")
+            block.info = _unescape_string(content[:newline_pos].strip())
+            block.literal = content[newline_pos + 1 :]
+        elif block.t == "html_block" and block.html_block_type == 2:
+            block.literal = _TRAILING_BLANK_LINES.sub("", "".join(block.lines))
+        block.lines = []
+        if block.parent is not None:
+            self.tip = block.parent
+
+    def continue_block(self, container: _Block) -> int:
+        """Try to continue the open container on this line.
+
+        Returns:
+            0 matched, 1 did not match, 2 closing code fence ends the line.
+        """
+        t = container.t
+        if t == "block_quote":
+            return self.continue_block_quote()
+        if t == "item":
+            return self.continue_item(container)
+        if t == "code_block":
+            return self.continue_code_block(container)
+        if t == "html_block":
+            return int(self.blank and container.html_block_type in (6, 7))
+        if t == "paragraph":
+            return int(self.blank)
+        if t in ("heading", "thematic_break"):
+            return 1
+        return 0  # document or list
+
+    def continue_block_quote(self) -> int:
+        """Continue a block quote if the line starts with >."""
+        if not self.indented and self.peek(self.next_nonspace) == ">":
+            self.advance_next_nonspace()
+            self.advance_offset(1, False)
+            if self.peek(self.offset) in (" ", "\t"):
+                self.advance_offset(1, True)
+            return 0
+        return 1
+
+    def continue_item(self, container: _Block) -> int:
+        """Continue a list item if the line is blank or indented enough."""
+        assert container.list_data is not None
+        content_indent = container.list_data.marker_offset + container.list_data.padding
+        if self.blank:
+            if not container.children:
+                return 1  # blank line after empty list item
+            self.advance_next_nonspace()
+        elif self.indent >= content_indent:
+            self.advance_offset(content_indent, True)
+        else:
+            return 1
+        return 0
+
+    def continue_code_block(self, container: _Block) -> int:
+        """Continue a code block. Close a fenced code block at its fence."""
+        if not container.is_fenced:
+            if self.indent >= CODE_INDENT:
+                self.advance_offset(CODE_INDENT, True)
+            elif self.blank:
+                self.advance_next_nonspace()
+            else:
+                return 1
+            return 0
+        if self.indent <= 3 and self.peek(self.next_nonspace) == container.fence_char:
+            m = _CLOSING_CODE_FENCE.match(self.current_line[self.next_nonspace :])
+            if m and len(m.group()) >= container.fence_length:
+                self.finalize(container, self.line_number)
+                return 2
+        # skip optional spaces of fence offset
+        i = container.fence_offset
+        while i > 0 and self.peek(self.offset) in (" ", "\t"):
+            self.advance_offset(1, True)
+            i -= 1
+        return 0
+
+    def start_block_quote(self, container: _Block) -> int:
+        """Start a block quote."""
+        if not self.indented and self.peek(self.next_nonspace) == ">":
+            self.advance_next_nonspace()
+            self.advance_offset(1, False)
+            if self.peek(self.offset) in (" ", "\t"):
+                self.advance_offset(1, True)
+            self.close_unmatched_blocks()
+            self.add_child("block_quote")
+            return 1
+        return 0
+
+    def start_atx_heading(self, container: _Block) -> int:
+        """Start an ATX heading."""
+        if not self.indented and _ATX_HEADING_MARKER.match(
+            self.current_line[self.next_nonspace :]
+        ):
+            self.advance_next_nonspace()
+            self.close_unmatched_blocks()
+            self.add_child("heading")
+            self.advance_to_end()
+            return 2
+        return 0
+
+    def start_fenced_code_block(self, container: _Block) -> int:
+        """Start a fenced code block."""
+        if not self.indented:
+            m = _CODE_FENCE.match(self.current_line[self.next_nonspace :])
+            if m:
+                fence_length = len(m.group())
+                self.close_unmatched_blocks()
+                block = self.add_child("code_block")
+                block.is_fenced = True
+                block.fence_length = fence_length
+                block.fence_char = m.group()[0]
+                block.fence_offset = self.indent
+                self.advance_next_nonspace()
+                self.advance_offset(fence_length, False)
+                return 2
+        return 0
+
+    def start_html_block(self, container: _Block) -> int:
+        """Start an HTML block."""
+        if not self.indented and self.peek(self.next_nonspace) == "<":
+            s = self.current_line[self.next_nonspace :]
+            for block_type, pattern in enumerate(_HTML_BLOCK_OPEN, start=1):
+                if pattern.search(s) and (
+                    block_type < 7 or container.t != "paragraph"
+                ):
+                    self.close_unmatched_blocks()
+                    # Spaces are part of the HTML block.
+                    block = self.add_child("html_block")
+                    block.html_block_type = block_type
+                    return 2
+        return 0
+
+    def start_setext_heading(self, container: _Block) -> int:
+        """Change the paragraph to a setext heading."""
+        if (
+            not self.indented
+            and container.t == "paragraph"
+            and _SETEXT_HEADING_LINE.match(self.current_line[self.next_nonspace :])
+        ):
+            self.close_unmatched_blocks()
+            content, _ = _strip_references("".join(container.lines))
+            container.lines = [content]
+            if content:
+                container.t = "heading"
+                self.tip = container
+                self.advance_to_end()
+                return 2
+        return 0
+
+    def start_thematic_break(self, container: _Block) -> int:
+        """Start a thematic break."""
+        if not self.indented and _THEMATIC_BREAK.match(
+            self.current_line[self.next_nonspace :]
+        ):
+            self.close_unmatched_blocks()
+            self.add_child("thematic_break")
+            self.advance_to_end()
+            return 2
+        return 0
+
+    def start_list_item(self, container: _Block) -> int:
+        """Start a list item and a list if needed."""
+        if not self.indented or container.t == "list":
+            data = self.parse_list_marker(container)
+            if data:
+                self.close_unmatched_blocks()
+                if self.tip.t != "list" or not _lists_match(container.list_data, data):
+                    self.add_child("list").list_data = data
+                self.add_child("item").list_data = data
+                return 1
+        return 0
+
+    def start_indented_code_block(self, container: _Block) -> int:
+        """Start an indented code block."""
+        if self.indented and self.tip.t != "paragraph" and not self.blank:
+            self.advance_offset(CODE_INDENT, True)
+            self.close_unmatched_blocks()
+            self.add_child("code_block")
+            return 2
+        return 0
+
+    def list_marker(self, container: _Block) -> "Optional[re.Match[str]]":
+        """Match a list marker at the first non-space character."""
+        if self.indent >= 4:
+            return None
+        rest = self.current_line[self.next_nonspace :]
+        m = _BULLET_LIST_MARKER.match(rest)
+        if m is None:
+            m = _ORDERED_LIST_MARKER.match(rest)
+            if m and container.t == "paragraph" and m.group(1) != "1":
+                return None  # only 1 can interrupt a paragraph
+        if m is None or self.peek(self.next_nonspace + m.end()) not in ("", "\t", " "):
+            return None
+        # if it interrupts a paragraph, make sure the first line isn't blank
+        if container.t == "paragraph" and not _NON_SPACE.search(
+            self.current_line[self.next_nonspace + m.end() :]
+        ):
+            return None
+        return m
+
+    def parse_list_marker(self, container: _Block) -> Optional[_ListData]:
+        """Parse a list marker and return the list item data or None."""
+        m = self.list_marker(container)
+        if m is None:
+            return None
+        marker = m.group()
+        marker_offset = self.indent
+        self.advance_next_nonspace()  # to start of marker
+        self.advance_offset(len(marker), True)  # to end of marker
+        spaces_start_col = self.column
+        spaces_start_offset = self.offset
+        while True:
+            self.advance_offset(1, True)
+            if not (
+                self.column - spaces_start_col < 5
+                and self.peek(self.offset) in (" ", "\t")
+            ):
+                break
+        blank_item = self.peek(self.offset) == ""
+        spaces_after_marker = self.column - spaces_start_col
+        if spaces_after_marker >= 5 or spaces_after_marker < 1 or blank_item:
+            padding = len(marker) + 1
+            self.column = spaces_start_col
+            self.offset = spaces_start_offset
+            if self.peek(self.offset) in (" ", "\t"):
+                self.advance_offset(1, True)
+        else:
+            padding = len(marker) + spaces_after_marker
+        if m.re is _BULLET_LIST_MARKER:
+            return _ListData("bullet", marker, "", marker_offset, padding)
+        return _ListData("ordered", "", m.group(2), marker_offset, padding)
+
+    def match_containers(self) -> Optional[_Block]:
+        """Continue the open blocks. Return the last matched container.
+
+        Returns None if the line closed a fenced code block.
+        """
+        container = self.doc
+        while container.children and container.children[-1].is_open:
+            container = container.children[-1]
+            self.find_next_nonspace()
+            result = self.continue_block(container)
+            if result == 2:
+                return None
+            if result == 1:
+                assert container.parent is not None
+                return container.parent
+        return container
+
+    def open_new_blocks(self, container: _Block) -> _Block:
+        """Look for new container starts and a leaf block start."""
+        matched_leaf = container.t != "paragraph" and _accepts_lines(container.t)
+        while not matched_leaf:
+            self.find_next_nonspace()
+            if not self.indented and not _MAYBE_SPECIAL.match(
+                self.current_line[self.next_nonspace :]
+            ):
+                self.advance_next_nonspace()
+                break
+            for start in self.block_starts:
+                result = start(container)
+                if result:
+                    container = self.tip
+                    matched_leaf = result == 2
+                    break
+            else:
+                self.advance_next_nonspace()  # nothing matched
+                break
+        return container
+
+    def add_text(self, container: _Block) -> None:
+        """Add what remains of the line to the appropriate block."""
+        if not self.all_closed and not self.blank and self.tip.t == "paragraph":
+            self.add_line()  # lazy paragraph continuation
+            return
+        self.close_unmatched_blocks()
+        if _accepts_lines(container.t):
+            self.add_line()
+            close = _HTML_BLOCK_CLOSE.get(container.html_block_type)
+            if (
+                container.t == "html_block"
+                and close is not None
+                and close.search(self.current_line[self.offset :])
+            ):
+                self.finalize(container, self.line_number)
+        elif self.offset < len(self.current_line) and not self.blank:
+            self.add_child("paragraph")
+            self.advance_next_nonspace()
+            self.add_line()
+
+    def incorporate_line(self, line: str) -> None:
+        """Process one line of the Markdown document."""
+        self.oldtip = self.tip
+        self.offset = 0
+        self.column = 0
+        self.blank = False
+        self.partially_consumed_tab = False
+        self.line_number += 1
+        self.current_line = line.replace("\0", "\ufffd")
+        container = self.match_containers()
+        if container is None:
+            return
+        self.all_closed = container is self.oldtip
+        self.last_matched_container = container
+        container = self.open_new_blocks(container)
+        self.add_text(container)
+
+    def finish(self, length: int) -> List[ScannedNode]:
+        """Close everything at end of document. Return the fenced code blocks."""
+        while self.tip is not self.doc:
+            self.finalize(self.tip, length)
+        self.finalize(self.doc, length)
+        return fenced_code_blocks(self.doc)
+
+
+def _directives(siblings: List[_Block], index: int) -> List[Directive]:
+    """Directives in the HTML comments immediately before siblings[index]."""
+    found = []
+    start = max(0, index - MAX_DIRECTIVE_COMMENTS)
+    for block in reversed(siblings[start:index]):
+        if block.t != "html_block" or block.html_block_type != 2:
+            break
+        directive = find_directive_in_literal(block.literal, block.start_line)
+        if directive:
+            found.append(directive)
+    found.reverse()
+    return found
+
+
+def fenced_code_blocks(doc: _Block) -> List[ScannedNode]:
+    """Walk the tree of blocks in document order. Collect fenced code blocks."""
+    nodes = []
+    stack = [(doc, 0)]
+    while stack:
+        parent, index = stack.pop()
+        if index >= len(parent.children):
+            continue
+        stack.append((parent, index + 1))
+        block = parent.children[index]
+        if block.t == "code_block" and block.is_fenced:
+            nodes.append(
+                ScannedNode(
+                    info=block.info,
+                    literal=block.literal,
+                    sourcepos=[[block.start_line, 0], [block.end_line, 0]],
+                    directives=_directives(parent.children, index),
+                )
+            )
+        if block.children:
+            stack.append((block, 0))
+    return nodes
+
+
+def scan_text(doc: str) -> List[ScannedNode]:
+    """Get Markdown fenced code blocks from the string doc."""
+    scanner = _Scanner()
+    lines = _LINE_ENDING.split(doc)
+    length = len(lines)
+    if doc.endswith("\n"):
+        length -= 1  # ignore last blank line created by final newline
+    for line in lines[:length]:
+        scanner.incorporate_line(line)
+    return scanner.finish(length)
+
+
+def scan_fenced_blocks(fp: IO[str]) -> List[ScannedNode]:
+    """Get Markdown fenced code blocks as list of ScannedNode objects.
+
+    This is the scanner's counterpart to tool.fenced_block_nodes().
+
+    Args:
+        fp
+            file object returned by open().
+
+    Returns:
+         List of ScannedNode objects.
+    """
+    return scan_text(fp.read())
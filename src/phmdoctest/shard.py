@@ -0,0 +1,163 @@
+"""Split generated test files into shards that take about the same time.
+
+Each test file is weighed by its number of tests, counted from the
+roles of the Markdown file's blocks when the test file is generated
+and recorded in the manifest. When JUnit XML from an earlier pytest run is available the
+test files are weighed by their measured seconds instead. A test file
+missing from the JUnit XML is estimated from its number of tests and
+the average seconds per test of the measured files.
+
+The test files are assigned heaviest first to the shard with the least
+weight so far. A test file is never split. The shards are recorded in
+a shard manifest in the output directory.
+"""
+import heapq
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from phmdoctest.fenced import FencedBlock, Role
+import phmdoctest.tool
+
+
+SHARD_MANIFEST_NAME = ".phmdoctest-shards.json"
+"""Name of the shard manifest written to the output directory."""
+
+
+Shard = NamedTuple(
+    "Shard",
+    [
+        ("index", int),  # 0 to number of shards - 1
+        ("weight", float),  # seconds, or number of tests without durations
+        ("tests", int),  # number of code blocks and session blocks
+        ("files", List[str]),  # test file names in the output directory
+    ],
+)
+"""Test files run together by one pytest worker. (collections.namedtuple)."""
+
+
+def count_tests(blocks: Iterable[FencedBlock]) -> int:
+    """Number of tests generated from the blocks after roles are assigned.
+
+    Each code block and session block is a test. A test file without
+    any has the one test that reports that nothing was tested.
+    """
+    tests = sum(1 for block in blocks if block.role in (Role.CODE, Role.SESSION))
+    return max(1, tests)
+
+
+def junit_durations(junit_xml_string: str) -> Dict[str, float]:
+    """Total seconds of the test cases of each module in JUnit XML.
+
+    Returns:
+        Dict of seconds keyed by module name which is the test file
+        name without .py.
+    """
+    suite, _ = phmdoctest.tool.extract_testsuite(junit_xml_string)
+    durations: Dict[str, float] = {}
+    if suite is None:
+        return durations
+    for case in suite.iter("testcase"):
+        module = case.get("classname", "").rsplit(".", 1)[-1]
+        seconds = float(case.get("time") or 0.0)
+        durations[module] = durations.get(module, 0.0) + seconds
+    return durations
+
+
+def file_weights(
+    tests: Dict[str, int], durations: Optional[Dict[str, float]] = None
+) -> Dict[str, float]:
+    """Weight of each test file.
+
+    Args:
+        tests
+            Number of tests keyed by test file name.
+
+        durations
+            Seconds keyed by module name from junit_durations().
+
+    Returns:
+        Seconds, estimated for files without a duration, keyed by test file
+        name. The number of tests if no file has a duration.
+    """
+    durations = durations or {}
+    measured = {
+        name: durations[Path(name).stem]
+        for name in tests
+        if Path(name).stem in durations
+    }
+    measured_tests = sum(tests[name] for name in measured)
+    if measured_tests:
+        per_test = sum(measured.values()) / measured_tests
+    else:
+        per_test = 1.0
+    return {name: measured.get(name, tests[name] * per_test) for name in tests}
+
+
+def balance(weights: Dict[str, float], shard_count: int) -> List[List[str]]:
+    """Assign each name to one of shard_count shards so the weights are even.
+
+    Heaviest first to the lightest shard. Ties go to the lowest
+    shard index so the result is the same on every run.
+    """
+    if shard_count < 1:
+        raise ValueError(f"phmdoctest- shards must be >= 1, got {shard_count}")
+    loads: List[Tuple[float, int]] = [(0.0, index) for index in range(shard_count)]
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    for name in sorted(weights, key=lambda n: (-weights[n], n)):
+        load, index = heapq.heappop(loads)
+        shards[index].append(name)
+        heapq.heappush(loads, (load + weights[name], index))
+    return [sorted(names) for names in shards]
+
+
+def plan_shards(
+    tests: Dict[str, int],
+    shard_count: int,
+    junit_xml: Optional[Path] = None,
+) -> List[Shard]:
+    """Split the test files into shard_count shards.
+
+    Args:
+        tests
+            Number of tests keyed by test file name from count_tests().
+
+        junit_xml
+            JUnit XML file of an earlier pytest run of the test files.
+            Ignored if None or if it does not exist.
+    """
+    durations = None
+    if junit_xml is not None and junit_xml.exists():
+        durations = junit_durations(junit_xml.read_text(encoding="utf-8"))
+    weights = file_weights(tests, durations)
+    return [
+        Shard(
+            index=index,
+            weight=sum(weights[name] for name in names),
+            tests=sum(tests[name] for name in names),
+            files=names,
+        )
+        for index, names in enumerate(balance(weights, shard_count))
+    ]
+
+
+def save_shards(gendir: Path, shards: Sequence[Shard]) -> None:
+    """Replace the shard manifest in gendir."""
+    data = {"shards": [shard._asdict() for shard in shards]}
+    text = json.dumps(data, indent=2) + "\n"
+    phmdoctest.tool.write_atomically(gendir / SHARD_MANIFEST_NAME, [text])
+
+
+def load_shards(gendir: Path) -> List[Shard]:
+    """Read the shard manifest from gendir."""
+    data = json.loads((gendir / SHARD_MANIFEST_NAME).read_text(encoding="utf-8"))
+    return [Shard(**shard) for shard in data["shards"]]
+
+
+def shard_files(gendir: Path, index: int) -> List[Path]:
+    """Paths of the test files of one shard. Pass them to pytest.
+
+    An empty list means the shard has no test files.
+    """
+    shards = load_shards(Path(gendir))
+    return [Path(gendir) / name for name in shards[index].files]
@@ -5,14 +5,19 @@ will succeed when called by Continuous Integration scripts.
 If --outfile writes a file, the file is written in a
 temporary directory.
 Optionally run pytest on the temporary file.
+pytest runs in a subprocess or in this process.
+Many commands can be run with one pytest session.
 """
 
+import contextlib
+import os
 from pathlib import Path
 import re
 import subprocess
 import sys
 from tempfile import TemporaryDirectory
-from typing import List, Optional, NamedTuple
+from typing import Dict, Iterator, List, Optional, NamedTuple, Tuple
+from xml.etree import ElementTree
 
 import click.testing
 
@@ -35,6 +40,7 @@ def run_and_pytest(
     well_formed_command: str,
     pytest_options: Optional[List[str]] = None,
     junit_family: Optional[str] = None,
+    in_process: bool = False,
 ) -> SimulatorStatus:
     """
     Simulate a phmdoctest command, optionally run pytest.
@@ -44,7 +50,8 @@ def run_and_pytest(
     path to a temporary directory and a synthesized filename.
 
     To run pytest on an ``--outfile``, pass a list of zero or
-    more pytest_options.  pytest is run in a subprocess.
+    more pytest_options.  pytest is run in a subprocess unless
+    in_process is True.
 
     The PYPI package pytest must be installed separately
     since pytest is not required to install phmdoctest.
@@ -89,26 +96,20 @@ def run_and_pytest(
             Pytest configuration option of the same name.
             Set to None or the empty string to skip XML generation.
 
+        in_process
+            Run pytest by pytest.main() in this process instead of
+            a subprocess.  This saves starting Python and loading
+            pytest plugins.  The working directory and sys.path are
+            restored and the generated test module is removed from
+            sys.modules afterwards.
+
     Returns:
         SimulatorStatus containing runner_status, outfile,
         pytest_exit_code, and generated JUnit XML.
     """
-    if not well_formed_command.startswith("phmdoctest "):
-        raise ValueError("phmdoctest- well_formed_command must start with phmdoctest")
-
-    # trim off any trailing whitespace
-    command0 = well_formed_command.rstrip()
-    # chop off phmdoctest since invoking by a python function call
-    command1 = command0.replace("phmdoctest ", "", 1)
-    # simulate commands that don't write OUTFILE.
-    wants_help = "--help" in command1
-    wants_version = "--version" in command1
-    stream_outfile = command1.endswith("--outfile -") or command1.endswith(
-        "--outfile=-"
-    )
-    no_outfile = "--outfile" not in command1
+    command1 = _strip_command(well_formed_command)
     runner = click.testing.CliRunner()
-    if wants_help or wants_version or stream_outfile or no_outfile:
+    if not _writes_outfile(command1):
         return SimulatorStatus(
             runner_status=runner.invoke(cli=entry_point, args=command1),
             outfile=None,
@@ -117,51 +118,10 @@ def run_and_pytest(
         )
 
     # Simulate commands that write an OUTFILE.
-    # Split up the command into pieces.
-    # Chop out the path to the markdown file.
-    # Drop the rest of the command starting at --outfile and the
-    # outfile path since we rename the outfile in the invoked command.
     with TemporaryDirectory() as tmpdir:
         # Create a filename in the temporary directory to
         # receive the OUTFILE.
-        # Rewrite the command to use the new OUTFILE path and
-        # split up the command to a list of strings.
-        # Calling invoke with the single string form of the
-        # rewritten command fails to find the outfile.
-        # This might be because it is now an absolute path
-        # to the tmpdir.
-        markdown_path, command2 = command1.split(maxsplit=1)
-        markdown_name = Path(markdown_path).name
-        outfile_name = "test_" + markdown_name.replace(".md", ".py")
-        outfile_path = Path(tmpdir) / outfile_name
-        command3 = command2[: command2.find("--outfile")].strip()
-
-        # Split up the rest of the command into pieces to pass to
-        # runner.invoke().
-        #
-        # Developers:
-        # Note the --outfile part has already been removed from command3.
-        # If a new option that takes TEXT is added, add code here
-        # to replace its '='.
-        #
-        # Special code to handle a --skip TEXT where TEXT is double quoted.
-        # For example
-        #    --skip="Python 3.7"
-        #         or
-        #    --skip "Python 3.7"
-        command4a = command3.replace("--skip=", "--skip ")
-        command4b = command4a.replace("--setup=", "--setup ")
-        command4 = command4b.replace("--teardown=", "--teardown ")
-
-        # get characters between double quotes including the quotes
-        # get runs of non-whitespace characters
-        args1 = re.findall(pattern=r'("[^"]*"|\S+)', string=command4)
-        # If both leading and trailing double quotes, remove them.
-        args2 = [re.sub('^"([^"]*)"$', r"\1", arg) for arg in args1]
-        phm_args = [markdown_path]
-        phm_args.extend(args2)
-        phm_args.extend(["--outfile", str(outfile_path)])
-        runner_status = runner.invoke(cli=entry_point, args=phm_args)
+        runner_status, outfile_path = _generate(runner, command1, Path(tmpdir))
 
         # return now if the command failed
         if runner_status.exit_code:
@@ -183,15 +143,14 @@ def run_and_pytest(
                 junit_xml="",
             )
         else:
-            # Run python -m pytest [options] in a subprocess.
-            commandline = [sys.executable, "-m", "pytest"] + pytest_options
+            # Run python -m pytest [options] in a subprocess or pytest.main().
+            commandline = list(pytest_options)
             if junit_family:
-                junit_name = outfile_name.replace(".py", ".xml")
-                junit_path = Path(tmpdir) / junit_name
+                junit_path = outfile_path.with_suffix(".xml")
                 commandline.append("--junitxml=" + str(junit_path))
-                commandline.append("-o junit_family=" + junit_family)
+                commandline.extend(["-o", "junit_family=" + junit_family])
             commandline.append(tmpdir)
-            completed = subprocess.run(commandline)
+            pytest_exit_code = _run_pytest(commandline, Path(tmpdir), in_process)
 
             xml = ""
             if junit_family:
@@ -200,6 +159,245 @@ def run_and_pytest(
             return SimulatorStatus(
                 runner_status=runner_status,
                 outfile=outfile_text,
-                pytest_exit_code=completed.returncode,
+                pytest_exit_code=pytest_exit_code,
                 junit_xml=xml,
             )
+
+
+def run_and_pytest_batch(
+    well_formed_commands: List[str],
+    pytest_options: Optional[List[str]] = None,
+    junit_family: Optional[str] = None,
+    in_process: bool = False,
+) -> List[SimulatorStatus]:
+    """Simulate many phmdoctest commands and run pytest once on all outfiles.
+
+    Each command is simulated like run_and_pytest().  The outfiles
+    are written to separate subdirectories of one temporary
+    directory and pytest runs once on all of them with the
+    pytest options ``--import-mode=importlib`` and
+    ``--continue-on-collection-errors`` added.
+
+    The JUnit XML of the pytest run is split up by outfile.
+    Each command's pytest_exit_code is derived from its test cases:
+    0 all passed or skipped, 1 a test failed or had an error,
+    2 the outfile could not be collected, 5 no tests were collected.
+    Commands that don't write an outfile or fail are not run by pytest.
+
+    Args:
+        well_formed_commands
+            List of commands as described by run_and_pytest().
+
+        pytest_options
+            Options for the single pytest run as described by
+            run_and_pytest(). Set to None to skip pytest.
+
+        junit_family
+            Format of the JUnit XML returned in each SimulatorStatus.
+            Set to None or the empty string to skip returning XML.
+            The pytest run always writes xunit2 JUnit XML when
+            junit_family is not set.
+
+        in_process
+            Run pytest in this process as described by run_and_pytest().
+
+    Returns:
+        List of SimulatorStatus in the same order as well_formed_commands.
+    """
+    commands = [_strip_command(command) for command in well_formed_commands]
+    runner = click.testing.CliRunner()
+    statuses: List[Optional[SimulatorStatus]] = [None] * len(commands)
+    with TemporaryDirectory() as tmpdir:
+        generated: Dict[int, Tuple[click.testing.Result, str]] = {}
+        for index, command1 in enumerate(commands):
+            if _writes_outfile(command1):
+                subdir = Path(tmpdir) / _batch_dirname(index)
+                subdir.mkdir()
+                runner_status, outfile_path = _generate(runner, command1, subdir)
+                if not runner_status.exit_code:
+                    text = outfile_path.read_text(encoding="utf-8")
+                    generated[index] = (runner_status, text)
+                    continue
+            else:
+                runner_status = runner.invoke(cli=entry_point, args=command1)
+            statuses[index] = SimulatorStatus(
+                runner_status=runner_status,
+                outfile=None,
+                pytest_exit_code=None,
+                junit_xml="",
+            )
+        if generated and pytest_options is not None:
+            exit_codes, xmls = _batch_pytest(
+                Path(tmpdir), list(generated), pytest_options, junit_family, in_process
+            )
+        else:
+            exit_codes, xmls = {}, {}
+        for index, (runner_status, text) in generated.items():
+            statuses[index] = SimulatorStatus(
+                runner_status=runner_status,
+                outfile=text,
+                pytest_exit_code=exit_codes.get(index),
+                junit_xml=xmls.get(index, "") if junit_family else "",
+            )
+    return [status for status in statuses if status is not None]
+
+
+def _strip_command(well_formed_command: str) -> str:
+    """Check for and remove the leading phmdoctest and trailing whitespace."""
+    if not well_formed_command.startswith("phmdoctest "):
+        raise ValueError("phmdoctest- well_formed_command must start with phmdoctest")
+
+    # trim off any trailing whitespace
+    command0 = well_formed_command.rstrip()
+    # chop off phmdoctest since invoking by a python function call
+    return command0.replace("phmdoctest ", "", 1)
+
+
+def _writes_outfile(command1: str) -> bool:
+    """False for commands that don't write OUTFILE."""
+    wants_help = "--help" in command1
+    wants_version = "--version" in command1
+    stream_outfile = command1.endswith("--outfile -") or command1.endswith(
+        "--outfile=-"
+    )
+    no_outfile = "--outfile" not in command1
+    return not (wants_help or wants_version or stream_outfile or no_outfile)
+
+
+def _generate(
+    runner: click.testing.CliRunner, command1: str, directory: Path
+) -> Tuple[click.testing.Result, Path]:
+    """Invoke the command with OUTFILE replaced by a file in directory."""
+    # Split up the command into pieces.
+    # Chop out the path to the markdown file.
+    # Drop the rest of the command starting at --outfile and the
+    # outfile path since we rename the outfile in the invoked command.
+    #
+    # Rewrite the command to use the new OUTFILE path and
+    # split up the command to a list of strings.
+    # Calling invoke with the single string form of the
+    # rewritten command fails to find the outfile.
+    # This might be because it is now an absolute path
+    # to the tmpdir.
+    markdown_path, command2 = command1.split(maxsplit=1)
+    markdown_name = Path(markdown_path).name
+    outfile_name = "test_" + markdown_name.replace(".md", ".py")
+    outfile_path = directory / outfile_name
+    command3 = command2[: command2.find("--outfile")].strip()
+
+    # Split up the rest of the command into pieces to pass to
+    # runner.invoke().
+    #
+    # Developers:
+    # Note the --outfile part has already been removed from command3.
+    # If a new option that takes TEXT is added, add code here
+    # to replace its '='.
+    #
+    # Special code to handle a --skip TEXT where TEXT is double quoted.
+    # For example
+    #    --skip="Python 3.7"
+    #         or
+    #    --skip "Python 3.7"
+    command4a = command3.replace("--skip=", "--skip ")
+    command4b = command4a.replace("--setup=", "--setup ")
+    command4 = command4b.replace("--teardown=", "--teardown ")
+
+    # get characters between double quotes including the quotes
+    # get runs of non-whitespace characters
+    args1 = re.findall(pattern=r'("[^"]*"|\S+)', string=command4)
+    # If both leading and trailing double quotes, remove them.
+    args2 = [re.sub('^"([^"]*)"$', r"\1", arg) for arg in args1]
+    phm_args = [markdown_path]
+    phm_args.extend(args2)
+    phm_args.extend(["--outfile", str(outfile_path)])
+    return runner.invoke(cli=entry_point, args=phm_args), outfile_path
+
+
+@contextlib.contextmanager
+def _isolated(directory: Path) -> Iterator[None]:
+    """Restore the working directory and sys.path. Unload modules in directory."""
+    cwd = os.getcwd()
+    path = list(sys.path)
+    modules = set(sys.modules)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+        sys.path[:] = path
+        prefix = str(directory.resolve())
+        for name in set(sys.modules) - modules:
+            module_file = getattr(sys.modules[name], "__file__", None) or ""
+            if os.path.realpath(module_file).startswith(prefix):
+                del sys.modules[name]
+
+
+def _run_pytest(args: List[str], directory: Path, in_process: bool) -> int:
+    """Run pytest with args in a subprocess or this process. Return exit code."""
+    if not in_process:
+        completed = subprocess.run([sys.executable, "-m", "pytest"] + args)
+        return completed.returncode
+    import pytest
+
+    with _isolated(directory):
+        return int(pytest.main(args))
+
+
+def _batch_dirname(index: int) -> str:
+    """Subdirectory of the batch temporary directory for a command."""
+    return "cmd_{:04d}".format(index)
+
+
+def _batch_pytest(
+    directory: Path,
+    indexes: List[int],
+    pytest_options: List[str],
+    junit_family: Optional[str],
+    in_process: bool,
+) -> Tuple[Dict[int, int], Dict[int, str]]:
+    """Run pytest once on the batch. Return exit codes and XML by command."""
+    junit_path = directory / "batch.xml"
+    commandline = list(pytest_options)
+    commandline.append("--import-mode=importlib")
+    commandline.append("--continue-on-collection-errors")
+    commandline.append("--rootdir=" + str(directory))
+    commandline.append("--junitxml=" + str(junit_path))
+    commandline.extend(["-o", "junit_family=" + (junit_family or "xunit2")])
+    commandline.append(str(directory))
+    _ = _run_pytest(commandline, directory, in_process)
+    root = ElementTree.fromstring(junit_path.read_text(encoding="utf-8"))
+    exit_codes = {}
+    xmls = {}
+    for index in indexes:
+        prefix = _batch_dirname(index) + "."
+        exit_codes[index], xmls[index] = _split_junit_xml(root, prefix)
+    return exit_codes, xmls
+
+
+def _split_junit_xml(root: ElementTree.Element, prefix: str) -> Tuple[int, str]:
+    """Exit code and JUnit XML of the test cases with classname prefix."""
+    suite = root.find("testsuite")
+    assert suite is not None, "pytest JUnit XML has a testsuite."
+    new_root = ElementTree.Element(root.tag, root.attrib)
+    new_suite = ElementTree.SubElement(new_root, suite.tag, dict(suite.attrib))
+    counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+    exit_code = 0
+    for case in suite.findall("testcase"):
+        name = case.get("classname") or case.get("name") or ""
+        if not name.startswith(prefix):
+            continue
+        new_suite.append(case)
+        counts["tests"] += 1
+        for tag, key in [("failure", "failures"), ("error", "errors")]:
+            if case.find(tag) is not None:
+                counts[key] += 1
+                exit_code = max(exit_code, 1)
+        if case.find("skipped") is not None:
+            counts["skipped"] += 1
+        if not case.get("classname"):
+            exit_code = 2  # collection error
+    for key, value in counts.items():
+        new_suite.set(key, str(value))
+    if not counts["tests"]:
+        exit_code = 5
+    xml = ElementTree.tostring(new_root, encoding="unicode")
+    return exit_code, xml
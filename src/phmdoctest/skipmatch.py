@@ -0,0 +1,162 @@
+"""Find which of many --skip patterns each block contains in one pass."""
+import functools
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import click
+
+POSITIONAL_SKIPS = {"FIRST": 0, "SECOND": 1, "LAST": -1}
+"""Skip TEXT values that select a block by its position."""
+
+
+AUTOMATON_THRESHOLD = 16
+"""Fewest substring patterns searched with the Aho-Corasick automaton.
+
+With fewer patterns each one is searched by the str in operator which
+is faster than stepping the automaton one character at a time.
+"""
+
+
+class _Automaton:
+    """Aho-Corasick automaton that finds all the patterns in a text."""
+
+    def __init__(self, patterns: Sequence[Tuple[int, str]]) -> None:
+        """Build the trie, failure links, and outputs of the patterns.
+
+        Args:
+            patterns
+                Pairs of pattern number and non-empty pattern string.
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Tuple[int, ...]] = [()]
+        for number, pattern in patterns:
+            state = 0
+            for ch in pattern:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = next_state
+            self.out[state] += (number,)
+        self.alphabet = set("".join(p for _, p in patterns))
+        self._link()
+
+    def _link(self) -> None:
+        """Breadth first pass that sets the failure links and merges outputs."""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(ch, 0)
+                self.fail[child] = link if link != child else 0
+                self.out[child] += self.out[self.fail[child]]
+
+    def search(self, text: str, wanted: int) -> Set[int]:
+        """Numbers of the patterns found in text. Stop when wanted are found."""
+        goto, fail, out, alphabet = self.goto, self.fail, self.out, self.alphabet
+        found: Set[int] = set()
+        state = 0
+        for ch in text:
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+                if len(found) == wanted:
+                    break
+        return found
+
+
+class SkipMatcher:
+    """Match a list of skip patterns against many blocks.
+
+    Built once from the --skip TEXT values and regular expressions.
+    The substring patterns are searched together so that each block's
+    contents are scanned once. The positional patterns FIRST, SECOND,
+    and LAST select a block by its place in the list of blocks.
+    """
+
+    def __init__(self, skips: Sequence[str], skip_regexes: Sequence[str] = ()) -> None:
+        """Compile the patterns.
+
+        Args:
+            skips
+                Substrings or FIRST, SECOND, LAST.
+
+            skip_regexes
+                Regular expressions searched for by re.search().
+        """
+        self.patterns = list(skips) + list(skip_regexes)
+        substrings = [
+            (number, text)
+            for number, text in enumerate(skips)
+            if text not in POSITIONAL_SKIPS
+        ]
+        # An empty string is in every block.
+        self._everywhere = [number for number, text in substrings if not text]
+        substrings = [(number, text) for number, text in substrings if text]
+        self._substrings = substrings
+        self._automaton: Optional[_Automaton] = None
+        if len(substrings) >= AUTOMATON_THRESHOLD:
+            self._automaton = _Automaton(substrings)
+        self._regexes = [
+            (number, _compile(regex))
+            for number, regex in enumerate(skip_regexes, start=len(skips))
+        ]
+        self._positional = [
+            (number, POSITIONAL_SKIPS[text])
+            for number, text in enumerate(skips)
+            if text in POSITIONAL_SKIPS
+        ]
+
+    def search(self, contents: str) -> Set[int]:
+        """Numbers of the substring and regex patterns found in contents."""
+        if self._automaton is not None:
+            found = self._automaton.search(contents, len(self._substrings))
+        else:
+            found = set(n for n, text in self._substrings if text in contents)
+        found.update(self._everywhere)
+        found.update(n for n, regex in self._regexes if regex.search(contents))
+        return found
+
+    def matches(self, contents: List[str]) -> List[List[int]]:
+        """For each pattern the indexes of the contents that match it.
+
+        Args:
+            contents
+                Contents of each block in Markdown file order.
+        """
+        matched: List[List[int]] = [[] for _ in self.patterns]
+        for index, text in enumerate(contents):
+            for number in self.search(text):
+                matched[number].append(index)
+        for number, position in self._positional:
+            if contents and len(contents) > position:
+                matched[number].append(position % len(contents))
+        return matched
+
+
+def _compile(regex: str) -> "re.Pattern[str]":
+    """Compile a skip regular expression. Raise ClickException if invalid."""
+    try:
+        return re.compile(regex)
+    except re.error as exc:
+        raise click.ClickException(
+            f"phmdoctest- --skip-regex {regex!r} is not a regular expression: {exc}"
+        )
+
+
+@functools.lru_cache(maxsize=8)
+def skip_matcher(skips: Tuple[str, ...], skip_regexes: Tuple[str, ...]) -> SkipMatcher:
+    """SkipMatcher shared by the Markdown files that use the same skips."""
+    return SkipMatcher(skips, skip_regexes)
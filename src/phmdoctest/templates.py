@@ -0,0 +1,117 @@
+"""Code generation templates split once into fixed segments.
+
+The source of the template functions in phmdoctest.functions is read
+once when this module is imported. The module is parsed, not imported,
+since importing it imports pytest which generating doesn't need.
+Each template is split at its slots so generating a function
+is a single join of the fixed segments and the slot values.
+"""
+import ast
+import inspect
+import pkgutil
+from typing import Dict, Sequence, Tuple
+
+SETUP_SLOT = "    # <setup code here>\n"
+TEARDOWN_SLOT = "    # <teardown code here>\n"
+CODE_SLOT = "    # <put code here>\n"
+OUTPUT_SLOT = "<<<replaced>>>"
+CAUTION = "\n    # Caution- no assertions.\n"
+
+
+class Template:
+    """Template source split at the slots in the order they appear."""
+
+    def __init__(self, source: str, slots: Sequence[str]) -> None:
+        """Split source at the first occurrence of each slot in order.
+
+        Args:
+            source
+                Template source code.
+
+            slots
+                Text in source replaced by the values passed to fill().
+        """
+        segments = []
+        rest = source
+        for slot in slots:
+            head, found, rest = rest.partition(slot)
+            assert found, "template is missing {!r}.".format(slot)
+            segments.append(head)
+        segments.append(rest)
+        self.slots = tuple(slots)
+        self.segments: Tuple[str, ...] = tuple(segments)
+
+    def fill(self, *values: str) -> str:
+        """Return the template with values in place of the slots."""
+        assert len(values) == len(self.slots), "need one value per slot."
+        parts = [self.segments[0]]
+        for value, segment in zip(values, self.segments[1:]):
+            parts.append(value)
+            parts.append(segment)
+        return "".join(parts)
+
+
+def _read_functions() -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Source of each function and value of each string in phmdoctest.functions.
+
+    A function's source includes its decorators like inspect.getsource().
+    """
+    data = pkgutil.get_data("phmdoctest", "functions.py")
+    assert data is not None, "phmdoctest/functions.py is missing."
+    text = data.decode("utf-8")
+    lines = text.splitlines(keepends=True)
+    sources = {}
+    strings = {}
+    for node in ast.parse(text).body:
+        if isinstance(node, ast.FunctionDef):
+            first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            sources[node.name] = "".join(inspect.getblock(lines[first - 1 :]))
+        elif isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            try:
+                value = ast.literal_eval(node.value)
+            except ValueError:
+                continue  # not a literal
+            if isinstance(value, str):
+                strings[node.targets[0].id] = value
+    return sources, strings
+
+
+_SOURCES, _STRINGS = _read_functions()
+
+
+def _test_template(name: str, slots: Sequence[str]) -> Template:
+    """Template of a test function with the function's name as the first slot."""
+    source = _SOURCES[name]
+    if OUTPUT_SLOT not in slots:
+        source = source.replace("    pass\n", CAUTION)
+    return Template(source, [name] + list(slots))
+
+
+CODE_AND_OUTPUT = _test_template("test_code_and_output", [CODE_SLOT, OUTPUT_SLOT])
+"""Slots: function name, indented code, expected output."""
+
+CODE_ONLY = _test_template("test_code_only", [CODE_SLOT])
+"""Slots: function name, indented code."""
+
+MANAGED_CODE_AND_OUTPUT = _test_template(
+    "test_managed_code_and_output", [CODE_SLOT, OUTPUT_SLOT]
+)
+"""Slots: function name, indented code, expected output."""
+
+MANAGED_CODE_ONLY = _test_template("test_managed_code_only", [CODE_SLOT])
+"""Slots: function name, indented code."""
+
+SETUP_TEARDOWN = Template(_SOURCES["_phm_setup_teardown"], [SETUP_SLOT, TEARDOWN_SLOT])
+"""Slots: indented setup code, indented teardown code."""
+
+SETUP_DOCTEST_TEARDOWN = Template(
+    _SOURCES["_phm_setup_doctest_teardown"], [SETUP_SLOT, TEARDOWN_SLOT]
+)
+"""Slots: indented setup code, indented teardown code."""
+
+SESSION_00000 = _SOURCES["session_00000"]
+NOTHING_FAILS = _SOURCES["test_nothing_fails"]
+NOTHING_PASSES = _SOURCES["test_nothing_passes"]
+POPULATE_DOCTEST_NAMESPACE = _STRINGS["populate_doctest_namespace_str"]
+PROFILE_EXAMPLES = _STRINGS["profile_examples_str"]
+SESSION_GLOBALS = _STRINGS["session_globals_str"]
@@ -1,9 +1,12 @@
-"""testfile_creator and testfile_tester pytest fixtures."""
+"""testfile_creator, testfile_tester, and testfile_batch pytest fixtures."""
+from collections import Counter
+import importlib.util
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 from typing import Optional
 
 import phmdoctest.main
+import phmdoctest.simulator
 import pytest
 from _pytest.pytester import RunResult
 
@@ -139,3 +142,148 @@ def testfile_tester(pytester):  # type: ignore
         return run_result
 
     return test_testfile
+
+
+class BatchResult:
+    """Outcomes of the tests in one file of a testfile_batch run.
+
+    A stand in for the pytest RunResult returned by testfile_tester.
+    """
+
+    def __init__(self, outcomes: Dict[str, int], ret: int) -> None:
+        """outcomes maps nouns like "passed" and "errors" to counts."""
+        self.outcomes = outcomes
+        # 0 passed, 1 failed or errors, 2 not collected, 5 no tests.
+        self.ret = ret
+
+    def parseoutcomes(self) -> Dict[str, int]:
+        """Return the non-zero outcome counts like RunResult.parseoutcomes()."""
+        return {noun: count for noun, count in self.outcomes.items() if count}
+
+    def assert_outcomes(
+        self,
+        passed: int = 0,
+        skipped: int = 0,
+        failed: int = 0,
+        errors: int = 0,
+        xpassed: int = 0,
+        xfailed: int = 0,
+        warnings: int = 0,
+    ) -> None:
+        """Assert the test outcome counts like RunResult.assert_outcomes()."""
+        expected = dict(
+            passed=passed,
+            skipped=skipped,
+            failed=failed,
+            errors=errors,
+            xpassed=xpassed,
+            xfailed=xfailed,
+            warnings=warnings,
+        )
+        got = {noun: self.outcomes.get(noun, 0) for noun in expected}
+        assert got == expected
+
+
+class _OutcomeRecorder:
+    """pytest plugin that counts test outcomes by test file."""
+
+    def __init__(self) -> None:
+        self.outcomes: Dict[str, "Counter[str]"] = {}
+
+    def _count(self, nodeid: str, noun: str) -> None:
+        filename = nodeid.split("::")[0]
+        self.outcomes.setdefault(filename, Counter())[noun] += 1
+
+    def pytest_collectreport(self, report) -> None:  # type: ignore
+        if report.failed:
+            self._count(report.nodeid, "errors")
+
+    def pytest_runtest_logreport(self, report) -> None:  # type: ignore
+        wasxfail = hasattr(report, "wasxfail")
+        if report.when == "call":
+            if report.passed:
+                self._count(report.nodeid, "xpassed" if wasxfail else "passed")
+            elif report.skipped:
+                self._count(report.nodeid, "xfailed" if wasxfail else "skipped")
+            else:
+                self._count(report.nodeid, "failed")
+        elif report.failed:
+            self._count(report.nodeid, "errors")
+        elif report.skipped:
+            self._count(report.nodeid, "skipped")
+
+    def pytest_warning_recorded(self, nodeid) -> None:  # type: ignore
+        if nodeid:
+            self._count(nodeid, "warnings")
+
+
+def _batch_exit_code(outcomes: "Counter[str]") -> int:
+    """Exit code pytest would return for one file of the batch."""
+    tests = sum(outcomes[noun] for noun in ["passed", "failed", "skipped"])
+    tests += outcomes["xpassed"] + outcomes["xfailed"]
+    if outcomes["failed"] or outcomes["errors"]:
+        return 2 if not tests else 1
+    return 0 if tests else 5
+
+
+@pytest.fixture(scope="module")
+def testfile_batch(tmp_path_factory):  # type: ignore
+    """Fixture runs pytest once on many of the caller's pytest file strings.
+
+    A module scoped companion to testfile_tester. The test files are
+    written to one temporary directory and pytest runs once on all of
+    them in the current process with the pytest options
+    ``--import-mode=importlib`` and ``--continue-on-collection-errors``
+    added. This saves starting a pytester session for each file.
+    Generate the test files with phmdoctest.main.testfile() since
+    testfile_creator is function scoped.
+    See example usage in the file tests/test_many_markdown.py.
+
+    The fixture injects a function with the following signature. Please
+    consult the source in tester.py.
+
+    Args:
+        testfiles
+            Dict mapping test file names to strings containing
+            the contents of each pytest test file.
+
+        pytest_options
+            List of strings of pytest command line options.
+
+        workers
+            Run the tests in parallel with this many pytest-xdist
+            workers by passing the ``-n`` option. Ignored when
+            pytest-xdist is not installed.
+
+    Returns:
+        Dict mapping each test file name to a BatchResult.
+    """
+
+    def run_batch(
+        testfiles: Dict[str, str],
+        pytest_options: Optional[List[str]] = None,
+        workers: Optional[int] = None,
+    ) -> Dict[str, BatchResult]:
+        """Write the test files to one directory and run pytest once."""
+        directory = tmp_path_factory.mktemp("testfile_batch")
+        for testfile_name, contents in testfiles.items():
+            assert len(contents), "Must not be empty string."
+            _ = (directory / testfile_name).write_text(contents, encoding="utf-8")
+        args = list(pytest_options or [])
+        args.extend(["--import-mode=importlib", "--rootdir", str(directory)])
+        args.extend(["--continue-on-collection-errors", "-p", "no:cacheprovider"])
+        if workers and importlib.util.find_spec("xdist") is not None:
+            args.extend(["-n", str(workers)])
+        args.append(str(directory))
+        recorder = _OutcomeRecorder()
+        with phmdoctest.simulator._isolated(directory):
+            _ = pytest.main(args, plugins=[recorder])
+        results = {}
+        for testfile_name in testfiles:
+            outcomes = recorder.outcomes.get(testfile_name, Counter())
+            results[testfile_name] = BatchResult(
+                outcomes=dict(outcomes), ret=_batch_exit_code(outcomes)
+            )
+        return results
+
+    return run_batch
@@ -0,0 +1,123 @@
+"""Wall time and peak memory of the phases of test file generation."""
+from collections import OrderedDict
+import contextlib
+import json
+from pathlib import Path
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import click
+
+
+PhaseTiming = NamedTuple(
+    "PhaseTiming",
+    [
+        ("filename", str),  # Markdown file or empty string for the whole run
+        ("phase", str),
+        ("seconds", float),  # wall time
+        ("peak_bytes", int),  # most memory allocated during the phase
+    ],
+)
+"""Measurement of one phase. (collections.namedtuple)."""
+
+
+class Timings:
+    """Record the wall time and peak memory of phases.
+
+    Peak memory is measured by tracemalloc while the phase runs.
+    tracemalloc slows down Python so only turn on timings when needed.
+    When not enabled phase() does nothing.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.records: List[PhaseTiming] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str, filename: str = "") -> Iterator[None]:
+        """Context manager that measures the code in its block."""
+        if not self.enabled:
+            yield
+            return
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start()
+        else:
+            reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(0, tracemalloc.get_traced_memory()[1] - base)
+            if started_here:
+                tracemalloc.stop()
+            self.records.append(PhaseTiming(filename, name, seconds, peak))
+
+    def extend(self, records: Iterable[PhaseTiming]) -> None:
+        """Add records measured elsewhere, for example in a worker process."""
+        self.records.extend(records)
+
+    def totals(self) -> "OrderedDict[str, PhaseTiming]":
+        """Sum of seconds and largest peak of each phase over all files."""
+        totals: "OrderedDict[str, PhaseTiming]" = OrderedDict()
+        for record in self.records:
+            total = totals.get(record.phase)
+            if total is None:
+                totals[record.phase] = record._replace(filename="")
+            else:
+                totals[record.phase] = total._replace(
+                    seconds=total.seconds + record.seconds,
+                    peak_bytes=max(total.peak_bytes, record.peak_bytes),
+                )
+        return totals
+
+    def table(self) -> str:
+        """Text table of each record followed by totals if more than one file."""
+        import monotable
+
+        table = monotable.MonoTable()
+        headings = ["file", "phase", "seconds", "peak KiB"]
+        formats = ["", "", ".4f", ".1f"]
+        cell_grid: List[List[Any]] = []
+        for record in self.records:
+            cell_grid.append(_row(record, record.filename))
+        if len(set(record.filename for record in self.records)) > 1:
+            for total in self.totals().values():
+                cell_grid.append(_row(total, "(total)"))
+        text = table.table(headings, formats, cell_grid, "phmdoctest- timings")
+        return str(text)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Records and totals as a dict that can be serialized to JSON."""
+        return {
+            "records": [record._asdict() for record in self.records],
+            "totals": [total._asdict() for total in self.totals().values()],
+        }
+
+    def report(self, json_file: Optional[str] = None, table: bool = True) -> None:
+        """Print the table to stderr if table and write JSON to json_file if given."""
+        if not self.enabled:
+            return
+        if table:
+            click.echo(self.table(), err=True)
+        if json_file:
+            text = json.dumps(self.as_dict(), indent=2) + "\n"
+            _ = Path(json_file).write_text(text, encoding="utf-8")
+
+
+def _row(record: PhaseTiming, filename: str) -> List[Any]:
+    """Table row of the record shown with filename in the file column."""
+    return [filename, record.phase, record.seconds, record.peak_bytes / 1024]
+
+
+def reset_peak() -> None:
+    """Reset the tracemalloc peak if supported by this Python.
+
+    Also used by phmdoctest.profiler.
+    """
+    reset = getattr(tracemalloc, "reset_peak", None)  # Python 3.9+
+    if reset is not None:
+        reset()
@@ -1,7 +1,19 @@
 """General purpose tools get fenced code blocks from Markdown."""
 from collections import namedtuple
+import os
 from pathlib import Path
-from typing import IO, Optional, List, NamedTuple, Tuple
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+)
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
 
@@ -10,6 +22,8 @@ import commonmark.node  # type: ignore
 
 import phmdoctest.direct
 import phmdoctest.fillrole
+import phmdoctest.parsecache
+import phmdoctest.scanner
 
 
 class FCBChooser:
@@ -23,6 +37,9 @@ class FCBChooser:
                 Path to the Markdown file as a string.
         """
         self._blocks = labeled_fenced_code_blocks(markdown_filename)
+        self._index: Dict[str, str] = {}
+        for block in self._blocks:
+            _ = self._index.setdefault(block.label, block.contents)
 
     def contents(self, label: str = "") -> str:
         """Return contents of the labeled fenced code block with label.
@@ -37,10 +54,7 @@ class FCBChooser:
             or empty string if the label is not found. Fenced code block
             strings typically end with a newline.
         """
-        for block in self._blocks:
-            if block.label == label:
-                return block.contents
-        return ""
+        return self._index.get(label, "")
 
 
 LabeledFCB = NamedTuple(
@@ -95,21 +109,27 @@ def labeled_fenced_code_blocks(markdown_filename: str) -> List[LabeledFCB]:
           starts.
         - contents is the fenced code block contents as a string.
     """
-    with open(markdown_filename, "r", encoding="utf-8") as fp:
-        nodes = fenced_block_nodes(fp)
-        labeled_blocks = []
-        for node in nodes:
-            directives = phmdoctest.direct.get_directives(node)
-            for directive in directives:
-                if directive.type == phmdoctest.direct.Marker.LABEL:
-                    block = LabeledFCB(
-                        label=directive.value,
-                        line=node.sourcepos[0][0] + 1,
-                        contents=node.literal,
-                    )
-                    labeled_blocks.append(block)
-                    break
-    return labeled_blocks
+    labeled_blocks = phmdoctest.parsecache.PARSE_CACHE.get(
+        markdown_filename, "labeled", _parse_labeled
+    )
+    return list(labeled_blocks)
+
+
+def _parse_labeled(markdown_filename: str) -> Tuple[LabeledFCB, ...]:
+    """Parse the Markdown file for labeled_fenced_code_blocks()."""
+    labeled_blocks = []
+    for node in cached_fenced_nodes(markdown_filename):
+        directives = phmdoctest.direct.get_directives(node)
+        for directive in directives:
+            if directive.type == phmdoctest.direct.Marker.LABEL:
+                block = LabeledFCB(
+                    label=directive.value,
+                    line=node.sourcepos[0][0] + 1,
+                    contents=node.literal,
+                )
+                labeled_blocks.append(block)
+                break
+    return tuple(labeled_blocks)
 
 
 def fenced_code_blocks(markdown_filename: str) -> List[str]:
@@ -123,9 +143,49 @@ def fenced_code_blocks(markdown_filename: str) -> List[str]:
         List of strings, one for the contents of each Markdown
         fenced code block.
     """
+    return [node.literal for node in cached_fenced_nodes(markdown_filename)]
+
+
+def _parse_commonmark(markdown_filename: str) -> Tuple[Any, ...]:
+    """Fenced code block nodes of the Markdown file."""
+    with open(markdown_filename, "r", encoding="utf-8") as fp:
+        return tuple(fenced_block_nodes(fp))
+
+
+def _parse_scanner(markdown_filename: str) -> Tuple[Any, ...]:
+    """Fenced code blocks of the Markdown file found by phmdoctest.scanner."""
     with open(markdown_filename, "r", encoding="utf-8") as fp:
-        nodes = fenced_block_nodes(fp)
-        return [node.literal for node in nodes]
+        return tuple(phmdoctest.scanner.scan_fenced_blocks(fp))
+
+
+def cached_fenced_nodes(markdown_filename: str, fast_scan: bool = False) -> List[Any]:
+    """Fenced code block nodes of the Markdown file. Parsed once per change.
+
+    The parse is kept in phmdoctest.parsecache.PARSE_CACHE.
+    The file is parsed again when its modification time or size changes.
+    The nodes are shared with other callers and must not be changed.
+
+    Args:
+        markdown_filename
+            Path to the Markdown file as a string.
+
+        fast_scan
+            Find fenced code blocks with phmdoctest.scanner
+            instead of the commonmark parser.
+
+    Returns:
+        List of commonmark.node.Node objects or
+        phmdoctest.scanner.ScannedNode objects if fast_scan.
+    """
+    if fast_scan:
+        nodes = phmdoctest.parsecache.PARSE_CACHE.get(
+            markdown_filename, "scanner", _parse_scanner
+        )
+    else:
+        nodes = phmdoctest.parsecache.PARSE_CACHE.get(
+            markdown_filename, "commonmark", _parse_commonmark
+        )
+    return list(nodes)
 
 
 def fenced_block_nodes(fp: IO[str]) -> List[commonmark.node.Node]:
@@ -189,7 +249,9 @@ PythonExamples = namedtuple("PythonExamples", ["has_code", "has_session"])
 """
 
 
-def detect_python_examples(markdown_path: Path) -> "PythonExamples":
+def detect_python_examples(
+    markdown_path: Path, fast_scan: bool = False
+) -> "PythonExamples":
     """Return whether .md has any Python highlighted fenced code blocks.
 
      This includes Python code blocks and Python doctest interactive session
@@ -206,23 +268,63 @@ def detect_python_examples(markdown_path: Path) -> "PythonExamples":
          markdown_path
              pathlib.Path of input Markdown file.
 
+         fast_scan
+             Find fenced code blocks with phmdoctest.scanner
+             instead of the commonmark parser.
+
+    """
+    fenced = cached_fenced_nodes(str(markdown_path), fast_scan=fast_scan)
+    return python_examples_in(fenced)
+
+
+def python_examples_in(fenced: Sequence[Any]) -> "PythonExamples":
+    """Return presence of Python fenced code blocks in the list of nodes.
+
+    Args:
+        fenced
+            commonmark.node.Node fenced code blocks from fenced_block_nodes()
+            or ScannedNode objects from phmdoctest.scanner.
     """
-    with open(markdown_path, "r", encoding="utf-8") as fp:
-        fenced = fenced_block_nodes(fp)
-    has_code = any(phmdoctest.fillrole.is_python_block(node) for node in fenced)
-    has_session = any(phmdoctest.fillrole.is_doctest_block(node) for node in fenced)
     return PythonExamples(
-        has_code=has_code,
-        has_session=has_session,
+        has_code=any(phmdoctest.fillrole.is_python_block(node) for node in fenced),
+        has_session=any(phmdoctest.fillrole.is_doctest_block(node) for node in fenced),
     )
 
 
+def write_atomically(outfile: Path, chunks: Iterable[str]) -> None:
+    """Write the chunks to a temporary file then replace outfile with it.
+
+    A reader of outfile sees the old or the new contents, never a
+    partly written file.  If getting a chunk raises an exception
+    outfile is left alone.
+
+    Args:
+        outfile
+            pathlib.Path of the file to write.
+
+        chunks
+            Strings written in order. They are not all held in memory.
+    """
+    temp_path = outfile.with_name(".{}.{}.tmp".format(outfile.name, os.getpid()))
+    try:
+        with open(str(temp_path), "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                _ = f.write(chunk)
+        os.replace(str(temp_path), str(outfile))
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+
 def _with_stem(path: Path, stem: str) -> Path:
     """Replacement for pathlib.PurePath.with_stem() which is new Python 3.9."""
     return path.with_name(stem + path.suffix)
 
 
-def wipe_testfile_directory(target_dir: Path) -> None:
+def wipe_testfile_directory(
+    target_dir: Path, keep: Optional[Set[str]] = None
+) -> None:
     """Create and/or clean target_dir directory to receive generated testfiles.
 
     Create target_dir if needed for writing generated pytest files.
@@ -240,6 +342,9 @@ def wipe_testfile_directory(target_dir: Path) -> None:
     Args:
         target_dir
             pathlib.Path of destination directory for generated test files.
+
+        keep
+            Names of .py files in target_dir that are left alone.
     """
 
     # create if needed
@@ -247,6 +352,8 @@ def wipe_testfile_directory(target_dir: Path) -> None:
 
     # Clean out or preserve pre-existing Python files.
     for existing_path in target_dir.glob("*.py"):
+        if keep and existing_path.name in keep:
+            continue
         preserve_path = existing_path.with_suffix(".sav")
         preserve_path = _with_stem(preserve_path, "no" + existing_path.stem)
         if preserve_path.exists():
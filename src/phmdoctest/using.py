@@ -1,17 +1,28 @@
 """Generate test files as specified by configuration file."""
 import configparser
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import re
-from typing import List
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from xml.etree import ElementTree
+
+import click
 
 try:
     import tomllib  # type: ignore
 except ModuleNotFoundError:
     import tomli as tomllib  # type: ignore
 
+import phmdoctest.document
 import phmdoctest.main
+import phmdoctest.manifest
+import phmdoctest.multifile
+import phmdoctest.report
+import phmdoctest.shard
+import phmdoctest.skipmatch
+import phmdoctest.timings
 import phmdoctest.tool
+import phmdoctest.walk
 
 
 def _text_to_words(text: str) -> List[str]:
@@ -26,6 +37,19 @@ def _text_to_words(text: str) -> List[str]:
     return words
 
 
+def _text_to_lines(text: str) -> List[str]:
+    """List of the non-blank lines of a multi-line string with spaces kept."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _getint(section: configparser.SectionProxy, key: str, fallback: int) -> Any:
+    """Integer value of key or the text if it is not an integer."""
+    try:
+        return section.getint(key, fallback=fallback)
+    except ValueError:
+        return section[key]
+
+
 @dataclass
 class UserConfiguration:
     """Values from [tool.phmdoctest] configuration file section."""
@@ -34,6 +58,34 @@ class UserConfiguration:
     exclude_globs: List[str]
     output_directory_name: str
     print_options: List[str]
+    fast_scan: bool = False
+    jobs: int = 1
+    timings: bool = False
+    timings_json: str = ""
+    report_format: str = ""
+    skips: List[str] = field(default_factory=list)
+    skip_regexes: List[str] = field(default_factory=list)
+    gitignore: bool = False
+    shards: int = 0
+    shard_junit_xml: str = ""
+
+
+def checked_jobs(value: Any, name: str) -> int:
+    """Return value if it is a number of worker processes >= 0."""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise click.ClickException(
+            f"phmdoctest- {name} must be an integer >= 0, got {value!r}"
+        )
+    return value
+
+
+def checked_report_format(value: Any) -> str:
+    """Return value if it is a block report format for a configuration file."""
+    if value not in ["", "json", "jsonl"]:
+        raise click.ClickException(
+            f"phmdoctest- report_format must be json or jsonl, got {value!r}"
+        )
+    return str(value)
 
 
 def parse_user_configuration(config_file: Path) -> UserConfiguration:
@@ -47,6 +99,22 @@ def parse_user_configuration(config_file: Path) -> UserConfiguration:
             exclude_globs=_text_to_words(config[cfg_section]["exclude_globs"]),
             output_directory_name=config[cfg_section]["output_directory"],
             print_options=_text_to_words(config[cfg_section]["print"]),
+            fast_scan=config[cfg_section].getboolean("fast_scan", fallback=False),
+            jobs=checked_jobs(
+                _getint(config[cfg_section], "jobs", fallback=1), "jobs"
+            ),
+            timings=config[cfg_section].getboolean("timings", fallback=False),
+            timings_json=config[cfg_section].get("timings_json", ""),
+            report_format=checked_report_format(
+                config[cfg_section].get("report_format", "")
+            ),
+            skips=_text_to_lines(config[cfg_section].get("skips", "")),
+            skip_regexes=_text_to_lines(config[cfg_section].get("skip_regexes", "")),
+            gitignore=config[cfg_section].getboolean("gitignore", fallback=False),
+            shards=checked_jobs(
+                _getint(config[cfg_section], "shards", fallback=0), "shards"
+            ),
+            shard_junit_xml=config[cfg_section].get("shard_junit_xml", ""),
         )
     elif config_file.name.endswith(".toml"):
         with open(str(config_file), "rb") as f:
@@ -57,6 +125,16 @@ def parse_user_configuration(config_file: Path) -> UserConfiguration:
             exclude_globs=toml_section["exclude_globs"],
             output_directory_name=toml_section["output_directory"],
             print_options=toml_section["print"],
+            fast_scan=toml_section.get("fast_scan", False),
+            jobs=checked_jobs(toml_section.get("jobs", 1), "jobs"),
+            timings=toml_section.get("timings", False),
+            timings_json=toml_section.get("timings_json", ""),
+            report_format=checked_report_format(toml_section.get("report_format", "")),
+            skips=toml_section.get("skips", []),
+            skip_regexes=toml_section.get("skip_regexes", []),
+            gitignore=toml_section.get("gitignore", False),
+            shards=checked_jobs(toml_section.get("shards", 0), "shards"),
+            shard_junit_xml=toml_section.get("shard_junit_xml", ""),
         )
     else:
         raise ValueError(
@@ -64,59 +142,403 @@ def parse_user_configuration(config_file: Path) -> UserConfiguration:
         )
 
 
+def find_markdown_files(
+    config: UserConfiguration, working_directory: Path
+) -> List[Path]:
+    """Look for Markdown files as directed by config.
+
+    The directory tree is walked once. Directories that match an
+    exclude glob ending with / or /**, or that no markdown glob can
+    reach, are not entered.
+    """
+    return phmdoctest.walk.find_files(
+        working_directory,
+        config.markdown_globs,
+        config.exclude_globs,
+        gitignore=config.gitignore,
+    )
+
+
+def read_markdown(markdown: Path) -> Tuple[bytes, str]:
+    """Return the file's bytes and text with universal newlines applied."""
+    data = markdown.read_bytes()
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return data, text
+
+
 def select_files(config: UserConfiguration, working_directory: Path) -> List[Path]:
     """Look for Markdown files as directed by config. Keep if Python examples."""
-    included: List[Path] = []
-    for glob in config.markdown_globs:
-        included.extend(working_directory.glob(glob))
-    skipped: List[Path] = []
-    for glob in config.exclude_globs:
-        skipped.extend(working_directory.glob(glob))
     tested: List[Path] = []
-    for keeper in included:
-        if keeper in skipped:
-            continue  # Don't append to the tested list.
-        python_examples = phmdoctest.tool.detect_python_examples(keeper)
+    for keeper in find_markdown_files(config, working_directory):
+        python_examples = phmdoctest.tool.detect_python_examples(
+            keeper, fast_scan=config.fast_scan
+        )
         if python_examples.has_code or python_examples.has_session:
             tested.append(keeper)
     return tested
 
 
-def generate_using(config_file: Path) -> None:
+def testfile_name(markdown: Path) -> str:
+    """Name of the test file generated from the Markdown file."""
+    outfile_name = "test_" + "__".join(markdown.parts)  # flatten
+    return str(Path(outfile_name).with_suffix(".py"))
+
+
+GenerationTask = NamedTuple(
+    "GenerationTask",
+    [
+        ("markdown_file", str),  # path to the Markdown file
+        ("built_from", str),  # Markdown file posix path
+        ("text", str),  # Markdown file contents
+        ("fast_scan", bool),
+        ("skips", List[str]),
+        ("skip_regexes", List[str]),
+        ("timings", bool),  # measure the phases
+        ("report", bool),  # make a block report
+    ],
+)
+"""Generate one test file. Sent to a worker process. (collections.namedtuple)."""
+
+
+GenerationResult = NamedTuple(
+    "GenerationResult",
+    [
+        ("testfile", Optional[str]),  # None if no Python examples or error
+        ("tests", int),  # phmdoctest.shard.count_tests() of the testfile
+        ("error", str),  # error message or empty string
+        ("timings", List[phmdoctest.timings.PhaseTiming]),
+        ("report", Optional[Dict[str, Any]]),  # phmdoctest.report.file_report()
+    ],
+)
+"""Generated test file or error message. (collections.namedtuple)."""
+
+
+def generate_one(task: GenerationTask) -> GenerationResult:
+    """Parse the Markdown file and generate its test file.
+
+    Any exception is caught and reported as the file's error.
+    """
+    timings = phmdoctest.timings.Timings(enabled=task.timings)
+    name = task.built_from
+    try:
+        with timings.phase("parse", name):
+            document = phmdoctest.document.Document(
+                task.markdown_file, fast_scan=task.fast_scan, text=task.text
+            )
+        if not (document.has_code or document.has_session):
+            return GenerationResult(
+                testfile=None, tests=0, error="", timings=timings.records, report=None
+            )
+        chunks = phmdoctest.main.testfile_chunks(
+            built_from=name,
+            document=document,
+            skips=task.skips,
+            skip_regexes=task.skip_regexes,
+            timings=timings,
+        )
+        with timings.phase("generate", name):
+            testfile = "".join(chunks)
+        report = None
+        if task.report:
+            with timings.phase("report", name):
+                # The document's blocks have been assigned their roles.
+                report = phmdoctest.report.file_report(
+                    name, document.blocks, task.skips + task.skip_regexes
+                )
+        return GenerationResult(
+            testfile=testfile,
+            tests=phmdoctest.shard.count_tests(document.blocks),
+            error="",
+            timings=timings.records,
+            report=report,
+        )
+    except Exception as exc:
+        return failed_result(exc, timings.records)
+
+
+def failed_result(
+    exc: Exception, timings: Optional[List[phmdoctest.timings.PhaseTiming]] = None
+) -> GenerationResult:
+    """GenerationResult reporting the exception as the Markdown file's error."""
+    return GenerationResult(
+        testfile=None,
+        tests=0,
+        error=phmdoctest.multifile.error_message(exc),
+        timings=timings or [],
+        report=None,
+    )
+
+
+def run_tasks(tasks: List[GenerationTask], jobs: int) -> List[GenerationResult]:
+    """Generate test files using jobs worker processes. Results are in task order.
+
+    When jobs is 1 the test files are generated in this process.
+    When jobs is 0 one worker process per CPU is used.
+    """
+    if jobs < 0:
+        raise ValueError(f"phmdoctest- jobs must be >= 0, got {jobs}")
+    return phmdoctest.multifile.run_jobs(generate_one, tasks, jobs)
+
+
+def changed_files(
+    markdown_files: List[Path],
+    previous: Dict[str, phmdoctest.manifest.ManifestEntry],
+    gendir: Path,
+    fast_scan: bool,
+    timings: bool = False,
+    report: bool = False,
+    skips: Sequence[str] = (),
+    skip_regexes: Sequence[str] = (),
+) -> Tuple[List[str], List[GenerationTask], Dict[str, GenerationResult]]:
+    """Hash the Markdown files. Make tasks for files changed since previous run.
+
+    When report is True there is a task for every file so
+    that every file is reported.
+
+    Returns:
+        content_key() of each Markdown file, the generation tasks, and
+        the failed GenerationResult of each file that can't be read
+        keyed by posix path. The content_key() of a file that can't be
+        read is an empty string.
+    """
+    keys = []
+    tasks = []
+    unreadable: Dict[str, GenerationResult] = {}
+    for markdown in markdown_files:
+        name = markdown.as_posix()
+        try:
+            data, text = read_markdown(markdown)
+        except (OSError, ValueError) as exc:  # UnicodeDecodeError is a ValueError
+            keys.append("")
+            unreadable[name] = failed_result(exc)
+            continue
+        key = phmdoctest.manifest.content_key(
+            data, name, fast_scan, skips, skip_regexes
+        )
+        keys.append(key)
+        entry = previous.get(name)
+        if (
+            report
+            or entry is None
+            or entry.key != key
+            or not phmdoctest.manifest.is_up_to_date(gendir, entry)
+        ):
+            tasks.append(
+                GenerationTask(
+                    markdown_file=str(markdown),
+                    built_from=name,
+                    text=text,
+                    fast_scan=fast_scan,
+                    skips=list(skips),
+                    skip_regexes=list(skip_regexes),
+                    timings=timings,
+                    report=report,
+                )
+            )
+    return keys, tasks, unreadable
+
+
+def new_entry(
+    markdown: Path, key: str, result: GenerationResult
+) -> phmdoctest.manifest.ManifestEntry:
+    """Manifest entry for a newly generated test file or no test file."""
+    if result.testfile is None:
+        return phmdoctest.manifest.ManifestEntry(
+            key=key, outfile=None, digest="", tests=0
+        )
+    return phmdoctest.manifest.ManifestEntry(
+        key=key,
+        outfile=testfile_name(markdown),
+        digest=phmdoctest.manifest.text_digest(result.testfile),
+        tests=result.tests,
+    )
+
+
+def write_testfiles(
+    markdown_files: List[Path],
+    keys: List[str],
+    results: Dict[str, GenerationResult],
+    previous: Dict[str, phmdoctest.manifest.ManifestEntry],
+    gendir: Path,
+    print_options: List[str],
+) -> Tuple[Dict[str, phmdoctest.manifest.ManifestEntry], List[str]]:
+    """Write the changed test files and print in Markdown file order.
+
+    Args:
+        results
+            GenerationResult of each changed Markdown file keyed by posix path.
+
+    Returns:
+        Manifest entries and the Markdown files that could not be processed.
+        A Markdown file that could not be processed keeps its previous
+        manifest entry so that its test file is not removed as stale.
+    """
+    entries: Dict[str, phmdoctest.manifest.ManifestEntry] = {}
+    errors: List[str] = []
+    for markdown, key in zip(markdown_files, keys):
+        name = markdown.as_posix()
+        result = results.get(name)
+        if result is None:
+            entries[name] = previous[name]  # unchanged
+        elif result.error:
+            errors.append(name)
+            click.echo(f"phmdoctest- {name} error:\n{result.error}", err=True)
+            if name in previous:
+                entries[name] = previous[name]  # keep the last good test file
+            continue
+        else:
+            entries[name] = new_entry(markdown, key, result)
+        outfile_name = entries[name].outfile
+        if outfile_name is None:
+            continue  # No Python examples.
+        outfile = gendir / outfile_name
+        if "filename" in print_options:
+            print(f"phmdoctest- {name} => {outfile.as_posix()}")
+        if result is not None and result.testfile is not None:
+            _ = phmdoctest.manifest.write_if_changed(outfile, result.testfile)
+    return entries, errors
+
+
+def remove_stale_testfiles(
+    gendir: Path,
+    generated_names: Set[str],
+    entries: Dict[str, phmdoctest.manifest.ManifestEntry],
+) -> None:
+    """Remove test files whose Markdown file is no longer selected.
+
+    entries has the Markdown files that are still selected including
+    those that could not be processed this time.
+    """
+    current_names = set(e.outfile for e in entries.values() if e.outfile)
+    for stale_name in generated_names - current_names:
+        stale = gendir / stale_name
+        if stale.exists():
+            stale.unlink()
+
+
+def update_shards(
+    gendir: Path,
+    entries: Dict[str, phmdoctest.manifest.ManifestEntry],
+    shard_count: int,
+    junit_xml: str,
+) -> None:
+    """Write the shard manifest or remove it when shard_count is 0."""
+    if not shard_count:
+        path = gendir / phmdoctest.shard.SHARD_MANIFEST_NAME
+        if path.exists():
+            path.unlink()
+        return
+    tests = {e.outfile: e.tests for e in entries.values() if e.outfile}
+    try:
+        shards = phmdoctest.shard.plan_shards(
+            tests, shard_count, Path(junit_xml) if junit_xml else None
+        )
+    except ElementTree.ParseError as exc:
+        raise click.ClickException(
+            f"phmdoctest- shard_junit_xml {junit_xml} is not JUnit XML: {exc}"
+        )
+    phmdoctest.shard.save_shards(gendir, shards)
+
+
+def generate_using(
+    config_file: Path,
+    jobs: Optional[int] = None,
+    timings: Optional[bool] = None,
+    timings_json: Optional[str] = None,
+    report_format: Optional[str] = None,
+) -> None:
     """Generate test files as directed by configuration file.
 
     See doc/configuring.md.
+
+    A manifest in the output directory records a hash of each Markdown
+    file's contents, the phmdoctest version, and the options.
+    Markdown files that have not changed since the previous run are
+    not parsed again and their test files are not rewritten.
+
+    The changed Markdown files are processed by jobs worker processes.
+    When jobs is None the configuration file jobs setting is used.
+    Printing is in the same order for any number of jobs.
+    A Markdown file that can't be processed is reported and the
+    remaining files are processed before raising click.ClickException.
+
+    When timings is None the configuration file timings setting is used.
+    The phases of each changed Markdown file are measured in the process
+    that generates its test file.
+
+    When the configuration file shards setting is not 0 the test files
+    are split into that many shards of about the same test time.
+    The shards are written to a shard manifest in the output directory.
+    See phmdoctest.shard.
+
+    When report_format is None the configuration file report_format
+    setting is used. A json or jsonl report about the blocks of every
+    selected Markdown file with Python examples is printed after the
+    test files are written. Every file is processed, even if unchanged.
     """
     if not config_file.exists():
         raise FileNotFoundError(str(config_file))
     config = parse_user_configuration(config_file)
+    jobs = config.jobs if jobs is None else checked_jobs(jobs, "jobs")
+    report_format = checked_report_format(report_format or config.report_format)
+    timings_json = timings_json or config.timings_json
+    table = bool(config.timings if timings is None else timings)
+    recorder = phmdoctest.timings.Timings(enabled=table or bool(timings_json))
+    # Report a bad skip regex before any files are generated.
+    _ = phmdoctest.skipmatch.SkipMatcher(config.skips, config.skip_regexes)
     working_directory = Path(".")  # current working directory
 
     # Assemble list of files to test.
     # Names are relative to the current working directory.
-    tested = select_files(config, working_directory)
+    with recorder.phase("find"):
+        markdown_files = find_markdown_files(config, working_directory)
 
     p = Path(config.output_directory_name)
     if p.is_absolute():
         gendir = p
     else:
         gendir = working_directory / config.output_directory_name
-    phmdoctest.tool.wipe_testfile_directory(gendir)
+    previous = phmdoctest.manifest.load_manifest(gendir)
+    generated_names = set(e.outfile for e in previous.values() if e.outfile)
+    phmdoctest.tool.wipe_testfile_directory(gendir, keep=generated_names)
 
-    file_count = 0
-    for markdown in tested:
-        testfile = phmdoctest.main.testfile(
-            str(markdown), built_from=markdown.as_posix()
+    with recorder.phase("hash"):
+        keys, tasks, unreadable = changed_files(
+            markdown_files,
+            previous,
+            gendir,
+            config.fast_scan,
+            recorder.enabled,
+            bool(report_format),
+            config.skips,
+            config.skip_regexes,
         )
-        # create the test file name
-        outfile_name = "test_" + "__".join(markdown.parts)  # flatten
-        outfile = gendir / outfile_name
-        outfile = outfile.with_suffix(".py")
-        if "filename" in config.print_options:
-            print(f"phmdoctest- {markdown.as_posix()} => {outfile.as_posix()}")
-        _ = outfile.write_text(testfile, encoding="utf-8")
-        file_count += 1
+    results = dict(zip((t.built_from for t in tasks), run_tasks(tasks, jobs)))
+    results.update(unreadable)
+    for result in results.values():
+        recorder.extend(result.timings)
+    with recorder.phase("write"):
+        entries, errors = write_testfiles(
+            markdown_files, keys, results, previous, gendir, config.print_options
+        )
+        remove_stale_testfiles(gendir, generated_names, entries)
+        phmdoctest.manifest.save_manifest(gendir, entries)
+        update_shards(gendir, entries, config.shards, config.shard_junit_xml)
+    if report_format:
+        reports = (results[name].report for name in results)
+        phmdoctest.report.print_json_report(
+            (report for report in reports if report is not None), report_format
+        )
+    recorder.report(timings_json, table=table)
+
     if "summary" in config.print_options:
+        file_count = sum(1 for e in entries.values() if e.outfile)
         print(
             f"phmdoctest- {config_file.as_posix()} generated {file_count} pytest files"
         )
+    if errors:
+        raise click.ClickException(
+            "{} Markdown file(s) could not be processed: {}".format(
+                len(errors), ", ".join(errors)
+            )
+        )
@@ -0,0 +1,305 @@
+"""Find the files selected by include and exclude globs in one directory walk."""
+import os
+from pathlib import Path, PurePath
+import re
+from typing import FrozenSet, List, Optional, Pattern, Sequence, Tuple
+
+
+def _segment_regex(segment: str) -> str:
+    """Regular expression for one path segment of a glob. Never matches /."""
+    parts: List[str] = []
+    i = 0
+    while i < len(segment):
+        ch = segment[i]
+        i += 1
+        if ch == "*":
+            parts.append("[^/]*")
+        elif ch == "?":
+            parts.append("[^/]")
+        elif ch == "[":
+            end = i
+            if segment[end : end + 1] == "!":
+                end += 1
+            if segment[end : end + 1] == "]":
+                end += 1
+            end = segment.find("]", end)
+            if end < 0:
+                parts.append(re.escape(ch))
+                continue
+            members = segment[i:end].replace("\\", "\\\\")
+            members = re.sub(r"([&~|])", r"\\\1", members)  # set operations
+            if members.startswith("!"):
+                members = "^" + members[1:]
+            elif members[:1] in ("^", "["):
+                members = "\\" + members
+            parts.append("[" + members + "]")
+            i = end + 1
+        else:
+            parts.append(re.escape(ch))
+    return "".join(parts)
+
+
+def glob_regex(pattern: str) -> str:
+    """Regular expression for the relative posix paths that Path.glob() matches.
+
+    * ? and [] don't match across a /. A ** segment matches zero
+    or more directories. A glob ending with ** matches a directory
+    and all of the directories below it.
+    """
+    segments = [s for s in PurePath(pattern).parts if s != "."]
+    pieces: List[str] = []
+    for number, segment in enumerate(segments):
+        last = number == len(segments) - 1
+        if segment == "**" and last:
+            if pieces and pieces[-1] == "/":
+                pieces[-1] = "(?:/[^/]+)*"  # the directory and those below it
+            else:
+                pieces.append("[^/]+(?:/[^/]+)*")
+        elif segment == "**":
+            pieces.append("(?:[^/]+/)*")
+        else:
+            pieces.append(_segment_regex(segment))
+            if not last:
+                pieces.append("/")
+    return "".join(pieces)
+
+
+class GlobSet:
+    """Globs compiled into a single regular expression.
+
+    Also tells if a directory could contain a file matching one of the
+    globs so that the walk can skip directories that can't.
+    """
+
+    def __init__(self, globs: Sequence[str]) -> None:
+        self.globs = list(globs)
+        alternatives = [
+            "(?P<g{}>{})".format(number, glob_regex(glob))
+            for number, glob in enumerate(self.globs)
+        ]
+        self._regex: Optional[Pattern[str]] = None
+        if alternatives:
+            self._regex = re.compile("|".join(alternatives))
+        self._segments = [
+            [
+                None if s == "**" else re.compile(_segment_regex(s))
+                for s in PurePath(glob).parts
+                if s != "."
+            ]
+            for glob in self.globs
+        ]
+
+    def match(self, relpath: str, links: FrozenSet[int] = frozenset()) -> Optional[int]:
+        """Index of the first glob that matches the posix path or None.
+
+        Args:
+            links
+                Indexes of the path's directories that are symlinks.
+                Like Path.glob() a ** segment doesn't match them.
+        """
+        if self._regex is None:
+            return None
+        if links:
+            parts = relpath.split("/")
+            for number, segments in enumerate(self._segments):
+                if _segments_match(segments, parts, links, 0, 0):
+                    return number
+            return None
+        found = self._regex.fullmatch(relpath)
+        if found is None or found.lastgroup is None:
+            return None
+        return int(found.lastgroup[1:])
+
+    def may_contain(
+        self, dir_parts: Tuple[str, ...], links: FrozenSet[int] = frozenset()
+    ) -> bool:
+        """True if a file in the directory or below could match a glob."""
+        return any(_may_contain(s, dir_parts, links, 0, 0) for s in self._segments)
+
+
+def _segments_match(
+    segments: List[Optional[Pattern[str]]],
+    parts: List[str],
+    links: FrozenSet[int],
+    number: int,
+    index: int,
+) -> bool:
+    """True if segments from number on match the parts from index on."""
+    if number == len(segments):
+        return index == len(parts)
+    regex = segments[number]
+    if regex is None:  # ** matches zero or more directories but not symlinks
+        if _segments_match(segments, parts, links, number + 1, index):
+            return True
+        return (
+            index < len(parts)
+            and index not in links
+            and _segments_match(segments, parts, links, number, index + 1)
+        )
+    return (
+        index < len(parts)
+        and regex.fullmatch(parts[index]) is not None
+        and _segments_match(segments, parts, links, number + 1, index + 1)
+    )
+
+
+def _may_contain(
+    segments: List[Optional[Pattern[str]]],
+    dir_parts: Tuple[str, ...],
+    links: FrozenSet[int],
+    number: int,
+    index: int,
+) -> bool:
+    """True if a file below dir_parts could match the glob segments.
+
+    The segments from number on are matched to the directories
+    from index on.
+    """
+    if index == len(dir_parts):
+        return number < len(segments)
+    if number >= len(segments):
+        return False
+    regex = segments[number]
+    if regex is None:  # ** matches zero or more directories but not symlinks
+        if _may_contain(segments, dir_parts, links, number + 1, index):
+            return True
+        return index not in links and _may_contain(
+            segments, dir_parts, links, number, index + 1
+        )
+    if number == len(segments) - 1:
+        return False  # the glob ends before this directory
+    return regex.fullmatch(dir_parts[index]) is not None and _may_contain(
+        segments, dir_parts, links, number + 1, index + 1
+    )
+
+
+class GitIgnore:
+    """Rules from the .gitignore files found during the walk."""
+
+    def __init__(self) -> None:
+        # Regex for the posix path, negated with !, matches directories only.
+        self.rules: List[Tuple[Pattern[str], bool, bool]] = []
+
+    def read(self, directory: Path, dir_parts: Tuple[str, ...]) -> None:
+        """Add the rules from the directory's .gitignore file if there is one."""
+        try:
+            text = (directory / ".gitignore").read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            return
+        prefix = re.escape("/".join(dir_parts) + "/") if dir_parts else ""
+        for line in text.splitlines():
+            rule = _gitignore_rule(line.rstrip(), prefix)
+            if rule is not None:
+                self.rules.append(rule)
+
+    def skipped(self, name: str, relpath: str, is_dir: bool) -> bool:
+        """True if the .git directory or ignored."""
+        return (is_dir and name == ".git") or self.ignored(relpath, is_dir)
+
+    def ignored(self, relpath: str, is_dir: bool) -> bool:
+        """True if the last rule matching the posix path ignores it."""
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.fullmatch(relpath):
+                ignored = not negate
+        return ignored
+
+
+def _gitignore_rule(
+    line: str, prefix: str
+) -> Optional[Tuple[Pattern[str], bool, bool]]:
+    """Compiled .gitignore line or None for blank and comment lines."""
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]  # escaped leading ! or #
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash at the start or middle anchors the pattern to the directory.
+    anchored = "/" in line
+    line = line.lstrip("/")
+    anywhere = "" if anchored else "(?:[^/]+/)*"
+    return re.compile(prefix + anywhere + glob_regex(line)), negate, dir_only
+
+
+def find_files(
+    working_directory: Path,
+    include_globs: Sequence[str],
+    exclude_globs: Sequence[str] = (),
+    gitignore: bool = False,
+) -> List[Path]:
+    """Files matching an include glob and no exclude glob in one walk.
+
+    The globs are relative to working_directory and have the same
+    meaning as in Path.glob(). Symlinks to directories are followed
+    except by a ** segment. Directories that no include glob can
+    reach are not entered. Directories matching an exclude glob
+    ending with / or /** are not entered. Other exclude globs only
+    leave out the files they match.
+    With gitignore the .git directory and files ignored by the
+    .gitignore files in the walked directories are also left out.
+
+    Returns:
+        Paths ordered by the first include glob that matches them
+        and then by name.
+    """
+    includes = GlobSet(include_globs)
+    excludes = GlobSet(exclude_globs)
+    dir_excludes = GlobSet([g for g in exclude_globs if _directories_only(g)])
+    ignore = GitIgnore() if gitignore else None
+    found: List[Tuple[int, int, Path]] = []
+    no_links: FrozenSet[int] = frozenset()
+    stack: List[Tuple[Tuple[str, ...], FrozenSet[int]]] = [((), no_links)]
+    while stack:
+        dir_parts, links = stack.pop()
+        directory = working_directory.joinpath(*dir_parts)
+        if ignore is not None:
+            ignore.read(directory, dir_parts)
+        subdirectories = []
+        for name, is_dir, is_link in _entries(directory):
+            parts = dir_parts + (name,)
+            relpath = "/".join(parts)
+            if ignore is not None and ignore.skipped(name, relpath, is_dir):
+                continue
+            if is_dir:
+                dir_links = links | {len(dir_parts)} if is_link else links
+                if dir_excludes.match(relpath) is None and includes.may_contain(
+                    parts, dir_links
+                ):
+                    subdirectories.append((parts, dir_links))
+                continue
+            if excludes.match(relpath) is not None:
+                continue
+            number = includes.match(relpath, links)
+            if number is not None:
+                found.append((number, len(found), working_directory.joinpath(*parts)))
+        stack.extend(reversed(subdirectories))
+    return [path for _, _, path in sorted(found)]
+
+
+def _directories_only(glob: str) -> bool:
+    """True if the exclude glob can only match directories."""
+    return glob.endswith("/") or glob == "**" or glob.endswith("/**")
+
+
+def _entries(directory: Path) -> List[Tuple[str, bool, bool]]:
+    """Sorted names in the directory, if each is a directory, and if a symlink."""
+    try:
+        with os.scandir(directory) as it:
+            entries = [(entry.name, _is_dir(entry), entry.is_symlink()) for entry in it]
+    except OSError:
+        return []  # Like Path.glob() skip directories that can't be read.
+    return sorted(entries)
+
+
+def _is_dir(entry: "os.DirEntry[str]") -> bool:
+    """True if a directory or a symlink to a directory."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
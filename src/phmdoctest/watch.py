@@ -0,0 +1,183 @@
+"""Regenerate test files when the Markdown files change."""
+import ctypes
+import ctypes.util
+import os
+from pathlib import Path
+import select
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import click
+
+
+# inotify event mask bits from <sys/inotify.h>.
+_IN_EVENTS = (
+    0x002  # IN_MODIFY
+    | 0x004  # IN_ATTRIB
+    | 0x008  # IN_CLOSE_WRITE
+    | 0x040  # IN_MOVED_FROM
+    | 0x080  # IN_MOVED_TO
+    | 0x100  # IN_CREATE
+    | 0x200  # IN_DELETE
+)
+
+
+class _Inotify:
+    """Wake up on changes to directories using Linux inotify through ctypes."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self.directories: Dict[Path, int] = {}
+
+    def watch(self, directories: Iterable[Path]) -> None:
+        """Add the directories not already watched."""
+        for directory in directories:
+            if directory not in self.directories:
+                wd = self._add_watch(self.fd, os.fsencode(directory), _IN_EVENTS)
+                if wd >= 0:
+                    self.directories[directory] = wd
+
+    def wait(self, timeout: float) -> None:
+        """Return after an event or timeout seconds. Discard the events."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        while readable:
+            try:
+                _ = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _inotify() -> Optional[_Inotify]:
+    """inotify waiter or None if this system doesn't have inotify."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return _Inotify()
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+class Watcher:
+    """Find the files that changed by comparing modification times.
+
+    The files to watch are found again on every poll so that new
+    Markdown files are noticed. With inotify the wait between polls
+    ends early when something changes in a watched directory.
+    """
+
+    def __init__(
+        self,
+        find_paths: Callable[[], Iterable[Path]],
+        interval: float = 0.5,
+        debounce: float = 0.2,
+        use_inotify: bool = True,
+    ) -> None:
+        """Take the first snapshot of the modification times.
+
+        Args:
+            find_paths
+                Returns the paths of the files to watch.
+
+            interval
+                Seconds between polls.
+
+            debounce
+                Seconds without further changes before the changes
+                are reported. Editors often write a file more than once.
+
+            use_inotify
+                Wait with inotify when the system has it.
+        """
+        self.find_paths = find_paths
+        self.interval = interval
+        self.debounce = debounce
+        self.inotify = _inotify() if use_inotify else None
+        self.mtimes = self.snapshot()
+
+    def snapshot(self) -> Dict[Path, int]:
+        """Modification time in ns of each path. -1 if the file is missing."""
+        mtimes = {}
+        for path in self.find_paths():
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except OSError:
+                mtimes[path] = -1
+        return mtimes
+
+    def changes(self) -> List[Path]:
+        """Paths added, removed, or modified since the previous call."""
+        mtimes = self.snapshot()
+        changed = [p for p in mtimes if self.mtimes.get(p) != mtimes[p]]
+        changed.extend(p for p in self.mtimes if p not in mtimes)
+        self.mtimes = mtimes
+        return changed
+
+    def wait(self, timeout: float) -> None:
+        """Sleep timeout seconds or until inotify reports a change."""
+        if self.inotify is None:
+            time.sleep(timeout)
+        else:
+            self.inotify.watch(set(p.parent.resolve() for p in self.mtimes))
+            self.inotify.wait(timeout)
+
+    def next_changes(self) -> List[Path]:
+        """Wait for changes then until there are none for debounce seconds."""
+        changed: List[Path] = []
+        while not changed:
+            self.wait(self.interval)
+            changed = self.changes()
+        while True:
+            time.sleep(self.debounce)
+            more = self.changes()
+            if not more:
+                return list(dict.fromkeys(changed))
+            changed.extend(more)
+
+    def close(self) -> None:
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+def watch(
+    find_paths: Callable[[], Iterable[Path]],
+    regenerate: Callable[[List[Path]], None],
+    interval: float = 0.5,
+    debounce: float = 0.2,
+    cycles: Optional[int] = None,
+) -> None:
+    """Call regenerate with the changed paths each time files change.
+
+    Runs until interrupted by Ctrl-C or after cycles regenerations.
+    An error while regenerating is printed and watching continues.
+    """
+    watcher = Watcher(find_paths, interval, debounce)
+    how = "polling" if watcher.inotify is None else "inotify"
+    click.echo(f"phmdoctest- watching for changes ({how}). Ctrl-C to stop.", err=True)
+    try:
+        count = 0
+        while cycles is None or count < cycles:
+            changed = watcher.next_changes()
+            names = ", ".join(p.as_posix() for p in changed)
+            click.echo(f"phmdoctest- changed: {names}", err=True)
+            try:
+                regenerate(changed)
+            except click.ClickException as exc:
+                exc.show()
+            except Exception as exc:
+                click.echo(f"phmdoctest- error: {exc!r}", err=True)
+            count += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
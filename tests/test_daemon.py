@@ -0,0 +1,179 @@
+"""Test the generation server and its client."""
+import os
+import socket
+import stat
+import tempfile
+import threading
+
+import click
+import pytest
+
+import phmdoctest
+import phmdoctest.daemon
+import phmdoctest.main
+import phmdoctest.simulator
+
+
+@pytest.fixture()
+def server(tmp_path, monkeypatch):
+    """Run a server in a thread. Its socket path is the default socket path."""
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("needs Unix domain sockets")
+    socket_path = str(tmp_path / "s.sock")
+    monkeypatch.setenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, socket_path)
+    server = phmdoctest.daemon.GenerationServer(idle_timeout=30)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    yield server
+    _ = phmdoctest.daemon.send({"request": "shutdown"})
+    thread.join()
+    assert not os.path.exists(socket_path)
+
+
+def test_ping(server):
+    """The server replies with its version and process id."""
+    reply = phmdoctest.daemon.send({"request": "ping"})
+    assert reply == {"version": phmdoctest.__version__, "pid": os.getpid()}
+    reply = phmdoctest.daemon.send({"request": "bogus"})
+    assert reply == {"error": "phmdoctest- unknown request 'bogus'"}
+
+
+def test_already_running(server):
+    """A second server on the same socket is refused."""
+    with pytest.raises(RuntimeError, match="a server is already on"):
+        _ = phmdoctest.daemon.GenerationServer()
+
+
+def test_default_socket_path(tmp_path, monkeypatch):
+    """In $XDG_RUNTIME_DIR or in a directory private to the user."""
+    monkeypatch.delenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    path = phmdoctest.daemon.default_socket_path()
+    assert path == str(tmp_path / "phmdoctest.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = phmdoctest.daemon.default_socket_path()
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_private_directory(tmp_path, monkeypatch):
+    """The server makes the default socket's directory private to the user."""
+    monkeypatch.delenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    directory = os.path.dirname(phmdoctest.daemon.default_socket_path())
+    server = phmdoctest.daemon.GenerationServer()
+    try:
+        assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+        assert phmdoctest.daemon._owned_socket(server.socket_path)
+    finally:
+        server.close()
+    os.chmod(directory, 0o755)
+    with pytest.raises(RuntimeError, match="must be a directory only you can"):
+        _ = phmdoctest.daemon.GenerationServer()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_not_a_socket(tmp_path, monkeypatch):
+    """A file that is not the user's socket is neither trusted nor removed."""
+    path = tmp_path / "s.sock"
+    _ = path.write_text("planted", encoding="utf-8")
+    monkeypatch.setenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, str(path))
+    assert phmdoctest.daemon.send({"request": "ping"}) is None
+    with pytest.raises(RuntimeError, match="exists and is not your socket"):
+        _ = phmdoctest.daemon.GenerationServer()
+    assert path.read_text(encoding="utf-8") == "planted"
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_peer_is_user():
+    """The process on the other end of a connection is this user's."""
+    left, right = socket.socketpair(socket.AF_UNIX)
+    with left, right:
+        assert phmdoctest.daemon._peer_is_user(left)
+
+
+def test_testfile(server):
+    """Same test file from the server as from main.testfile()."""
+    want = phmdoctest.main.testfile("doc/example2.md", skips=["LAST"])
+    got = phmdoctest.daemon.testfile("doc/example2.md", skips=["LAST"])
+    assert want == got
+    with pytest.raises(click.ClickException, match="is not a regular expression"):
+        _ = phmdoctest.daemon.testfile("doc/example2.md", skip_regexes=["("])
+
+
+def test_testfile_no_server(tmp_path, monkeypatch):
+    """Without a server testfile() runs in this process."""
+    socket_path = str(tmp_path / "none.sock")
+    monkeypatch.setenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, socket_path)
+    assert phmdoctest.daemon.send({"request": "ping"}) is None
+    want = phmdoctest.main.testfile("doc/example1.md")
+    assert want == phmdoctest.daemon.testfile("doc/example1.md")
+
+
+def run_client(argv, capsys, monkeypatch, stdin_text=None):
+    """Run client_main() and return the exit code, stdout, and stderr."""
+    if stdin_text is not None:
+        monkeypatch.setattr("sys.stdin", phmdoctest.daemon._text_stream(stdin_text))
+    with pytest.raises(SystemExit) as exc_info:
+        phmdoctest.daemon.client_main(argv)
+    captured = capsys.readouterr()
+    return exc_info.value.code, captured.out, captured.err
+
+
+def test_client_report(server, capsys, monkeypatch):
+    """The client prints the same --report as the phmdoctest command."""
+    command = "phmdoctest doc/example2.md --skip LAST --report"
+    want = phmdoctest.simulator.run_and_pytest(command).runner_status
+    code, out, _ = run_client(command.split()[1:], capsys, monkeypatch)
+    assert code == want.exit_code == 0
+    assert out == want.stdout
+
+
+def test_client_outfile(server, tmp_path, capsys, monkeypatch):
+    """--outfile is relative to the client's working directory."""
+    markdown = os.path.abspath("doc/example1.md")
+    monkeypatch.chdir(tmp_path)
+    code, _, _ = run_client([markdown, "--outfile", "t.py"], capsys, monkeypatch)
+    assert code == 0
+    want = phmdoctest.main.testfile(markdown)
+    assert want == (tmp_path / "t.py").read_text(encoding="utf-8")
+
+
+def test_client_stdin(server, capsys, monkeypatch):
+    """The client sends standard input for MARKDOWN_FILE -."""
+    with open("doc/example1.md", encoding="utf-8") as f:
+        text = f.read()
+    code, out, _ = run_client(["-", "--outfile", "-"], capsys, monkeypatch, text)
+    assert code == 0
+    assert out == phmdoctest.main.testfile("doc/example1.md", built_from="-")
+
+
+def test_client_errors(server, capsys, monkeypatch):
+    """Usage errors and failures have the command's exit code and message."""
+    code, _, err = run_client(["doc/example1.md", "--bogus"], capsys, monkeypatch)
+    assert code == 2
+    assert "Usage: phmdoctest" in err
+    assert "--bogus" in err
+    argv = ["doc/example2.md", "--setup", "print"]
+    code, _, err = run_client(argv, capsys, monkeypatch)
+    assert code == 1
+    assert "Error: " in err
+
+
+def test_client_no_server(tmp_path, capsys, monkeypatch):
+    """Without a server the client runs the command in this process."""
+    socket_path = str(tmp_path / "none.sock")
+    monkeypatch.setenv(phmdoctest.daemon.SOCKET_ENVIRONMENT_VARIABLE, socket_path)
+    code, out, _ = run_client(["--version"], capsys, monkeypatch)
+    assert code == 0
+    assert phmdoctest.__version__ in out
+
+
+def test_server_main_stop(server):
+    """phmdoctest-server --stop stops the running server."""
+    phmdoctest.daemon.server_main(["--stop"])
+    assert server.stopping
+    with pytest.raises(SystemExit, match="no server is running"):
+        phmdoctest.daemon.server_main(["--stop", "--socket", server.socket_path])
@@ -4,20 +4,18 @@ import sys
 
 import pytest
 
+import phmdoctest.fixture
 from phmdoctest.fixture import managenamespace
 
 
 # Note:
-# The two check_integrity() exceptions listed here.
+# The check_integrity() exception listed here.
 # 1.   raise AttributeError(no_originals)
-# 2.   raise AttributeError(no_extras)
 #
-# Require manual testing.
+# Requires manual testing.
 # Edit fixture.py and run pytest on this file to inject the error.
 #
 # 1. namespace_names.add('verify')    # add this line above the 1st raise.
-#
-# 2. namespace_names.add('bogus')    # add this line above the 2nd raise.
 
 
 def test_managenamespace_outfile(example_tester):
@@ -94,3 +92,24 @@ def test_illegal_operation(managenamespace):
         managenamespace(operation="bogus", additions=items)
     want = 'phmdoctest- operation="bogus" is not allowed'
     assert want in str(exc_info.value)
+
+
+extra_attribute_test = """\
+from phmdoctest.fixture import managenamespace
+
+
+def test_extra(managenamespace):
+    managenamespace(operation="update", additions={"A": 1})
+    globals()["not_in_namespace"] = 2
+    managenamespace(operation="update", additions={"B": 3})
+"""
+
+
+@pytest.mark.parametrize("full_check", [False, True])
+def test_extra_attribute(pytester, monkeypatch, full_check):
+    """A module attribute added outside of the namespace is detected."""
+    monkeypatch.setattr(phmdoctest.fixture, "FULL_INTEGRITY_CHECK", full_check)
+    _ = pytester.makepyfile(extra_attribute_test)
+    rr = pytester.runpytest()
+    rr.assert_outcomes(failed=1)
+    rr.stdout.fnmatch_lines(["*current attributes == original + namespace*"])
@@ -43,6 +43,58 @@ def test_phm_compare_exact_prints(capsys):
     assert expected == got
 
 
+def test_phm_compare_exact_line_endings():
+    """Lines are compared so a trailing newline is not a difference."""
+    phmdoctest.functions._phm_compare_exact(a="1\n2\n", b="1\n2")
+    phmdoctest.functions._phm_compare_exact(a="1\r\n2\r\n", b="1\n2\n")
+
+
+def test_phm_compare_exact_bounded(capsys):
+    """Long outputs show the first difference and a limited unified diff."""
+    a = "".join("row {}\n".format(i) for i in range(20000))
+    b = a.replace("row 10000\n", "row 10000 changed\n").replace("row 15000\n", "")
+    with pytest.raises(AssertionError):
+        phmdoctest.functions._phm_compare_exact(a=a, b=b, max_diff_lines=12)
+    expected = """\
+phmdoctest- first difference at output line 10001. expected has 20000 lines, got 19999 lines.
+--- expected
++++ got
+@@ -9998,7 +9998,7 @@
+ row 9997
+ row 9998
+ row 9999
+-row 10000
++row 10000 changed
+ row 10001
+ row 10002
+ row 10003
+phmdoctest- diff stopped after 12 lines.
+"""  # noqa: E501
+    got = capsys.readouterr().out
+    assert expected == got
+
+
+def test_phm_compare_exact_bounded_end(capsys):
+    """The diff is complete when the differences fit in the limit."""
+    a = "".join("row {}\n".format(i) for i in range(300))
+    b = a.replace("row 299\n", "last\n")
+    with pytest.raises(AssertionError):
+        phmdoctest.functions._phm_compare_exact(a=a, b=b)
+    expected = """\
+phmdoctest- first difference at output line 300. expected has 300 lines, got 300 lines.
+--- expected
++++ got
+@@ -297,4 +297,4 @@
+ row 296
+ row 297
+ row 298
+-row 299
++last
+"""  # noqa: E501
+    got = capsys.readouterr().out
+    assert expected == got
+
+
 # The fixtures and functions in functions.py are not invoked
 # by phmdoctest.  The source code is read by Python standard
 # library inspect module, modified, and then written to the
@@ -1,7 +1,9 @@
 """Check main.generate_using() printing. Check configuring.md."""
 import configparser
+import json
 from pathlib import Path
 
+import click
 import pytest
 
 try:
@@ -9,8 +11,13 @@ try:
 except ModuleNotFoundError:
     import tomli as tomllib  # type: ignore
 
+import phmdoctest
 import phmdoctest.main
+import phmdoctest.manifest
+import phmdoctest.shard
+import phmdoctest.simulator
 import phmdoctest.tool
+import phmdoctest.using
 
 # Fenced code blocks that have the phmdoctest-label directive.
 labeled = phmdoctest.tool.FCBChooser("doc/configuring.md")
@@ -193,4 +200,419 @@ def test_absolute_outdir(tmp_path):
     assert (Path(tempdir) / "test_tests__output_has_blank_lines.py").exists()
     assert (Path(tempdir) / "test_tests__setup_only.py").exists()
     assert (Path(tempdir) / "test_tests__twentysix_session_blocks.py").exists()
-    assert len(list(tempdir.glob("**/*.*"))) == 13, "12 test files and .cfg file."
+    assert (Path(tempdir) / phmdoctest.manifest.MANIFEST_NAME).exists()
+    assert len(list(tempdir.glob("**/*.*"))) == 14, "12 test, .cfg, manifest files."
+
+
+def make_config(tmp_path, outdir):
+    """Copy of tests/generate.cfg that writes to outdir and doesn't print."""
+    config_file = tmp_path / "incremental.cfg"
+    contents = Path("tests/generate.cfg").read_text(encoding="utf-8")
+    contents = contents.replace(".gendir-suite-cfg", str(outdir))
+    contents = contents.replace("print = filename, summary", "print =")
+    _ = config_file.write_text(contents, encoding="utf-8")
+    return config_file
+
+
+@pytest.fixture()
+def parse_counter(monkeypatch):
+    """Count calls to the commonmark parse."""
+    parsed = []
+    fenced_block_nodes = phmdoctest.tool.fenced_block_nodes
+
+    def counting_fenced_block_nodes(fp):
+        parsed.append(fp)
+        return fenced_block_nodes(fp)
+
+    monkeypatch.setattr(
+        phmdoctest.tool, "fenced_block_nodes", counting_fenced_block_nodes
+    )
+    return parsed
+
+
+def test_parse_once(tmp_path, parse_counter):
+    """Each selected Markdown file is read and parsed exactly once."""
+    outdir = tmp_path / "outdir"
+    config_file = make_config(tmp_path, outdir)
+    config = phmdoctest.using.parse_user_configuration(config_file)
+    candidates = phmdoctest.using.find_markdown_files(config, Path("."))
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert len(list(outdir.glob("*.py"))) == 12
+    assert len(parse_counter) == len(candidates)
+
+
+def test_select_files():
+    """select_files() returns the paths of Markdown files with Python examples."""
+    config = phmdoctest.using.parse_user_configuration(Path("tests/generate.toml"))
+    selected = phmdoctest.using.select_files(config, Path("."))
+    assert all(isinstance(p, Path) for p in selected)
+    assert Path("project.md") in selected
+    assert len(selected) == 12
+
+
+def test_incremental(tmp_path, parse_counter, capsys, monkeypatch):
+    """Unchanged Markdown is not parsed again and test files are not rewritten."""
+    outdir = tmp_path / "outdir"
+    config_file = make_config(tmp_path, outdir)
+    phmdoctest.main.generate_using(config_file=config_file)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in outdir.glob("*.py")}
+    assert len(mtimes) == 12
+    parse_counter.clear()
+
+    # Second run with nothing changed parses nothing.
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert len(parse_counter) == 0
+    assert mtimes == {p.name: p.stat().st_mtime_ns for p in outdir.glob("*.py")}
+
+    # A test file that was deleted or edited is generated again.
+    (outdir / "test_project.py").unlink()
+    (outdir / "test_doc__example1.py").write_text("edited", encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert len(parse_counter) == 2
+    want = phmdoctest.main.testfile("project.md", built_from="project.md")
+    assert want == (outdir / "test_project.py").read_text(encoding="utf-8")
+    assert "edited" != (outdir / "test_doc__example1.py").read_text(encoding="utf-8")
+
+    # A changed phmdoctest version regenerates everything.  The
+    # generated files are the same so they are not rewritten.
+    parse_counter.clear()
+    mtimes = {p.name: p.stat().st_mtime_ns for p in outdir.glob("*.py")}
+    monkeypatch.setattr(phmdoctest, "__version__", "0.0.0")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert len(parse_counter) > 12
+    assert mtimes == {p.name: p.stat().st_mtime_ns for p in outdir.glob("*.py")}
+    assert len(capsys.readouterr().out) == 0
+
+
+def test_stale_testfile_removed(tmp_path):
+    """Test file is removed when its Markdown file is no longer selected."""
+    outdir = tmp_path / "outdir"
+    config_file = make_config(tmp_path, outdir)
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert (outdir / "test_project.py").exists()
+    # A .py file that phmdoctest did not generate gets preserved.
+    _ = (outdir / "mine.py").write_text("mine", encoding="utf-8")
+    contents = config_file.read_text(encoding="utf-8")
+    contents = contents.replace("    project.md\n", "")
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert not (outdir / "test_project.py").exists()
+    assert not (outdir / "notest_project.sav").exists()
+    assert (outdir / "nomine.sav").exists()
+    assert len(list(outdir.glob("*.py"))) == 11
+
+
+def test_failed_testfile_kept(tmp_path, monkeypatch):
+    """A Markdown file that fails keeps its previously generated test file."""
+    monkeypatch.chdir(tmp_path)
+    config_file = tmp_path / "kept.toml"
+    contents = """\
+[tool.phmdoctest]
+markdown_globs = ["*.md"]
+exclude_globs = []
+output_directory = "out"
+print = []
+"""
+    _ = config_file.write_text(contents, encoding="utf-8")
+    markdown = Path("later_bad.md")
+    _ = markdown.write_text("```python\nprint(1)\n```\n", encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    testfile = Path("out/test_later_bad.py")
+    good = testfile.read_text(encoding="utf-8")
+
+    # A label must be an identifier.
+    _ = markdown.write_text(
+        "<!--phmdoctest-label 1-->\n```python\nprint(2)\n```\n", encoding="utf-8"
+    )
+    with pytest.raises(click.ClickException):
+        phmdoctest.main.generate_using(config_file=config_file)
+    assert testfile.read_text(encoding="utf-8") == good
+    manifest = phmdoctest.manifest.load_manifest(Path("out"))
+    assert manifest["later_bad.md"].outfile == testfile.name
+
+    # The test file is removed when the Markdown file is gone.
+    _ = Path("other.md").write_text("```python\nprint(3)\n```\n", encoding="utf-8")
+    markdown.unlink()
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert not testfile.exists()
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 0])
+def test_jobs(tmp_path, capsys, checker, jobs):
+    """Output and printing are the same for any number of worker processes."""
+    config_file = tmp_path / "jobs.toml"
+    contents = Path("tests/generate.toml").read_text(encoding="utf-8")
+    contents = contents.replace(".gendir-suite-toml", (tmp_path / "one").as_posix())
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file, jobs=1)
+    want = capsys.readouterr().out
+
+    contents = contents.replace((tmp_path / "one").as_posix(), "JOBS-DIR")
+    contents = contents.replace("JOBS-DIR", (tmp_path / "many").as_posix())
+    contents += f"jobs = {jobs}\n"
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    got = capsys.readouterr().out
+    checker(want.replace("/one/", "/many/"), got)
+    for one in (tmp_path / "one").glob("*.py"):
+        many = tmp_path / "many" / one.name
+        assert one.read_text(encoding="utf-8") == many.read_text(encoding="utf-8")
+
+
+def test_jobs_error_per_file(tmp_path, capsys):
+    """Each Markdown file that can't be processed is reported."""
+    config_file = tmp_path / "errors.toml"
+    contents = """\
+[tool.phmdoctest]
+markdown_globs = [
+    "tests/label_not_identifier.md",
+    "project.md",
+    "tests/bad_skipif_number.md",
+]
+exclude_globs = []
+output_directory = "{}"
+print = ["filename", "summary"]
+jobs = 2
+""".format(
+        tmp_path.as_posix()
+    )
+    _ = config_file.write_text(contents, encoding="utf-8")
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.main.generate_using(config_file=config_file)
+    assert "2 Markdown file(s) could not be processed" in exc_info.value.message
+    captured = capsys.readouterr()
+    assert "tests/label_not_identifier.md error:" in captured.err
+    assert "tests/bad_skipif_number.md error:" in captured.err
+    assert "project.md =>" in captured.out
+    assert "generated 1 pytest files" in captured.out
+    assert (tmp_path / "test_project.py").exists()
+
+
+def test_any_error_per_file(tmp_path, capsys, monkeypatch):
+    """Files that can't be decoded or raise any exception are reported."""
+    monkeypatch.chdir(tmp_path)
+    code = "```python\nprint(1)\n```\n"
+    _ = Path("bad.md").write_bytes(b"\xff\xfe" + code.encode("utf-8"))
+    _ = Path("boom.md").write_text(code, encoding="utf-8")
+    _ = Path("good.md").write_text(code, encoding="utf-8")
+    config_file = tmp_path / "errors.toml"
+    contents = """\
+[tool.phmdoctest]
+markdown_globs = ["*.md"]
+exclude_globs = []
+output_directory = "out"
+print = ["filename"]
+"""
+    _ = config_file.write_text(contents, encoding="utf-8")
+    testfile_chunks = phmdoctest.main.testfile_chunks
+
+    def exploding_testfile_chunks(**kwargs):
+        if kwargs["built_from"] == "boom.md":
+            raise RuntimeError("boom")
+        return testfile_chunks(**kwargs)
+
+    monkeypatch.setattr(phmdoctest.main, "testfile_chunks", exploding_testfile_chunks)
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.main.generate_using(config_file=config_file, jobs=1)
+    assert "2 Markdown file(s) could not be processed" in exc_info.value.message
+    captured = capsys.readouterr()
+    assert "bad.md error:\nUnicodeDecodeError: " in captured.err
+    assert "boom.md error:\nRuntimeError: boom" in captured.err
+    assert "good.md =>" in captured.out
+    assert Path("out/test_good.py").exists()
+
+
+def test_jobs_option():
+    """The --jobs command line option with a configuration file."""
+    simulator_status = phmdoctest.simulator.run_and_pytest(
+        "phmdoctest tests/generate_summary.toml --jobs 2", pytest_options=None
+    )
+    assert simulator_status.runner_status.exit_code == 0
+    summary = "phmdoctest- tests/generate_summary.toml generated 12 pytest files"
+    assert summary in simulator_status.runner_status.stdout
+
+
+@pytest.mark.parametrize(
+    "setting", ['jobs = -1', 'jobs = "2"', "jobs = true", "jobs = 1.5"]
+)
+def test_bad_jobs_setting(tmp_path, setting):
+    """A bad jobs setting is reported before the output directory changes."""
+    outdir = tmp_path / "outdir"
+    outdir.mkdir()
+    existing = outdir / "test_existing.py"
+    _ = existing.write_text("pass\n", encoding="utf-8")
+    config_file = tmp_path / "jobs.toml"
+    contents = Path("tests/generate.toml").read_text(encoding="utf-8")
+    contents = contents.replace(".gendir-suite-toml", outdir.as_posix())
+    _ = config_file.write_text(contents + setting + "\n", encoding="utf-8")
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.main.generate_using(config_file=config_file)
+    assert "jobs must be an integer >= 0" in exc_info.value.message
+    assert existing.exists(), "Not renamed by wipe_testfile_directory()."
+
+
+def test_bad_jobs_setting_cfg(tmp_path):
+    """A jobs setting in a .cfg file that is not an integer."""
+    config_file = make_config(tmp_path, tmp_path / "outdir")
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write("jobs = many\n")
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.using.parse_user_configuration(config_file)
+    assert "got 'many'" in exc_info.value.message
+
+
+def test_bad_jobs_option():
+    """A negative --jobs is a command line usage error."""
+    simulator_status = phmdoctest.simulator.run_and_pytest(
+        "phmdoctest tests/generate_summary.toml --jobs -1", pytest_options=None
+    )
+    assert simulator_status.runner_status.exit_code == 2
+    assert "-1 is not in the range x>=0" in simulator_status.runner_status.output
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_timings_setting(tmp_path, capsys, jobs):
+    """The timings settings measure the phases of every generated file."""
+    config_file = tmp_path / "timings.toml"
+    json_file = tmp_path / "timings.json"
+    contents = Path("tests/generate.toml").read_text(encoding="utf-8")
+    contents = contents.replace(".gendir-suite-toml", (tmp_path / "out").as_posix())
+    contents += f"jobs = {jobs}\ntimings = true\n"
+    contents += f'timings_json = "{json_file.as_posix()}"\n'
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert "phmdoctest- timings" in capsys.readouterr().err
+    timings = json.loads(json_file.read_text(encoding="utf-8"))
+    generated = [r["filename"] for r in timings["records"] if r["phase"] == "generate"]
+    assert len(generated) == 12
+    assert "project.md" in generated
+    phases = [total["phase"] for total in timings["totals"]]
+    assert phases[:2] == ["find", "hash"]
+    for phase in ["parse", "roles", "skips", "setup_teardown", "generate", "write"]:
+        assert phase in phases
+    assert all(r["seconds"] >= 0 and r["peak_bytes"] >= 0 for r in timings["records"])
+
+    # Unchanged files are not generated again. The option overrides the setting.
+    phmdoctest.main.generate_using(config_file=config_file, timings=False)
+    assert "phmdoctest- timings" not in capsys.readouterr().err
+    timings = json.loads(json_file.read_text(encoding="utf-8"))
+    assert [total["phase"] for total in timings["totals"]] == ["find", "hash", "write"]
+
+
+def test_report_format_setting(tmp_path, capsys):
+    """The report_format setting reports every file, even if unchanged."""
+    config_file = make_config(tmp_path, tmp_path / "outdir")
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write("report_format = jsonl\n")
+    phmdoctest.main.generate_using(config_file=config_file, jobs=2)
+    lines = capsys.readouterr().out.splitlines()
+    summaries = [json.loads(line) for line in lines if '"summary"' in line]
+    assert len(summaries) == 12
+    assert summaries[-1]["file"] == "tests/twentysix_session_blocks.md"
+    assert summaries[-1]["summary"]["test_cases"] == 26
+
+    phmdoctest.main.generate_using(config_file=config_file, report_format="json")
+    reports = json.loads(capsys.readouterr().out)["files"]
+    assert [r["summary"] for r in reports] == [s["summary"] for s in summaries]
+
+
+def test_bad_report_format_setting(tmp_path):
+    """report_format must be json or jsonl."""
+    config_file = make_config(tmp_path, tmp_path / "outdir")
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write("report_format = text\n")
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.main.generate_using(config_file=config_file)
+    assert "report_format must be json or jsonl, got 'text'" in exc_info.value.message
+
+
+@pytest.mark.parametrize("suffix", [".cfg", ".toml"])
+def test_skips_setting(tmp_path, suffix):
+    """The skips and skip_regexes settings apply to every Markdown file."""
+    outdir = tmp_path / "outdir"
+    if suffix == ".cfg":
+        config_file = make_config(tmp_path, outdir)
+        with open(config_file, "a", encoding="utf-8") as f:
+            f.write("skips =\n    # comment lines are ignored\n    Python 3.7\n")
+            f.write("skip_regexes =\n    Fraction\\('\\d/\\d'\\)\n")
+    else:
+        config_file = tmp_path / "skips.toml"
+        contents = Path("tests/generate.toml").read_text(encoding="utf-8")
+        contents = contents.replace(".gendir-suite-toml", outdir.as_posix())
+        contents += 'skips = ["Python 3.7"]\n'
+        contents += "skip_regexes = ['''Fraction\\('\\d/\\d'\\)''']\n"
+        _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    want = phmdoctest.main.testfile(
+        "doc/example2.md",
+        built_from="doc/example2.md",
+        skips=["Python 3.7", "LAST"],
+    )
+    got = (outdir / "test_doc__example2.py").read_text(encoding="utf-8")
+    assert want == got
+
+    # Changing the skips regenerates the test files.
+    contents = config_file.read_text(encoding="utf-8").replace("Python 3.7", "x")
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    got = (outdir / "test_doc__example2.py").read_text(encoding="utf-8")
+    assert want != got
+
+
+def test_bad_skip_regexes_setting(tmp_path):
+    """A skip_regexes setting that is not a regular expression."""
+    outdir = tmp_path / "outdir"
+    config_file = make_config(tmp_path, outdir)
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write("skip_regexes = (unclosed\n")
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.main.generate_using(config_file=config_file)
+    assert "is not a regular expression" in exc_info.value.message
+    assert not outdir.exists()
+
+
+def test_shards_setting(tmp_path):
+    """The shards setting writes a shard manifest. shard_junit_xml weighs files."""
+    outdir = tmp_path / "outdir"
+    config_file = make_config(tmp_path, outdir)
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write("shards = 3\n")
+    phmdoctest.main.generate_using(config_file=config_file)
+    shards = phmdoctest.shard.load_shards(outdir)
+    assert [shard.index for shard in shards] == [0, 1, 2]
+    names = sorted(name for shard in shards for name in shard.files)
+    assert names == sorted(p.name for p in outdir.glob("*.py"))
+    manifest = phmdoctest.manifest.load_manifest(outdir)
+    assert sum(shard.tests for shard in shards) == sum(
+        e.tests for e in manifest.values() if e.outfile
+    )
+    weights = [shard.weight for shard in shards]
+    assert max(weights) - min(weights) <= 26  # twentysix_session_blocks.md
+    paths = phmdoctest.shard.shard_files(outdir, 1)
+    assert paths == [outdir / name for name in shards[1].files]
+
+    # A slow test file gets a shard to itself.
+    junit_xml = tmp_path / "junit.xml"
+    cases = [
+        '<testcase classname="outdir.{}" name="test_code_1" time="{}" />'.format(
+            p.stem, 100.0 if p.name == "test_project.py" else 0.01
+        )
+        for p in outdir.glob("*.py")
+    ]
+    text = "<testsuites><testsuite>{}</testsuite></testsuites>".format("".join(cases))
+    _ = junit_xml.write_text(text, encoding="utf-8")
+    with open(config_file, "a", encoding="utf-8") as f:
+        f.write(f"shard_junit_xml = {junit_xml}\n")
+    phmdoctest.main.generate_using(config_file=config_file)
+    shards = phmdoctest.shard.load_shards(outdir)
+    assert shards[0].files == ["test_project.py"]
+    assert shards[0].weight == 100.0
+
+    _ = junit_xml.write_text("not xml", encoding="utf-8")
+    with pytest.raises(click.ClickException, match="is not JUnit XML"):
+        phmdoctest.main.generate_using(config_file=config_file)
+
+    contents = config_file.read_text(encoding="utf-8")
+    _ = config_file.write_text(contents.replace("shards = 3", ""), encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert not (outdir / phmdoctest.shard.SHARD_MANIFEST_NAME).exists()
@@ -1,8 +1,12 @@
 """Third group of pytest test cases for phmdoctest."""
+import json
+import os
 from pathlib import Path
+import sys
 
 import pytest
 import click
+import click.testing
 
 import phmdoctest
 import phmdoctest.cases
@@ -479,3 +483,152 @@ def test_ok_same_block_teardown_2_ways():
         well_formed_command=command, pytest_options=["--doctest-modules", "-v"]
     )
     assert simulator_status.runner_status.exit_code == 0
+
+
+def test_testfile_chunks():
+    """Joined chunks are the same as testfile(). One chunk per function."""
+    chunks = list(phmdoctest.main.testfile_chunks("doc/example2.md"))
+    assert "".join(chunks) == phmdoctest.main.testfile("doc/example2.md")
+    assert len(chunks) > 2
+    assert chunks[0] == '"""pytest file built from doc/example2.md"""\n'
+
+
+def test_outfile_kept_on_error(tmp_path):
+    """The --outfile is not replaced when generation fails part way."""
+    outfile = tmp_path / "test_label.py"
+    _ = outfile.write_text("previous\n", encoding="utf-8")
+    runner = click.testing.CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        ["tests/label_not_identifier.md", "--outfile", str(outfile)],
+    )
+    assert result.exit_code == 1
+    assert outfile.read_text(encoding="utf-8") == "previous\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["test_label.py"]
+
+
+def test_simulator_in_process():
+    """run_and_pytest() runs pytest in this process and restores sys state."""
+    command = "phmdoctest doc/example1.md --outfile discarded.py"
+    cwd = os.getcwd()
+    path = list(sys.path)
+    simulator_status = phmdoctest.simulator.run_and_pytest(
+        well_formed_command=command,
+        pytest_options=["--doctest-modules", "-v"],
+        junit_family="xunit2",
+        in_process=True,
+    )
+    assert simulator_status.runner_status.exit_code == 0
+    assert simulator_status.pytest_exit_code == 0
+    assert 'tests="2"' in simulator_status.junit_xml
+    assert os.getcwd() == cwd
+    assert sys.path == path
+    assert "test_example1" not in sys.modules
+
+
+@pytest.mark.parametrize("in_process", [False, True])
+def test_simulator_batch(in_process):
+    """run_and_pytest_batch() runs pytest once and splits the results."""
+    commands = [
+        "phmdoctest doc/example1.md --outfile discarded.py",
+        "phmdoctest tests/unexpected_output.md --outfile discarded.py",
+        "phmdoctest doc/example1.md --report",
+        "phmdoctest tests/label_not_identifier.md --outfile discarded.py",
+        "phmdoctest tests/no_code_blocks.md --fail-nocode --outfile discarded.py",
+    ]
+    statuses = phmdoctest.simulator.run_and_pytest_batch(
+        commands,
+        pytest_options=["--doctest-modules"],
+        junit_family="xunit1",
+        in_process=in_process,
+    )
+    assert [s.runner_status.exit_code for s in statuses] == [0, 0, 0, 1, 0]
+    assert [s.pytest_exit_code for s in statuses] == [0, 1, None, None, 1]
+    assert 'tests="2"' in statuses[0].junit_xml
+    assert 'failures="0"' in statuses[0].junit_xml
+    assert "unexpected_output" not in statuses[0].junit_xml
+    assert 'failures="1"' in statuses[1].junit_xml
+    assert statuses[2].junit_xml == ""
+    assert "def test_nothing_fails()" in statuses[4].outfile
+    statuses = phmdoctest.simulator.run_and_pytest_batch(commands[:1])
+    assert statuses[0].pytest_exit_code is None
+    assert statuses[0].junit_xml == ""
+
+
+def test_timings_option(tmp_path):
+    """--timings prints a table to stderr. --timings-json writes JSON."""
+    json_file = tmp_path / "timings.json"
+    runner = click.testing.CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        [
+            "doc/example2.md",
+            "--report",
+            "--outfile",
+            str(tmp_path / "test_example2.py"),
+            "--timings",
+            "--timings-json",
+            str(json_file),
+        ],
+    )
+    assert result.exit_code == 0
+    assert "phmdoctest- timings" in result.stderr
+    assert "phmdoctest- timings" not in result.stdout
+    timings = json.loads(json_file.read_text(encoding="utf-8"))
+    phases = [record["phase"] for record in timings["records"]]
+    assert phases == [
+        "parse",
+        "roles",
+        "skips",
+        "setup_teardown",
+        "report",
+        "generate",
+        "write",
+    ]
+    want = phmdoctest.main.testfile("doc/example2.md")
+    assert (tmp_path / "test_example2.py").read_text(encoding="utf-8") == want
+
+
+@pytest.mark.parametrize("outdir", [False, True])
+def test_timings_json_only(tmp_path, outdir):
+    """--timings-json without --timings writes JSON and prints no table."""
+    json_file = tmp_path / "timings.json"
+    argv = ["doc/example2.md", "--timings-json", str(json_file)]
+    if outdir:
+        argv += ["--outdir", str(tmp_path / "out")]
+    else:
+        argv += ["--outfile", str(tmp_path / "test_example2.py")]
+    runner = click.testing.CliRunner()
+    result = runner.invoke(phmdoctest.main.entry_point, argv)
+    assert result.exit_code == 0
+    assert "phmdoctest- timings" not in result.stderr
+    timings = json.loads(json_file.read_text(encoding="utf-8"))
+    assert "generate" in [record["phase"] for record in timings["records"]]
+
+
+@pytest.mark.parametrize("report_format", ["json", "jsonl"])
+def test_report_format(report_format):
+    """--report-format prints block roles, patterns, directives, and skips."""
+    command = (
+        "phmdoctest doc/example2.md --skip LAST --skip=Python"
+        " --report-format " + report_format
+    )
+    simulator_status = phmdoctest.simulator.run_and_pytest(command)
+    assert simulator_status.runner_status.exit_code == 0
+    stdout = simulator_status.runner_status.stdout
+    if report_format == "json":
+        reports = json.loads(stdout)["files"]
+    else:
+        lines = [json.loads(line) for line in stdout.splitlines()]
+        assert all(line["file"] == "doc/example2.md" for line in lines)
+        reports = [
+            {"blocks": [line for line in lines[:-1]], "summary": lines[-1]["summary"]}
+        ]
+    assert len(reports) == 1
+    blocks = reports[0]["blocks"]
+    assert blocks[2]["line"] == 20
+    assert blocks[2]["role"] == "skip-code"
+    assert blocks[2]["skips"] == ["Python"]
+    assert blocks[-1]["skips"] == ["LAST"]
+    assert reports[0]["summary"]["test_cases"] == 5
+    assert reports[0]["summary"]["roles"]["skip-session"] == 1
@@ -0,0 +1,105 @@
+"""Check the cold start import cost of the phmdoctest command.
+
+Python's -X importtime option prints the microseconds taken to import
+each module to stderr. The modules imported by phmdoctest.main for
+--help and --version are kept to click and a few small modules.
+-X importtime is a CPython option.
+"""
+import os
+import platform
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = pytest.mark.skipif(
+    platform.python_implementation() != "CPython",
+    reason="-X importtime is a CPython option",
+)
+
+
+IMPORT_BUDGET_RATIO = float(os.environ.get("PHMDOCTEST_IMPORT_BUDGET_RATIO", "4.0"))
+"""Most times as long as importing click that importing phmdoctest.main takes.
+
+The time includes importing click. Both are measured in the same
+process so the budget holds on slow and fast machines.
+Set by the environment variable PHMDOCTEST_IMPORT_BUDGET_RATIO.
+"""
+
+
+DEFERRED = [
+    "commonmark",
+    "monotable",
+    "pytest",
+    "tomli",
+    "tomllib",
+    "configparser",
+    "concurrent.futures",
+    "phmdoctest.cases",
+    "phmdoctest.document",
+    "phmdoctest.report",
+    "phmdoctest.tool",
+    "phmdoctest.using",
+    "phmdoctest.watch",
+]
+"""Modules that phmdoctest.main must not import when it is imported."""
+
+
+def import_times(statement):
+    """Cumulative microseconds to import each module imported by statement."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time_parsed():
+    """The -X importtime output has the expected format."""
+    times = import_times("import json")
+    assert "json" in times
+    assert times["json"] > 0
+
+
+def test_deferred_imports():
+    """Heavy and optional modules are not imported by phmdoctest.main."""
+    times = import_times("import phmdoctest.main")
+    assert "phmdoctest.main" in times
+    assert [module for module in DEFERRED if module in times] == []
+
+
+def import_ratio():
+    """Time to import phmdoctest.main divided by the time to import click."""
+    times = import_times("import phmdoctest.main")
+    return times["phmdoctest.main"] / times["click"]
+
+
+def test_import_budget():
+    """Importing phmdoctest.main takes less than the budget.
+
+    The smallest of 3 runs is used to reduce noise from a busy machine.
+    """
+    assert min(import_ratio() for _ in range(3)) < IMPORT_BUDGET_RATIO
+
+
+def test_generate_without_pytest(tmp_path):
+    """Generating a test file doesn't import pytest."""
+    outfile = (tmp_path / "test_example1.py").as_posix()
+    statement = (
+        "import phmdoctest.main;"
+        " phmdoctest.main.entry_point("
+        "['doc/example1.md', '--outfile', '{}'], standalone_mode=False)"
+    ).format(outfile)
+    times = import_times(statement)
+    assert "commonmark" in times
+    assert "pytest" not in times
+    assert "monotable" not in times
@@ -628,3 +628,28 @@ if __name__ == "__main__":
     checker(want, got)
     ast.parse(code)
     ast.parse(want)
+
+
+def test_large_block():
+    """Many omit and pass commands in a long block. Each line is visited once."""
+    section = """\
+for j in range(3):  # phmdoctest:omit
+    print(j)
+
+    y = j
+time.sleep(1)  # phmdoctest:pass
+x = 1
+"""
+    want_section = """\
+# for j in range(3):  # phmdoctest:omit
+#     print(j)
+#
+#     y = j
+pass  # time.sleep(1)  # phmdoctest:pass
+x = 1
+"""
+    got, num_changed_sections = phmdoctest.inline.apply_inline_commands(
+        section * 20000
+    )
+    assert num_changed_sections == 40000
+    assert got == want_section * 20000
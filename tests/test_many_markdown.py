@@ -7,7 +7,9 @@ from _pytest.pytester import RunResult
 import pytest
 
 from phmdoctest.tester import testfile_creator
+from phmdoctest.tester import testfile_batch
 from phmdoctest.tester import testfile_tester
+import phmdoctest.main
 import phmdoctest.tool
 
 
@@ -73,3 +75,56 @@ class TestMany:
         assert summary_nouns.get("errors", 0) == 0
         assert summary_nouns.get("warnings", 0) == 0
         assert "passed" in summary_nouns
+
+
+@pytest.fixture(scope="module")
+def many_results(testfile_batch):
+    """Generate the test files of TestMany and run them in one pytest session."""
+    testfiles = {}
+    for markdown_name in TestMany.tested:
+        p = Path(markdown_name).with_suffix(".py")
+        myname = "test_many_batch_" + "__".join(p.parts)  # flatten
+        testfiles[markdown_name] = (
+            myname,
+            phmdoctest.main.testfile(markdown_name.as_posix()),
+        )
+    results = testfile_batch(
+        testfiles=dict(testfiles.values()),
+        pytest_options=["-v", "--doctest-modules"],
+        workers=2,
+    )
+    return {name: results[myname] for name, (myname, _) in testfiles.items()}
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires >=py3.8")
+@pytest.mark.parametrize("markdown_name", TestMany.tested)
+def test_md_batch(markdown_name, many_results):
+    """Same as TestMany.test_md with all the files run by one pytest session."""
+    result = many_results[markdown_name]
+    summary_nouns = result.parseoutcomes()
+    assert summary_nouns.get("failed", 0) == 0
+    assert summary_nouns.get("errors", 0) == 0
+    assert summary_nouns.get("warnings", 0) == 0
+    assert "passed" in summary_nouns
+    assert result.ret == 0
+
+
+def test_batch_outcomes(testfile_batch):
+    """Each file of the batch gets its own outcomes and exit code."""
+    results = testfile_batch(
+        testfiles={
+            "test_fails.py": phmdoctest.main.testfile("tests/unexpected_output.md"),
+            "test_passes.py": phmdoctest.main.testfile("doc/example1.md"),
+            "test_broken.py": "import no_such_module_here\n",
+            "test_empty.py": "# no tests\n",
+        },
+        pytest_options=["--doctest-modules"],
+    )
+    results["test_fails.py"].assert_outcomes(failed=1)
+    assert results["test_fails.py"].ret == 1
+    results["test_passes.py"].assert_outcomes(passed=2)
+    assert results["test_passes.py"].ret == 0
+    results["test_broken.py"].assert_outcomes(errors=1)
+    assert results["test_broken.py"].ret == 2
+    assert results["test_empty.py"].parseoutcomes() == {}
+    assert results["test_empty.py"].ret == 5
@@ -0,0 +1,95 @@
+"""Test more than one MARKDOWN_FILE, directories, --outdir, and --outname."""
+import json
+from pathlib import Path
+import shutil
+
+from click.testing import CliRunner
+import pytest
+
+import phmdoctest.main
+import phmdoctest.multifile
+
+
+@pytest.fixture()
+def docs(tmp_path, monkeypatch):
+    """Working directory with Markdown files in docs and docs/sub."""
+    monkeypatch.chdir(tmp_path)
+    sub = tmp_path / "docs" / "sub"
+    sub.mkdir(parents=True)
+    root = Path(__file__).parent.parent
+    _ = shutil.copy(str(root / "doc" / "example1.md"), "docs")
+    _ = shutil.copy(str(root / "doc" / "example2.md"), str(sub))
+    _ = shutil.copy(str(root / "tests" / "one_code_block.md"), ".")
+    return root
+
+
+def run(argv):
+    return CliRunner().invoke(phmdoctest.main.entry_point, argv)
+
+
+def test_outname():
+    """The --outname fields."""
+    name = phmdoctest.multifile.outfile_name
+    assert name("docs/sub/intro.md", "test_{stem}.py") == "test_intro.py"
+    assert name("docs/sub/intro.md", "{name}.py") == "intro.md.py"
+    assert name("docs/sub/intro.md", "test_{path}.py") == "test_docs__sub__intro.py"
+    phmdoctest.multifile.check_outname("t_{stem}_{name}_{path}.py")
+    with pytest.raises(Exception, match="unknown field {bogus}"):
+        phmdoctest.multifile.check_outname("test_{bogus}.py")
+
+
+def test_files_and_directories(docs):
+    """Directories are searched for *.md files. Same as one at a time."""
+    result = run(["docs", "one_code_block.md", "--outdir", "out", "-j", "2"])
+    assert result.exit_code == 0
+    assert "phmdoctest- 3 Markdown files, 3 ok, 0 failed." in result.stderr
+    assert "phmdoctest- docs/sub/example2.md => out/test_example2.py" in (
+        result.stderr
+    )
+    for markdown, outfile in [
+        ("docs/example1.md", "out/test_example1.py"),
+        ("docs/sub/example2.md", "out/test_example2.py"),
+        ("one_code_block.md", "out/test_one_code_block.py"),
+    ]:
+        want = phmdoctest.main.testfile(markdown)
+        assert Path(outfile).read_text(encoding="utf-8") == want
+
+
+def test_failures_summarized(docs):
+    """A failed Markdown file is reported and the others are written."""
+    argv = ["docs/sub/example2.md", "one_code_block.md", "--outdir", "out"]
+    result = run(argv + ["--setup", "print"])
+    assert result.exit_code == 1
+    assert "phmdoctest- docs/sub/example2.md error: More than one" in result.stderr
+    assert "phmdoctest- 2 Markdown files, 1 ok, 1 failed." in result.stderr
+    assert "Error: phmdoctest- 1 of 2 Markdown files failed." in result.stderr
+    assert not Path("out/test_example2.py").exists()
+    assert Path("out/test_one_code_block.py").exists()
+
+
+def test_report_format(docs):
+    """One json report for all the Markdown files."""
+    result = run(["docs", "--report-format", "json"])
+    assert result.exit_code == 0
+    report = json.loads(result.stdout)
+    assert [f["file"] for f in report["files"]] == [
+        "docs/example1.md",
+        "docs/sub/example2.md",
+    ]
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["docs", "--outfile", "x.py"], "use --outdir instead of --outfile"),
+        (["docs"], "--outdir is needed"),
+        (["docs", "-", "--outdir", "out"], "- must be the only MARKDOWN_FILE"),
+        (["docs", "--outdir", "out", "--outname", "t.py"], "both make out/t.py"),
+    ],
+)
+def test_usage_errors(docs, argv, message):
+    """Mistakes with more than one MARKDOWN_FILE are usage errors."""
+    result = run(argv)
+    assert result.exit_code == 2
+    assert message in result.stderr
+    assert not Path("out").exists()
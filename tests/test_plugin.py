@@ -0,0 +1,128 @@
+"""pytest plugin collects Markdown files in memory.
+
+Uses the pytester fixture. The plugin is loaded by the pytest11 entry point.
+"""
+from pathlib import Path
+
+import phmdoctest.plugin
+
+
+ROOT = Path(__file__).parent.parent  # pytester changes the working directory
+
+
+def copy_markdown(pytester, *names):
+    """Copy Markdown files into the pytester directory."""
+    for name in names:
+        path = ROOT / name
+        _ = pytester.makefile(".md", **{path.stem: path.read_text(encoding="utf-8")})
+
+
+def test_collects_code_and_sessions(pytester):
+    """Code blocks become test functions, sessions are run by doctest."""
+    copy_markdown(pytester, "doc/example1.md", "doc/example2.md")
+    rr = pytester.runpytest("--phmdoctest", "-v")
+    rr.assert_outcomes(passed=9)
+    rr.stdout.fnmatch_lines(
+        [
+            "example1.md::test_code_14_output_28 PASSED*",
+            "example1.md::session_00001_line_6 PASSED*",
+            "example2.md::session_00002_line_102 PASSED*",
+        ]
+    )
+    assert not list(pytester.path.glob("test_*.py"))  # nothing written
+
+
+def test_not_enabled(pytester):
+    """Markdown files are not collected without --phmdoctest."""
+    copy_markdown(pytester, "doc/example1.md")
+    rr = pytester.runpytest()
+    rr.assert_outcomes()
+
+
+def test_failures(pytester):
+    """Failing code block and session are reported."""
+    _ = pytester.makefile(
+        ".md", bad="```py\n>>> 1 + 1\n3\n```\n\n```python\nassert False\n```\n"
+    )
+    rr = pytester.runpytest("--phmdoctest")
+    rr.assert_outcomes(failed=2)
+    rr.stdout.fnmatch_lines(["Expected:", "    3", "Got:", "    2"])
+
+
+def test_globs_ini(pytester):
+    """phmdoctest_globs selects the Markdown files."""
+    copy_markdown(pytester, "doc/example1.md", "doc/example2.md")
+    _ = pytester.makeini("[pytest]\nphmdoctest_globs = *1.md\n")
+    rr = pytester.runpytest("--phmdoctest")
+    rr.assert_outcomes(passed=2)
+
+
+def test_collect_error(pytester):
+    """Markdown that can't generate a test file is a collection error."""
+    copy_markdown(pytester, "tests/label_not_identifier.md")
+    rr = pytester.runpytest("--phmdoctest")
+    rr.assert_outcomes(errors=1)
+    rr.stdout.fnmatch_lines(["*phmdoctest- label_not_identifier.md*"])
+
+
+def test_cache(pytester, monkeypatch):
+    """Unchanged Markdown is not generated again."""
+    copy_markdown(pytester, "doc/example1.md")
+    calls = []
+    original = phmdoctest.plugin.generate_source
+
+    def counting_generate_source(markdown, built_from):
+        calls.append(built_from)
+        return original(markdown, built_from)
+
+    monkeypatch.setattr(phmdoctest.plugin, "generate_source", counting_generate_source)
+    pytester.runpytest("--phmdoctest").assert_outcomes(passed=2)
+    assert calls == ["example1.md"]
+    pytester.runpytest("--phmdoctest").assert_outcomes(passed=2)
+    assert calls == ["example1.md"]
+    pytester.runpytest("--phmdoctest", "-p", "no:cacheprovider").assert_outcomes(
+        passed=2
+    )
+    assert len(calls) == 2
+    md = pytester.path / "example1.md"
+    _ = md.write_text(md.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    pytester.runpytest("--phmdoctest").assert_outcomes(passed=2)
+    assert len(calls) == 3
+
+
+def test_no_python_examples(pytester):
+    """Markdown without Python examples collects nothing."""
+    _ = pytester.makefile(".md", prose="# Title\n\n```txt\nnot Python\n```\n")
+    rr = pytester.runpytest("--phmdoctest", "-p", "no:cacheprovider")
+    rr.assert_outcomes()
+    rr = pytester.runpytest("--phmdoctest")
+    rr.assert_outcomes()
+    rr = pytester.runpytest("--phmdoctest")  # from the cache
+    rr.assert_outcomes()
+
+
+def test_traceback_source(pytester):
+    """Failing line shows in the traceback without the cache."""
+    _ = pytester.makefile(".md", bad="```python\nx = 1\nassert x == 2\n```\n")
+    rr = pytester.runpytest("--phmdoctest", "-p", "no:cacheprovider")
+    rr.assert_outcomes(failed=1)
+    rr.stdout.fnmatch_lines([">*assert x == 2", "*<phmdoctest bad.md>*"])
+
+
+def test_requires_pytest_7(pytester, monkeypatch):
+    """--phmdoctest is a usage error before pytest 7."""
+    monkeypatch.setattr(phmdoctest.plugin, "PYTEST_7", False)
+    copy_markdown(pytester, "doc/example1.md")
+    rr = pytester.runpytest("--phmdoctest")
+    rr.stderr.fnmatch_lines(["*phmdoctest- --phmdoctest requires pytest 7.0*"])
+    pytester.runpytest().assert_outcomes()  # not enabled is fine
+
+
+def test_hooks_work_with_old_pytest():
+    """Module level hooks only use arguments available in pytest 6."""
+    import inspect
+
+    for name, value in vars(phmdoctest.plugin).items():
+        if name.startswith("pytest_"):
+            args = inspect.signature(value).parameters
+            assert set(args) <= {"parser", "config"}
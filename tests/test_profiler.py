@@ -0,0 +1,101 @@
+"""Test the per example measurements of --profile-json."""
+import json
+from pathlib import Path
+
+from click.testing import CliRunner
+
+import phmdoctest.main
+import phmdoctest.profiler
+
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_measure_and_save(tmp_path):
+    """Registered examples are measured and merged into the JSON file."""
+    json_file = tmp_path / "profile.json"
+    profiler = phmdoctest.profiler.ExampleProfiler(str(json_file), "a.md")
+
+    @profiler.example(5, "code")
+    def test_code_5():
+        pass
+
+    with profiler.measure("test_code_5"):
+        _ = [0] * 1000
+    with profiler.measure("test_module.test_nothing_passes"):
+        pass  # not registered
+    assert [m.name for m in profiler.measurements] == ["test_code_5"]
+    measurement = profiler.measurements[0]
+    assert measurement.line == 5
+    assert measurement.kind == "code"
+    assert measurement.wall_seconds >= 0 and measurement.cpu_seconds >= 0
+    assert measurement.peak_bytes >= 8000
+    profiler.save()
+    assert profiler.measurements == []
+
+    other = phmdoctest.profiler.ExampleProfiler(str(json_file), "b.md")
+    _ = other.example(9, "session")(test_code_5)
+    with other.measure("test_b.test_code_5"):
+        pass
+    other.save()
+    data = json.loads(json_file.read_text(encoding="utf-8"))
+    assert sorted(data["examples"]) == ["a.md", "b.md"]
+    assert data["examples"]["b.md"]["9"]["kind"] == "session"
+    assert len(data["slowest"]) == 2
+    assert not (tmp_path / "profile.json.lock").exists()
+
+
+def test_slowest():
+    """Most wall time first. Limited to count examples."""
+    examples = {
+        "a.md": {"5": {"wall_seconds": 1.0}, "20": {"wall_seconds": 3.0}},
+        "b.md": {"7": {"wall_seconds": 2.0}},
+    }
+    slowest = phmdoctest.profiler.slowest(examples, count=2)
+    assert slowest == [
+        {"file": "a.md", "line": 20, "wall_seconds": 3.0},
+        {"file": "b.md", "line": 7, "wall_seconds": 2.0},
+    ]
+
+
+def test_load_profile(tmp_path):
+    """A missing or bad JSON file starts over."""
+    json_file = tmp_path / "profile.json"
+    empty = {"examples": {}, "slowest": []}
+    assert phmdoctest.profiler.load_profile(json_file) == empty
+    _ = json_file.write_text("[1, 2", encoding="utf-8")
+    assert phmdoctest.profiler.load_profile(json_file) == empty
+
+
+def test_generated_test_file(pytester):
+    """Every code block and session of the generated test file is measured."""
+    testfile = phmdoctest.main.testfile(
+        str(ROOT / "doc" / "example2.md"),
+        setup="FIRST",
+        built_from="doc/example2.md",
+        profile_json="profile.json",
+    )
+    _ = pytester.makepyfile(test_example2=testfile)
+    result = pytester.runpytest("--doctest-modules")
+    result.assert_outcomes(passed=6)
+    data = json.loads((pytester.path / "profile.json").read_text(encoding="utf-8"))
+    examples = data["examples"]["doc/example2.md"]
+    assert sorted(examples, key=int) == ["20", "37", "44", "75", "87", "102"]
+    assert examples["75"]["name"] == "session_00001_line_75"
+    assert examples["75"]["kind"] == "session"
+    assert examples["87"]["kind"] == "code"
+    assert len(data["slowest"]) == 6
+
+
+def test_profile_json_option(tmp_path):
+    """--profile-json generates the same as testfile(profile_json=...)."""
+    outfile = tmp_path / "test_example1.py"
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        ["doc/example1.md", "--profile-json", "p.json", "--outfile", str(outfile)],
+    )
+    assert result.exit_code == 0
+    want = phmdoctest.main.testfile("doc/example1.md", profile_json="p.json")
+    assert outfile.read_text(encoding="utf-8") == want
+    assert want != phmdoctest.main.testfile("doc/example1.md")
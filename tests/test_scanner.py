@@ -0,0 +1,243 @@
+"""Parity of scanner.py with the commonmark parse in tool.fenced_block_nodes()."""
+from io import StringIO
+from pathlib import Path
+import random
+
+import click
+import pytest
+
+import phmdoctest.direct
+import phmdoctest.fenced
+import phmdoctest.main
+import phmdoctest.scanner
+import phmdoctest.simulator
+import phmdoctest.tool
+
+
+markdown_paths = sorted(Path(".").glob("doc/*.md")) + sorted(
+    Path(".").glob("tests/*.md")
+)
+markdown_paths.append(Path("README.md"))
+markdown_paths.append(Path("project.md"))
+
+
+def commonmark_fields(text):
+    """Fields of each fenced code block found by the commonmark parser."""
+    nodes = phmdoctest.tool.fenced_block_nodes(StringIO(text))
+    return [
+        (
+            n.info,
+            n.literal,
+            n.sourcepos[0][0],
+            n.sourcepos[1][0],
+            phmdoctest.direct.get_directives(n),
+        )
+        for n in nodes
+    ]
+
+
+def scanner_fields(text):
+    """Fields of each fenced code block found by the scanner."""
+    nodes = phmdoctest.scanner.scan_text(text)
+    return [
+        (n.info, n.literal, n.sourcepos[0][0], n.sourcepos[1][0], n.directives)
+        for n in nodes
+    ]
+
+
+@pytest.mark.parametrize("markdown_path", markdown_paths)
+def test_parity_of_nodes(markdown_path):
+    """Scanner finds the same fenced code blocks and directives."""
+    text = markdown_path.read_text(encoding="utf-8")
+    assert scanner_fields(text) == commonmark_fields(text)
+
+
+@pytest.mark.parametrize("markdown_path", markdown_paths)
+def test_parity_of_fenced_blocks(markdown_path):
+    """FencedBlock objects made both ways are the same."""
+    with open(markdown_path, "r", encoding="utf-8") as fp:
+        want = phmdoctest.fenced.convert_nodes(phmdoctest.tool.fenced_block_nodes(fp))
+    with open(markdown_path, "r", encoding="utf-8") as fp:
+        got = phmdoctest.fenced.convert_scanned(
+            phmdoctest.scanner.scan_fenced_blocks(fp)
+        )
+    assert [vars(b) for b in got] == [vars(b) for b in want]
+
+
+def generate(markdown_path, fast_scan):
+    """Return generated test file or the error message."""
+    try:
+        return phmdoctest.main.testfile(str(markdown_path), fast_scan=fast_scan)
+    except click.ClickException as exc:
+        return exc.message
+
+
+@pytest.mark.parametrize("markdown_path", markdown_paths)
+def test_parity_of_testfile(markdown_path):
+    """Generated test files or error messages are the same."""
+    assert generate(markdown_path, fast_scan=True) == generate(
+        markdown_path, fast_scan=False
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "```python\nprint(1)\n",  # no closing fence
+        "~~~~ py  x\n>>> 1\n~~~\n~~~~\n",
+        "  ```python\n  a\n    b\n c\n  ```\n",
+        "para\n<!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "<!--phmdoctest-skip-->\npara\n```python\nx\n```\n",
+        "    ```python\n    x\n    ```\n",  # indented code block
+        "para\n    ```python\nx\n```\n",
+        "- item\n\n  <!--phmdoctest-skip-->\n  ```python\n  x\n  ```\n",
+        "- item\n  ```python\n  x\n  ```\n- b\n```\nq\n```\n",
+        "> <!--phmdoctest-label foo-->\n> ```python\n> x\n> ```\n",
+        "> ```python\n> x\nlazy\n```\n",
+        "> > ```py\n> > >>> 1\n> ```\n",
+        "<details>\n```python\nx\n```\n</details>\n\n```python\ny\n```\n",
+        "<script>\n```python\nx\n```\n</script>\n```python\ny\n```\n",
+        "<!-- multi\nline\n-->\n```py\n>>> 1\n```\n",
+        "<!--phmdoctest-skip-->\n  <!--phmdoctest-label a-->\n```python\nx\n```\n",
+        "```python `x`\nx\n```\n",  # backtick in info string is not a fence
+        "```python a\\_b &amp; &lt;\nx\n```\n",
+        "text\n2. two\n```python\nx\n```\n",
+        "* * *\n```python\nx\n```\n",
+        "```\n\n\n```\n",
+        "```python\n```\n",
+        "```python\r\nx\r\n```\r\n",
+        "````\n```\n````\n",
+        "```python\n\tx = 1\n\t\ty\n```\n",  # tabs in contents are kept
+        "  ```\n\tx\n \ty\n```\n",
+        "-\t```\n\tx\n  \ty\n",
+        ">\t```\n>\t\tx\n",
+        "\t```python\n\tx\n\t```\n",
+        "-\n\n  ```\nx = 1\n",  # item starting with a blank line ends at blank
+        "1. a\n<a href='x'>\n```\nx\n```\n",
+        "<textarea>\n\n```\nx\n```\n",
+        "<h2>\n```\nx\n```\n",
+        "[a]: /url\n<!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "[a]:\n/url 'title'\n<!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "[a]: /url\n===\n```\nx\n```\n",
+        "para\n===\n    ```\n    x\n",
+    ],
+)
+def test_parity_edge_cases(text):
+    """Scanner handles CommonMark block structure like commonmark."""
+    assert scanner_fields(text) == commonmark_fields(text)
+
+
+SNIPPETS = [
+    "",
+    "\t",
+    "para",
+    "    code",
+    "\tcode",
+    "```",
+    "```python",
+    "~~~~ py x",
+    "  ```",
+    "\t```",
+    "```py `x`",
+    "> ```",
+    ">\t```",
+    "-",
+    "- item",
+    "-\tx",
+    "1. a",
+    "2. b",
+    "  - b",
+    "\t- d",
+    "<!--phmdoctest-skip-->",
+    "<!--phmdoctest-label a-->",
+    "<!-- c -->",
+    "<!--",
+    "-->",
+    "\t<!--phmdoctest-skip-->",
+    "<div>",
+    "<a href='x'>",
+    "<script>",
+    "</script>",
+    "# h",
+    "===",
+    "---",
+    "***",
+    "[a]: /u",
+    "[a]: /u 'title'",
+    "[b]:",
+    "  /dest",
+    "x = 1",
+    "\tindented",
+    ">>> 1",
+]
+PREFIXES = ["", "> ", "  ", "- ", "\t", "1. ", ">\t"]
+
+
+def generated_documents(count, seed):
+    """Random documents made of lines that start and end CommonMark blocks."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        lines = [
+            rng.choice(PREFIXES) * rng.randint(0, 2) + rng.choice(SNIPPETS)
+            for _ in range(rng.randint(1, 12))
+        ]
+        yield "\n".join(lines) + rng.choice(["\n", ""])
+
+
+def test_parity_generated_documents():
+    """Scanner matches commonmark on generated documents."""
+    mismatches = [
+        text
+        for text in generated_documents(count=3000, seed=20221017)
+        if scanner_fields(text) != commonmark_fields(text)
+    ]
+    assert mismatches == []
+
+
+def test_directive_circuit_breaker():
+    """Only the 100 HTML comments closest to the block are checked."""
+    text = "<!--phmdoctest-skip-->\n" + "<!-- x -->\n" * 100 + "```python\nx\n```\n"
+    assert scanner_fields(text) == commonmark_fields(text)
+    assert scanner_fields(text)[0][4] == []
+
+
+def test_fast_scan_keeps_tabs(tmp_path):
+    """Tabs in the code and expected output are kept with --fast-scan."""
+    markdown = tmp_path / "tabs.md"
+    _ = markdown.write_text(
+        '```python\nprint("\\tindented")\n```\n\n```\n\tindented\n```\n',
+        encoding="utf-8",
+    )
+    want = phmdoctest.main.testfile(str(markdown), built_from="tabs.md")
+    got = phmdoctest.main.testfile(
+        str(markdown), built_from="tabs.md", fast_scan=True
+    )
+    assert got == want
+    assert "\tindented" in got
+
+
+def test_fast_scan_option(checker):
+    """Command line --fast-scan generates the same test file."""
+    want = Path("doc/test_example1.py").read_text(encoding="utf-8")
+    simulator_status = phmdoctest.simulator.run_and_pytest(
+        "phmdoctest doc/example1.md --fast-scan --outfile discarded.py",
+        pytest_options=None,
+    )
+    assert simulator_status.runner_status.exit_code == 0
+    checker(want, simulator_status.outfile)
+
+
+def test_fast_scan_config(tmp_path, capsys):
+    """The fast_scan configuration file key."""
+    config_file = tmp_path / "fast_scan.toml"
+    contents = Path("tests/generate.toml").read_text(encoding="utf-8")
+    contents = contents.replace(".gendir-suite-toml", tmp_path.as_posix())
+    contents = contents.replace(
+        'print = ["filename", "summary"]', 'print = ["summary"]\nfast_scan = true'
+    )
+    _ = config_file.write_text(contents, encoding="utf-8")
+    phmdoctest.main.generate_using(config_file=config_file)
+    assert "generated 12 pytest files" in capsys.readouterr().out
+    want = phmdoctest.main.testfile("project.md", built_from="project.md")
+    got = (tmp_path / "test_project.py").read_text(encoding="utf-8")
+    assert got == want
@@ -0,0 +1,75 @@
+"""Test --session-tests, sessions run by generated pytest test functions."""
+from pathlib import Path
+
+from click.testing import CliRunner
+
+import phmdoctest.main
+
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_sessions_without_doctest_modules(pytester):
+    """The sessions are test functions. --doctest-modules is not needed."""
+    testfile = phmdoctest.main.testfile(
+        str(ROOT / "doc" / "example2.md"), session_tests=True
+    )
+    assert "def test_session_00001_line_75(request):" in testfile
+    assert '    r"""' not in testfile
+    _ = pytester.makepyfile(test_example2=testfile)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=7)
+    result = pytester.runpytest("--doctest-modules")
+    result.assert_outcomes(passed=7)
+    result = pytester.runpytest("-k", "session")
+    result.assert_outcomes(passed=2, deselected=5)
+
+
+def test_failure_line(pytester):
+    """A failed example is reported at its Markdown line."""
+    markdown = pytester.path / "bad.md"
+    _ = markdown.write_text(
+        "Text\n\n```py\n>>> 1 + 1\n2\n>>> print('hi')\nho\n```\n",
+        encoding="utf-8",
+    )
+    testfile = phmdoctest.main.testfile(
+        str(markdown), built_from="bad.md", session_tests=True
+    )
+    _ = pytester.makepyfile(test_bad=testfile)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['File "bad.md", line 6, in test_session_*'])
+
+
+def test_setup_doctest(pytester):
+    """Names assigned by the setup block are visible to the sessions."""
+    markdown = pytester.path / "setup.md"
+    _ = markdown.write_text(
+        "```python\nimport math\nmylist = [1, 2]\n```\n\n"
+        "```py\n>>> mylist.append(round(math.pi))\n```\n\n"
+        "```py\n>>> mylist\n[1, 2, 3]\n>>> getfixture('tmp_path').exists()\n"
+        "True\n```\n",
+        encoding="utf-8",
+    )
+    testfile = phmdoctest.main.testfile(
+        str(markdown), setup="FIRST", setup_doctest=True, session_tests=True
+    )
+    assert "session_00000" not in testfile
+    assert "_phm_globals = dict(globals())" in testfile
+    _ = pytester.makepyfile(test_setup=testfile)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=2)
+
+
+def test_session_tests_option(tmp_path):
+    """--session-tests generates the same as testfile(session_tests=True)."""
+    outfile = tmp_path / "test_example2.py"
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        ["doc/example2.md", "--session-tests", "--outfile", str(outfile)],
+    )
+    assert result.exit_code == 0
+    want = phmdoctest.main.testfile("doc/example2.md", session_tests=True)
+    assert outfile.read_text(encoding="utf-8") == want
+    assert "_phm_run_session" not in phmdoctest.main.testfile("doc/example1.md")
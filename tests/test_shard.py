@@ -0,0 +1,67 @@
+"""Test splitting generated test files into balanced shards."""
+import pytest
+
+import phmdoctest.document
+import phmdoctest.main
+import phmdoctest.shard
+
+
+JUNIT_XML = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" tests="4">
+<testcase classname=".gen.test_big" name="test_code_9" time="3.0" />
+<testcase classname=".gen.test_big" name="test_big.session_00001_line_20"
+ time="1.0" />
+<testcase classname=".gen.test_small" name="test_code_5" time="0.5" />
+<testcase classname="tests.test_other" name="test_x" time="" />
+</testsuite></testsuites>
+"""
+
+
+def count_document_tests(text):
+    """count_tests() of the blocks after generating the test file."""
+    document = phmdoctest.document.Document("a.md", text=text)
+    _ = "".join(phmdoctest.main.testfile_chunks(document=document, built_from="a.md"))
+    return phmdoctest.shard.count_tests(document.blocks)
+
+
+def test_count_tests():
+    """Code blocks and session blocks are counted. Labeled ones too."""
+    document = phmdoctest.document.Document("doc/example2.md")
+    _ = "".join(phmdoctest.main.testfile_chunks(document=document))
+    assert phmdoctest.shard.count_tests(document.blocks) == 7
+    text = (
+        "<!--phmdoctest-label my_code-->\n```python\nx = 1\n```\n\n"
+        "<!--phmdoctest-label my_session-->\n```py\n>>> 1\n1\n```\n\n"
+        "<!--phmdoctest-skip-->\n```python\nx = 2\n```\n"
+    )
+    assert count_document_tests(text) == 2
+    # test_nothing_passes()
+    assert count_document_tests("<!--phmdoctest-skip-->\n```python\n1\n```\n") == 1
+
+
+def test_junit_durations():
+    """Seconds of the test cases are summed by module."""
+    durations = phmdoctest.shard.junit_durations(JUNIT_XML)
+    assert durations == {"test_big": 4.0, "test_small": 0.5, "test_other": 0.0}
+
+
+def test_file_weights():
+    """Files missing from the durations get the average seconds per test."""
+    tests = {"test_big.py": 2, "test_small.py": 2, "test_new.py": 3}
+    durations = {"test_big": 4.0, "test_small": 0.5}
+    weights = phmdoctest.shard.file_weights(tests, durations)
+    assert weights == {"test_big.py": 4.0, "test_small.py": 0.5, "test_new.py": 3.375}
+    assert phmdoctest.shard.file_weights(tests) == {
+        "test_big.py": 2.0,
+        "test_small.py": 2.0,
+        "test_new.py": 3.0,
+    }
+
+
+def test_balance():
+    """Heaviest first to the lightest shard."""
+    weights = {"a": 7.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 1.0}
+    assert phmdoctest.shard.balance(weights, 2) == [["a", "d"], ["b", "c", "e"]]
+    assert phmdoctest.shard.balance(weights, 6)[5] == []
+    with pytest.raises(ValueError, match="shards must be >= 1"):
+        _ = phmdoctest.shard.balance(weights, 0)
@@ -0,0 +1,93 @@
+"""Test the multi-pattern skip matcher."""
+import random
+
+import click
+import pytest
+
+import phmdoctest.main
+import phmdoctest.skipmatch
+import phmdoctest.simulator
+
+
+def naive_matches(skips, contents):
+    """The pattern by pattern search that SkipMatcher replaces."""
+    matched = []
+    for pattern in skips:
+        if pattern == "FIRST":
+            found = [0] if contents else []
+        elif pattern == "LAST":
+            found = [len(contents) - 1] if contents else []
+        elif pattern == "SECOND":
+            found = [1] if len(contents) > 1 else []
+        else:
+            found = [i for i, text in enumerate(contents) if pattern in text]
+        matched.append(found)
+    return matched
+
+
+@pytest.mark.parametrize("num_patterns", [1, 5, 15, 16, 40])
+def test_same_as_naive(num_patterns):
+    """Same matches as searching for each pattern separately."""
+    chooser = random.Random(num_patterns)
+    alphabet = "abc d\n"
+    contents = [
+        "".join(chooser.choice(alphabet) for _ in range(chooser.randrange(0, 60)))
+        for _ in range(25)
+    ]
+    for _ in range(20):
+        skips = [
+            "".join(chooser.choice(alphabet) for _ in range(chooser.randrange(1, 6)))
+            for _ in range(num_patterns)
+        ]
+        skips.extend(["FIRST", "SECOND", "LAST", skips[0]])
+        matcher = phmdoctest.skipmatch.SkipMatcher(skips)
+        assert matcher.matches(contents) == naive_matches(skips, contents)
+
+
+def test_overlapping_patterns():
+    """Patterns that are suffixes and prefixes of each other are all found."""
+    skips = ["he", "she", "his", "hers"] * 5  # enough to use the automaton
+    matcher = phmdoctest.skipmatch.SkipMatcher(skips)
+    assert matcher._automaton is not None
+    assert matcher.search("ushers") == {0, 1, 3, 4, 5, 7, 8, 9, 11, 12, 13}.union(
+        {15, 16, 17, 19}
+    )
+    assert matcher.search("this") == {2, 6, 10, 14, 18}
+
+
+def test_positional_without_blocks():
+    """FIRST, SECOND, and LAST don't match when there are no blocks."""
+    matcher = phmdoctest.skipmatch.SkipMatcher(["FIRST", "SECOND", "LAST", ""])
+    assert matcher.matches([]) == [[], [], [], []]
+    assert matcher.matches(["x"]) == [[0], [], [0], [0]]
+
+
+def test_skip_regex():
+    """--skip-regex skips the blocks that re.search() matches."""
+    want = phmdoctest.main.testfile("doc/example2.md", skips=["Python 3.7", "LAST"])
+    got = phmdoctest.main.testfile(
+        "doc/example2.md", skip_regexes=[r"Python 3\.[0-9]+", r"Fraction\('\d/\d'\)"]
+    )
+    assert want == got
+
+
+def test_skip_regex_report():
+    """The skips report lists --skip-regex TEXT after --skip TEXT."""
+    command = (
+        "phmdoctest doc/example2.md --skip LAST"
+        r' --skip-regex "Py[a-z]+on 3\.7" --report'
+    )
+    simulator_status = phmdoctest.simulator.run_and_pytest(command)
+    assert simulator_status.runner_status.exit_code == 0
+    stdout = simulator_status.runner_status.stdout
+    assert "LAST             102" in stdout
+    assert "Py[a-z]+on 3\\.7  20" in stdout
+
+
+def test_bad_skip_regex():
+    """An invalid regular expression is reported."""
+    with pytest.raises(click.ClickException) as exc_info:
+        _ = phmdoctest.main.testfile("doc/example2.md", skip_regexes=["(unclosed"])
+    assert "--skip-regex '(unclosed' is not a regular expression" in str(
+        exc_info.value.message
+    )
@@ -0,0 +1,39 @@
+"""Code generation templates are split once and filled by a single join."""
+import inspect
+
+import phmdoctest.main
+from phmdoctest import templates
+
+
+def test_fill():
+    """Values replace the slots in order."""
+    template = templates.Template("a<1>b<2>c<1>", ["<1>", "<2>"])
+    assert template.segments == ("a", "b", "c<1>")
+    assert template.fill("X", "Y") == "aXbYc<1>"
+
+
+def test_slot_text_in_code():
+    """Code and output that contain slot text are not replaced again."""
+    src = templates.CODE_AND_OUTPUT.fill(
+        "test_name", "    x = '<<<replaced>>>'\n", "expected\n"
+    )
+    assert "    x = '<<<replaced>>>'\n" in src
+    assert '_phm_expected_str = """\\\nexpected\n"""' in src
+
+
+def test_no_getsource_per_block(monkeypatch):
+    """Templates are read when imported, not for each generated function."""
+    calls = []
+    original = inspect.getsource
+
+    def counting_getsource(obj):
+        calls.append(obj)
+        return original(obj)
+
+    monkeypatch.setattr(inspect, "getsource", counting_getsource)
+    _ = phmdoctest.main.testfile(
+        "doc/setup_doctest.md", setup="FIRST", teardown="LAST", setup_doctest=True
+    )
+    _ = phmdoctest.main.testfile("doc/example2.md")
+    _ = phmdoctest.main.testfile("tests/no_code_blocks.md")
+    assert not calls
@@ -3,6 +3,7 @@ from pathlib import Path
 
 import pytest
 
+import phmdoctest.parsecache
 import phmdoctest.tool
 
 
@@ -36,6 +37,58 @@ def test_chooser_did_not_find():
     assert contents == ""
 
 
+def test_chooser_first_label_wins(tmp_path):
+    """FCBChooser.contents() returns the first block with a repeated label."""
+    markdown = tmp_path / "twice.md"
+    _ = markdown.write_text(
+        "<!--phmdoctest-label same-->\n```\nfirst\n```\n\n"
+        "<!--phmdoctest-label same-->\n```\nsecond\n```\n",
+        encoding="utf-8",
+    )
+    assert phmdoctest.tool.FCBChooser(str(markdown)).contents("same") == "first\n"
+
+
+def test_parse_cache(tmp_path):
+    """Markdown is parsed again only when the file changes."""
+    markdown = tmp_path / "cached.md"
+    _ = markdown.write_text("```\none\n```\n", encoding="utf-8")
+    calls = []
+
+    def parse(filename):
+        calls.append(filename)
+        return Path(filename).read_text(encoding="utf-8")
+
+    cache = phmdoctest.parsecache.ParseCache(maxsize=2)
+    assert cache.get(str(markdown), "text", parse) == "```\none\n```\n"
+    assert cache.get(str(markdown), "text", parse) == "```\none\n```\n"
+    assert len(calls) == 1
+    _ = markdown.write_text("```\ntwo two\n```\n", encoding="utf-8")
+    assert cache.get(str(markdown), "text", parse) == "```\ntwo two\n```\n"
+    assert len(calls) == 2
+    assert cache.info() == (1, 2, 2, 1)
+    _ = cache.get(str(markdown), "other", parse)
+    _ = cache.get("README.md", "text", parse)
+    assert cache.info().currsize == 2  # least recently used is dropped
+    cache.clear()
+    assert cache.info() == (0, 0, 2, 0)
+
+
+def test_parse_cache_threads():
+    """Threads share the process wide cache."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    phmdoctest.parsecache.PARSE_CACHE.clear()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        choosers = list(
+            executor.map(phmdoctest.tool.FCBChooser, ["README.md"] * 32)
+        )
+    expected = phmdoctest.tool.FCBChooser("README.md").contents("example1-raw")
+    assert all(c.contents("example1-raw") == expected for c in choosers)
+    info = phmdoctest.parsecache.PARSE_CACHE.info()
+    assert info.hits >= 32 - 8
+    assert info.currsize == 2  # labeled blocks and the commonmark nodes
+
+
 def test_no_fails_junit_xml(example_tester):
     """Generate JUnit XML from pytest with no failures."""
     simulator_status = example_tester(
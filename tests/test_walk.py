@@ -0,0 +1,171 @@
+"""Test the single directory walk that finds Markdown files."""
+import os
+from pathlib import Path
+
+import pytest
+
+import phmdoctest.using
+import phmdoctest.walk
+
+
+TREE = [
+    "README.md",
+    "notes.txt",
+    "doc/a.md",
+    "doc/b_raw.md",
+    "doc/deep/c.md",
+    "doc/deep/deeper/d.md",
+    "node_modules/pkg/README.md",
+    "build/out/e.md",
+    ".git/f.md",
+    "src/g.md",
+    "src/[x].md",
+]
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    """Directory with the files in TREE."""
+    for name in TREE:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _ = path.write_text("# title\n", encoding="utf-8")
+    return tmp_path
+
+
+@pytest.fixture()
+def scanned(monkeypatch):
+    """Record the directories listed by os.scandir()."""
+    listed = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        listed.append(Path(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    return listed
+
+
+@pytest.mark.parametrize(
+    "glob",
+    [
+        "*.md",
+        "**/*.md",
+        "doc/*.md",
+        "doc/**/*.md",
+        "**/deep/*.md",
+        "d?c/[ab]*.md",
+        "doc/[!a]*.md",
+        "src/[[]x].md",
+        "./doc/a.md",
+        "**/README.md",
+    ],
+)
+def test_same_as_path_glob(tree, glob):
+    """Selects the same files as Path.glob()."""
+    want = sorted(p for p in tree.glob(glob) if p.is_file())
+    got = phmdoctest.walk.find_files(tree, [glob])
+    assert sorted(got) == want
+    assert len(set(got)) == len(got)
+
+
+def test_order():
+    """Files are in order of the first include glob that matches then by name."""
+    got = phmdoctest.walk.find_files(
+        Path("."), ["tests/one*.md", "doc/example?.md", "doc/example1.md"]
+    )
+    assert [p.as_posix() for p in got] == [
+        "tests/one_code_block.md",
+        "tests/one_mark_skip.md",
+        "doc/example1.md",
+        "doc/example2.md",
+    ]
+
+
+def test_prune_unreachable(tree, scanned):
+    """Directories that no include glob can reach are not listed."""
+    got = phmdoctest.walk.find_files(tree, ["doc/*.md"])
+    assert got == [tree / "doc/a.md", tree / "doc/b_raw.md"]
+    assert scanned == [tree, tree / "doc"]
+
+
+def test_prune_excluded(tree, scanned):
+    """Directories matching an exclude glob ending with / or /** are not entered."""
+    got = phmdoctest.walk.find_files(
+        tree, ["**/*.md"], ["node_modules/", "build/**", "doc/*_raw.md", ".git/"]
+    )
+    names = [p.relative_to(tree).as_posix() for p in got]
+    assert names == [
+        "README.md",
+        "doc/a.md",
+        "doc/deep/c.md",
+        "doc/deep/deeper/d.md",
+        "src/[x].md",
+        "src/g.md",
+    ]
+    assert tree / "node_modules" not in scanned
+    assert tree / "build" not in scanned
+    assert tree / ".git" not in scanned
+
+
+def test_exclude_files_only(tree, scanned):
+    """Other exclude globs leave out files but not the directories below."""
+    got = phmdoctest.walk.find_files(tree, ["doc/**/*.md"], ["doc/*"])
+    names = [p.relative_to(tree).as_posix() for p in got]
+    assert names == ["doc/deep/c.md", "doc/deep/deeper/d.md"]
+    assert tree / "doc" / "deep" in scanned
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+@pytest.mark.parametrize(
+    "glob", ["d/link/*.md", "d/*/*.md", "*/*/*.md", "d/**/*.md", "**/*.md"]
+)
+def test_symlinked_directory(tmp_path, glob):
+    """Like Path.glob() symlinks are followed except by **."""
+    real = tmp_path / "real"
+    real.mkdir()
+    _ = (real / "a.md").write_text("# a\n", encoding="utf-8")
+    (tmp_path / "d").mkdir()
+    try:
+        os.symlink(str(real), str(tmp_path / "d" / "link"), target_is_directory=True)
+    except OSError:
+        pytest.skip("can't create a symlink")
+    os.symlink(str(tmp_path / "d"), str(tmp_path / "d" / "loop"))
+    want = sorted(p for p in tmp_path.glob(glob) if p.is_file())
+    got = phmdoctest.walk.find_files(tmp_path, [glob])
+    assert sorted(got) == want
+    if glob in ("d/link/*.md", "d/*/*.md"):
+        assert got == [tmp_path / "d" / "link" / "a.md"]
+
+
+def test_gitignore(tree, scanned):
+    """.gitignore files prune directories and leave out files."""
+    _ = (tree / ".gitignore").write_text(
+        "# comment\n\nnode_modules/\n/build\n*_raw.md\ndeeper\n", encoding="utf-8"
+    )
+    _ = (tree / "doc" / ".gitignore").write_text("a.md\n", encoding="utf-8")
+    _ = (tree / "src" / ".gitignore").write_text("*.md\n!g.md\n", encoding="utf-8")
+    got = phmdoctest.walk.find_files(tree, ["**/*.md"], gitignore=True)
+    names = [p.relative_to(tree).as_posix() for p in got]
+    assert names == ["README.md", "doc/deep/c.md", "src/g.md"]
+    for name in ["node_modules", "build", ".git", "doc/deep/deeper"]:
+        assert tree / name not in scanned
+    # Without the option the .gitignore files are not used.
+    assert len(phmdoctest.walk.find_files(tree, ["**/*.md"])) == len(TREE) - 1
+
+
+@pytest.mark.parametrize("suffix", [".cfg", ".toml"])
+def test_gitignore_setting(tmp_path, suffix):
+    """The gitignore configuration key."""
+    config_file = tmp_path / ("walk" + suffix)
+    if suffix == ".cfg":
+        contents = "[tool.phmdoctest]\nmarkdown_globs = **/*.md\nexclude_globs =\n"
+        contents += "output_directory = out\nprint =\ngitignore = true\n"
+    else:
+        contents = '[tool.phmdoctest]\nmarkdown_globs = ["**/*.md"]\n'
+        contents += 'exclude_globs = []\noutput_directory = "out"\nprint = []\n'
+        contents += "gitignore = true\n"
+    _ = config_file.write_text(contents, encoding="utf-8")
+    config = phmdoctest.using.parse_user_configuration(config_file)
+    assert config.gitignore
@@ -0,0 +1,152 @@
+"""Test the --watch mode."""
+import os
+from pathlib import Path
+import shutil
+import threading
+
+from click.testing import CliRunner
+import pytest
+
+import phmdoctest.main
+import phmdoctest.watch
+
+
+def touch(path, text=None):
+    """Change the file's modification time and optionally its contents."""
+    if text is not None:
+        _ = path.write_text(text, encoding="utf-8")
+    stat = path.stat()
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_changes(tmp_path):
+    """Modified, added, and removed files are changes."""
+    a = tmp_path / "a.md"
+    b = tmp_path / "b.md"
+    _ = a.write_text("a", encoding="utf-8")
+    paths = [a]
+    watcher = phmdoctest.watch.Watcher(lambda: list(paths), use_inotify=False)
+    assert watcher.changes() == []
+    touch(a)
+    assert watcher.changes() == [a]
+    assert watcher.changes() == []
+    _ = b.write_text("b", encoding="utf-8")
+    paths.append(b)
+    assert watcher.changes() == [b]
+    paths.remove(a)
+    assert watcher.changes() == [a]
+    b.unlink()
+    assert watcher.changes() == [b]
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_next_changes(tmp_path, use_inotify):
+    """Waits for a change then for it to settle."""
+    a = tmp_path / "a.md"
+    _ = a.write_text("a", encoding="utf-8")
+    watcher = phmdoctest.watch.Watcher(
+        lambda: [a], interval=0.05, debounce=0.05, use_inotify=use_inotify
+    )
+    timer = threading.Timer(0.1, touch, args=(a,))
+    timer.start()
+    try:
+        assert watcher.next_changes() == [a]
+    finally:
+        timer.join()
+        watcher.close()
+
+
+def test_watch_continues_after_error(tmp_path, capsys):
+    """An error while regenerating is shown and watching continues."""
+    a = tmp_path / "a.md"
+    _ = a.write_text("a", encoding="utf-8")
+    calls = []
+
+    def regenerate(changed):
+        calls.append(changed)
+        if len(calls) == 1:
+            touch(a)  # changes again for the second cycle
+            raise ValueError("bad Markdown")
+
+    timer = threading.Timer(0.1, touch, args=(a,))
+    timer.start()
+    phmdoctest.watch.watch(lambda: [a], regenerate, 0.02, 0.02, cycles=2)
+    timer.join()
+    assert calls == [[a], [a]]
+    err = capsys.readouterr().err
+    assert "phmdoctest- watching for changes" in err
+    assert "ValueError('bad Markdown')" in err
+
+
+@pytest.fixture()
+def one_regeneration(monkeypatch):
+    """Replace watch() with one that edits a file and regenerates once."""
+    edits = []
+
+    def fake_watch(find_paths, regenerate):
+        paths = find_paths()
+        path, text = edits[0]
+        touch(path, text)
+        regenerate([path])
+        edits.append(paths)
+
+    monkeypatch.setattr(phmdoctest.watch, "watch", fake_watch)
+    return edits
+
+
+def test_watch_option(tmp_path, one_regeneration):
+    """--watch regenerates the --outfile when the Markdown file changes."""
+    markdown = tmp_path / "one.md"
+    shutil.copy("tests/one_code_block.md", str(markdown))
+    outfile = tmp_path / "test_one.py"
+    edited = markdown.read_text(encoding="utf-8").replace("APPLES", "PEARS")
+    one_regeneration.append((markdown, edited))
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        [str(markdown), "--outfile", str(outfile), "--watch"],
+    )
+    assert result.exit_code == 0
+    assert one_regeneration[1] == [markdown]
+    assert "PEARS" in outfile.read_text(encoding="utf-8")
+
+
+def test_watch_config(tmp_path, one_regeneration, monkeypatch):
+    """--watch with a configuration file watches it and its Markdown files."""
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(str(Path(__file__).parent / "one_code_block.md"), "one.md")
+    contents = '[tool.phmdoctest]\nmarkdown_globs = ["*.md"]\nexclude_globs = []\n'
+    contents += 'output_directory = "out"\nprint = []\n'
+    _ = Path("watch.toml").write_text(contents, encoding="utf-8")
+    edited = Path("one.md").read_text(encoding="utf-8").replace("APPLES", "PEARS")
+    one_regeneration.append((Path("one.md"), edited))
+    runner = CliRunner()
+    result = runner.invoke(phmdoctest.main.entry_point, ["watch.toml", "--watch"])
+    assert result.exit_code == 0
+    assert one_regeneration[1] == [Path("watch.toml"), Path("one.md")]
+    assert "PEARS" in Path("out/test_one.py").read_text(encoding="utf-8")
+
+
+def test_watch_stdin():
+    """--watch can't watch stdin."""
+    runner = CliRunner()
+    result = runner.invoke(phmdoctest.main.entry_point, ["-", "--watch"], input="")
+    assert result.exit_code == 2
+    assert "--watch needs a file" in result.output
+
+
+def test_watch_outdir(tmp_path, one_regeneration, monkeypatch):
+    """--watch with --outdir regenerates only the changed Markdown files."""
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(str(Path(__file__).parent / "one_code_block.md"), "one.md")
+    shutil.copy(str(Path(__file__).parent / "one_code_block.md"), "two.md")
+    edited = Path("one.md").read_text(encoding="utf-8").replace("APPLES", "PEARS")
+    one_regeneration.append((Path("one.md"), edited))
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point, [".", "--outdir", "out", "--watch"]
+    )
+    assert result.exit_code == 0
+    assert one_regeneration[1] == [Path("one.md"), Path("two.md")]
+    assert "PEARS" in Path("out/test_one.py").read_text(encoding="utf-8")
+    assert result.stderr.count("two.md => out/test_two.py") == 1